@@ -9,6 +9,55 @@ LED_BINARY_OUT_IP = "127.0.0.1"
 LED_BINARY_OUT_PORT = 7000
 LED_BINARY_OSC_ADDRESS = "/light/serial"
 
+OSC_SEND_QUEUE_SIZE = 1024
+OSC_SEND_BATCH_SIZE = 32
+OSC_SEND_MAX_BUNDLE_BYTES = 1400
+OSC_SEND_DROP_POLICY = "drop_oldest"
+
+FILE_CACHE_SIZE = 32
+
+JOURNAL_FLUSH_INTERVAL = 0.05
+JOURNAL_SNAPSHOT_OPS = 1000
+
+CONFIG_WATCH_POLL_INTERVAL = 0.5
+CONFIG_WATCH_SETTLE_TIME = 0.1
+
+RENDER_POOL_FRAME_TIMEOUT = 1.0
+RENDER_POOL_START_TIMEOUT = 30.0
+
+TEMPLATE_INTERN_LIMIT = 65536
+
+CLOCK_SYNC_PORT = 9200
+CLOCK_SYNC_INTERVAL = 0.1
+CLOCK_SYNC_WINDOW = 16
+CLOCK_SYNC_STEP_THRESHOLD = 0.05
+CLOCK_SYNC_SLEW_GAIN = 0.2
+CLOCK_SYNC_TIMEOUT = 2.0
+
+ANIMATION_MAX_STEP = 0.1
+ANIMATION_MAX_CATCH_UP = 10.0
+
+FRAME_BUDGET_RATIO = 0.9
+FRAME_MAX_SKIPS = 10
+FRAME_ESTIMATE_DECAY = 0.5
+FRAME_THROTTLE_INTERVAL = 0.25
+SIMULATOR_DISPLAY_FPS = 60
+TEXT_CACHE_SIZE = 512
+STATIC_OVERLAY_CACHE_SIZE = 32
+
+AUDIO_BLOCK_SIZE = 1024
+AUDIO_SAMPLE_RATE = 44100
+AUDIO_CHANNELS = 2
+AUDIO_BANDS = {
+    "bass": [20, 250],
+    "mid": [250, 4000],
+    "high": [4000, 16000]
+}
+AUDIO_ATTACK = 0.6
+AUDIO_RELEASE = 0.15
+AUDIO_PEAK_DECAY = 0.995
+AUDIO_BAND_FLOOR = 1e-4
+
 DEFAULT_COLOR_PALETTES = {
     "A": [
         [255, 0, 0],    # Red
@@ -67,4 +116,7 @@ DEFAULT_MOVE_RANGE = [0, DEFAULT_LED_COUNT - 1]
 DEFAULT_INITIAL_POSITION = 0
 DEFAULT_IS_EDGE_REFLECT = True
 DEFAULT_DIMMER_TIME = [0, 100, 200, 100, 0]
-DEFAULT_DIMMER_TIME_RATIO = 1.0
\ No newline at end of file
+DEFAULT_DIMMER_TIME_RATIO = 1.0
+
+ENVELOPE_LUT_SIZE = 4096
+ENVELOPE_BANK_CACHE_SIZE = 64
\ No newline at end of file
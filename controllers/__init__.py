@@ -1 +1,7 @@
 from .osc_handler import OSCHandler
+from .osc_sender import OSCSendQueue
+from .config_watcher import ConfigReloader, FileWatcher
+from .render_pool import RenderPool
+from .clock_sync import ShowClock, ClockLeader, ClockFollower
+from .audio_input import AudioAnalyzer, AudioRouter
+from .engine_thread import EngineThread, TripleBuffer
@@ -0,0 +1,414 @@
+"""
+Audio-reactive modulation of segment parameters.
+
+An AudioAnalyzer reads 16-bit PCM in blocks from a WAV file or a raw pipe (e.g. stdin fed by
+ffmpeg) on a background thread. Each block is mixed to mono, windowed and transformed with one
+NumPy FFT; the power of each frequency band is summed from a cumulative spectrum, normalized by
+a slowly decaying peak (never far below the loudest band's) and smoothed with separate attack and
+release rates. No per-sample work is done in Python.
+
+The analyzer publishes every result by replacing a single reference (AudioAnalyzer.levels) with
+a new dictionary, which the render loop reads once per frame without taking a lock. An
+AudioRouter maps band levels onto segment parameters:
+
+    {"routes": [
+        {"band": "bass", "scene": 1, "effect": 1, "segment": 1, "param": "move_speed", "min": 10, "max": 120},
+        {"band": "high", "scene": 1, "effect": 1, "segment": 2, "param": "brightness", "min": 0.2, "max": 1.0}
+    ]}
+
+"brightness" scales the segment's own transparency values; "transparency" sets all of them.
+"move_speed" sets only the speed of a reflecting segment, which keeps the direction it is moving in.
+"""
+
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+import os
+import sys
+import threading
+import time
+import wave
+import numpy as np
+
+sys.path.append('..')
+from config import (
+    AUDIO_BLOCK_SIZE,
+    AUDIO_SAMPLE_RATE,
+    AUDIO_CHANNELS,
+    AUDIO_BANDS,
+    AUDIO_ATTACK,
+    AUDIO_RELEASE,
+    AUDIO_PEAK_DECAY,
+    AUDIO_BAND_FLOOR,
+)
+from models.scene_format import read_json
+from models.cue_list import apply_scene_cue
+from utils.file_cache import file_cache
+
+import logging
+
+logger = logging.getLogger("color_signal_system")
+
+AUDIO_ROUTE_PARAMS = ("move_speed", "transparency", "brightness", "dimmer_time_ratio")
+
+_SAMPLE_TYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+# Steps finer than the 8-bit output would only churn through segment templates
+_TRANSPARENCY_STEPS = 255.0
+
+
+class AudioAnalyzer:
+    """
+    AudioAnalyzer computes smoothed band levels (0.0 to 1.0) of an audio stream on a background thread.
+    """
+
+    def __init__(self, source: str, bands: Dict[str, List[float]] = None, block_size: int = AUDIO_BLOCK_SIZE,
+                 sample_rate: int = AUDIO_SAMPLE_RATE, channels: int = AUDIO_CHANNELS, loop: bool = False,
+                 attack: float = AUDIO_ATTACK, release: float = AUDIO_RELEASE, peak_decay: float = AUDIO_PEAK_DECAY,
+                 band_floor: float = AUDIO_BAND_FLOOR):
+        """
+        Initialize the analyzer.
+
+        Args:
+            source: Path to a WAV file, or "-" for raw little-endian 16-bit PCM on stdin
+            bands: Dictionary of band name -> [low Hz, high Hz] (default: AUDIO_BANDS)
+            block_size: Number of sample frames per analysis block
+            sample_rate: Sample rate of raw PCM input (WAV files carry their own)
+            channels: Channel count of raw PCM input (WAV files carry their own)
+            loop: Restart a WAV file when it ends
+            attack: Smoothing factor per block for rising levels (1.0: no smoothing)
+            release: Smoothing factor per block for falling levels
+            peak_decay: Factor per block by which the normalization peak decays
+            band_floor: Lowest normalization peak of a band, relative to the loudest band's peak
+        """
+        self.source = source
+        self.bands = dict(bands or AUDIO_BANDS)
+        self.block_size = block_size
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = 2
+        self.loop = loop
+        self.attack = attack
+        self.release = release
+        self.peak_decay = peak_decay
+        self.band_floor = band_floor
+
+        self.levels: Optional[Dict[str, float]] = None
+
+        self._window = np.hanning(block_size)
+        self._band_bins = None
+        self._peak = None
+        self._smoothed = None
+
+        self._stream: Optional[BinaryIO] = None
+        self._wave = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            'blocks': 0,
+            'stream_seconds': 0.0,
+            'analysis_ms': 0.0,
+            'loops': 0,
+            'finished': False
+        }
+
+    def _open(self):
+        if self.source == "-":
+            self._stream = sys.stdin.buffer
+            return
+
+        self._wave = wave.open(self.source, "rb")
+        self.sample_rate = self._wave.getframerate()
+        self.channels = self._wave.getnchannels()
+        self.sample_width = self._wave.getsampwidth()
+        if self.sample_width not in _SAMPLE_TYPES:
+            raise ValueError(f"Unsupported WAV sample width: {self.sample_width * 8} bits")
+
+    def _close(self):
+        if self._wave is not None:
+            self._wave.close()
+            self._wave = None
+        self._stream = None
+
+    def _read_block(self) -> bytes:
+        frame_bytes = self.channels * self.sample_width
+        if self._wave is not None:
+            data = self._wave.readframes(self.block_size)
+            if len(data) < self.block_size * frame_bytes and self.loop:
+                self._wave.rewind()
+                self.stats['loops'] += 1
+                data += self._wave.readframes(self.block_size - len(data) // frame_bytes)
+            return data
+        return self._stream.read(self.block_size * frame_bytes)
+
+    def _prepare(self):
+        frequencies = np.fft.rfftfreq(self.block_size, 1.0 / self.sample_rate)
+        edges = np.array([self.bands[name] for name in self.bands], dtype=np.float64).reshape(-1, 2)
+        low = np.searchsorted(frequencies, edges[:, 0], side='left')
+        high = np.searchsorted(frequencies, edges[:, 1], side='right')
+        self._band_bins = (low, np.maximum(high, low + 1))
+        self._peak = np.full(len(edges), 1e-12)
+        self._smoothed = np.zeros(len(edges))
+
+    def process_block(self, data: bytes) -> Dict[str, float]:
+        """
+        Analyze one block of interleaved PCM and publish the resulting levels.
+
+        Args:
+            data: Raw sample bytes in the stream's format; a short block is zero-padded
+
+        Returns:
+            Dictionary of band name -> level (0.0 to 1.0), plus "time" (stream position in seconds)
+        """
+        if self._band_bins is None:
+            self._prepare()
+
+        samples = np.frombuffer(data[:len(data) - len(data) % (self.channels * self.sample_width)],
+                                dtype=_SAMPLE_TYPES[self.sample_width])
+        if self.sample_width == 1:
+            samples = samples.astype(np.float64) - 128.0
+        samples = samples.reshape(-1, self.channels).mean(axis=1)
+
+        block = np.zeros(self.block_size)
+        block[:len(samples)] = samples[:self.block_size]
+        spectrum = np.abs(np.fft.rfft(block * self._window)) ** 2
+
+        low, high = self._band_bins
+        cumulative = np.concatenate(([0.0], np.cumsum(spectrum)))
+        energy = (cumulative[np.minimum(high, len(spectrum))] - cumulative[np.minimum(low, len(spectrum))]) / (high - low)
+
+        self._peak = np.maximum(energy, self._peak * self.peak_decay)
+        # A band that is near silent next to the others must not be scaled up to full level
+        level = energy / np.maximum(self._peak, self._peak.max() * self.band_floor)
+        rate = np.where(level > self._smoothed, self.attack, self.release)
+        self._smoothed = self._smoothed + (level - self._smoothed) * rate
+
+        self.stats['blocks'] += 1
+        self.stats['stream_seconds'] += len(samples) / float(self.sample_rate)
+
+        levels = dict(zip(self.bands, self._smoothed.tolist()))
+        levels['time'] = self.stats['stream_seconds']
+        # Publish by swapping the reference; readers never see a partly written dictionary
+        self.levels = levels
+        return levels
+
+    def start(self):
+        """
+        Open the source and start analyzing on a background thread.
+
+        Raises:
+            OSError, ValueError, wave.Error: If the source cannot be opened
+        """
+        if self._thread is not None:
+            return
+
+        self._open()
+        self._prepare()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-input")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Audio input started: {self.source} ({self.sample_rate} Hz, {self.channels} channels, "
+                    f"bands {', '.join(self.bands)})")
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stop analyzing.
+
+        Args:
+            timeout: Maximum time to wait for the reader thread
+        """
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._close()
+
+    def _run(self):
+        started = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                data = self._read_block()
+                if not data:
+                    break
+
+                analysis_start = time.perf_counter()
+                self.process_block(data)
+                self.stats['analysis_ms'] = (time.perf_counter() - analysis_start) * 1000.0
+
+                # Files and decoder pipes deliver faster than real time; pace them to the stream position
+                delay = started + self.stats['stream_seconds'] - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+        except Exception as e:
+            logger.error(f"Error reading audio input {self.source}: {e}")
+        finally:
+            self.stats['finished'] = True
+
+        self.levels = dict.fromkeys(self.bands, 0.0)
+        logger.info(f"Audio input {self.source} ended after {self.stats['stream_seconds']:.1f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get a copy of the analyzer counters.
+
+        Returns:
+            Dictionary of counter name -> value
+        """
+        return dict(self.stats)
+
+
+def validate_audio_routes(data: Dict[str, Any]):
+    """
+    Check the structure of an audio route file.
+
+    Args:
+        data: Dictionary with a "routes" list and optional "bands"
+
+    Raises:
+        ValueError: If the routes are malformed
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("routes"), list):
+        raise ValueError("Audio route file must contain a list of routes")
+    bands = data.get("bands", AUDIO_BANDS)
+    if not isinstance(bands, dict) or any(not isinstance(edges, list) or len(edges) != 2 for edges in bands.values()):
+        raise ValueError("Audio bands must map names to [low, high] frequencies")
+
+    for index, route in enumerate(data["routes"]):
+        if not isinstance(route, dict):
+            raise ValueError(f"Audio route {index} must be an object")
+        missing = [field for field in ("band", "effect", "segment", "param") if field not in route]
+        if missing:
+            raise ValueError(f"Audio route {index} is missing {', '.join(missing)}")
+        if route["band"] not in bands:
+            raise ValueError(f"Audio route {index} uses unknown band {route['band']}")
+        if route["param"] not in AUDIO_ROUTE_PARAMS:
+            raise ValueError(f"Audio route {index} cannot modulate {route['param']}")
+
+
+class AudioRouter:
+    """
+    AudioRouter applies the latest band levels of an AudioAnalyzer to segment parameters once per frame.
+    """
+
+    def __init__(self, analyzer: AudioAnalyzer, routes: List[Dict[str, Any]], scene_manager=None,
+                 scenes: Optional[Dict[int, Any]] = None):
+        """
+        Initialize the router.
+
+        Args:
+            analyzer: Analyzer publishing the band levels
+            routes: Route dictionaries (see the module docstring)
+            scene_manager: SceneManager whose scenes are modulated
+            scenes: Dictionary of scene_ID -> LightScene, when there is no scene manager
+        """
+        self.analyzer = analyzer
+        self.routes = [dict(route) for route in routes]
+        self.scene_manager = scene_manager
+        self._scenes = scenes if scenes is not None else {}
+        self.on_scene_cue: Optional[Callable[[int, Dict[str, Any]], None]] = None
+
+        self._last_levels = None
+        self._base_transparency: Dict[tuple, tuple] = {}
+        self._written_transparency: Dict[tuple, tuple] = {}
+
+        self.stats = {
+            'frames': 0,
+            'applied': 0,
+            'errors': 0
+        }
+
+    @classmethod
+    def load_from_json(cls, file_path: str, source: str, scene_manager=None, scenes=None, **analyzer_args) -> 'AudioRouter':
+        """
+        Create an analyzer and router from an audio route file.
+
+        Args:
+            file_path: Path to the JSON route file
+            source: Audio source for the analyzer (WAV path or "-")
+            scene_manager: SceneManager whose scenes are modulated
+            scenes: Dictionary of scene_ID -> LightScene, when there is no scene manager
+            **analyzer_args: Further AudioAnalyzer arguments
+
+        Returns:
+            A new AudioRouter with a stopped analyzer
+        """
+        data = file_cache.get(file_path, "audio_routes", read_json, validate_audio_routes)
+        analyzer = AudioAnalyzer(source, bands=data.get("bands"), **analyzer_args)
+        return cls(analyzer, data["routes"], scene_manager=scene_manager, scenes=scenes)
+
+    @property
+    def scenes(self) -> Dict[int, Any]:
+        return self.scene_manager.scenes if self.scene_manager is not None else self._scenes
+
+    def poll(self):
+        """
+        Apply the latest levels to the routed parameters. Call once per frame before updating
+        the scenes; it can be registered as a SceneManager frame hook.
+        """
+        levels = self.analyzer.levels
+        if levels is None or levels is self._last_levels:
+            return
+        self._last_levels = levels
+        self.stats['frames'] += 1
+
+        for route in self.routes:
+            try:
+                self._apply_route(route, levels[route["band"]])
+                self.stats['applied'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.debug(f"Error applying audio route {route}: {e}")
+
+    def _apply_route(self, route: Dict[str, Any], level: float):
+        scene_ID = route.get("scene")
+        if scene_ID is None and self.scene_manager is not None:
+            scene_ID = self.scene_manager.current_scene
+        if scene_ID is None and len(self._scenes) == 1:
+            scene_ID = next(iter(self._scenes.keys()))
+        scene = self.scenes[scene_ID]
+
+        low = route.get("min", 0.0)
+        high = route.get("max", 1.0)
+        value = low + (high - low) * level
+        param_name = route["param"]
+
+        if param_name in ("transparency", "brightness"):
+            segment = scene.effects[route["effect"]].segments[route["segment"]]
+            key = (scene_ID, route["effect"], route["segment"])
+            if param_name == "brightness":
+                base = self._base_transparency.get(key)
+                current = tuple(segment.transparency)
+                if base is None or current != self._written_transparency.get(key):
+                    # Set by something other than this router (OSC, a cue, a config reload): scale the new values
+                    base = current
+                    self._base_transparency[key] = base
+            else:
+                base = (1.0,) * len(segment.transparency)
+            value = [round(min(1.0, max(0.0, item * value)) * _TRANSPARENCY_STEPS) / _TRANSPARENCY_STEPS
+                     for item in base]
+            param_name = "transparency"
+
+        cue = {"action": "segment", "effect": route["effect"], "segment": route["segment"],
+               "param": param_name, "value": value}
+        if param_name == "move_speed":
+            # Applied where the segment is live (in a render worker with a pool), so the bounce direction is current
+            cue["keep_direction"] = True
+        apply_scene_cue(scene, cue)
+        if param_name == "transparency":
+            self._written_transparency[key] = tuple(segment.transparency)
+        if self.on_scene_cue:
+            self.on_scene_cue(scene_ID, cue)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get a copy of the router and analyzer counters.
+
+        Returns:
+            Dictionary of counter name -> value, with the analyzer counters under "analyzer"
+        """
+        stats = dict(self.stats)
+        stats['analyzer'] = self.analyzer.get_stats()
+        stats['levels'] = self.analyzer.levels
+        return stats
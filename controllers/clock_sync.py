@@ -0,0 +1,400 @@
+"""
+Show clock shared by several render nodes.
+
+Every node paces its frames with a ShowClock: show time runs from the moment the node started,
+and frame N is due at show time N / fps. In sync mode one node runs a ClockLeader, which
+broadcasts its show time and frame counter over UDP; the other nodes run a ClockFollower,
+which estimates the offset between the leader's clock and its own and disciplines the local
+ShowClock towards it. Large errors are corrected with a single step, small ones are slewed
+so the frame pacing stays smooth.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+import socket
+import struct
+import sys
+import threading
+import time
+
+sys.path.append('..')
+from config import (
+    CLOCK_SYNC_INTERVAL,
+    CLOCK_SYNC_WINDOW,
+    CLOCK_SYNC_STEP_THRESHOLD,
+    CLOCK_SYNC_SLEW_GAIN,
+    CLOCK_SYNC_TIMEOUT,
+)
+
+import logging
+
+logger = logging.getLogger("color_signal_system")
+
+CLOCK_PACKET = struct.Struct("!4sIdQd")
+CLOCK_MAGIC = b"TLCK"
+
+
+def parse_sync_targets(targets: str) -> List[Tuple[str, int]]:
+    """
+    Parse a comma-separated list of host:port targets.
+
+    Args:
+        targets: e.g. "192.168.1.255:9200,127.0.0.1:9201"
+
+    Returns:
+        List of (host, port) tuples
+
+    Raises:
+        ValueError: If a target has no valid port
+    """
+    result = []
+    for target in targets.split(","):
+        target = target.strip()
+        if not target:
+            continue
+        host, _, port = target.rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Invalid sync target (expected host:port): {target}")
+        result.append((host, int(port)))
+    return result
+
+
+class ShowClock:
+    """
+    ShowClock is a monotonic clock counting seconds since the start of the show.
+    Its offset can be stepped or slewed to follow another node's clock.
+    """
+
+    def __init__(self, fps: float):
+        """
+        Initialize the clock at show time 0.
+
+        Args:
+            fps: Output frame rate used to number frames
+        """
+        self.fps = float(fps)
+        self.offset = -time.monotonic()
+
+    def now(self) -> float:
+        """
+        Get the current show time.
+
+        Returns:
+            Show time in seconds
+        """
+        return time.monotonic() + self.offset
+
+    def frame(self, show_time: Optional[float] = None) -> int:
+        """
+        Get the number of the frame due at a show time.
+
+        Args:
+            show_time: Show time in seconds (default: now)
+
+        Returns:
+            Frame number
+        """
+        return int((self.now() if show_time is None else show_time) * self.fps)
+
+    def frame_time(self, frame: int) -> float:
+        """
+        Get the show time at which a frame is due.
+
+        Args:
+            frame: Frame number
+
+        Returns:
+            Show time in seconds
+        """
+        return frame / self.fps
+
+    def sleep_until(self, show_time: float):
+        """
+        Sleep until a show time, e.g. the time the next frame is due.
+
+        Args:
+            show_time: Show time in seconds
+        """
+        delay = show_time - self.now()
+        if delay > 0:
+            time.sleep(delay)
+
+    def correct(self, error: float, step_threshold: float = CLOCK_SYNC_STEP_THRESHOLD,
+                gain: float = CLOCK_SYNC_SLEW_GAIN) -> float:
+        """
+        Move the clock towards a reference clock.
+
+        Args:
+            error: Reference show time minus local show time, in seconds
+            step_threshold: Errors larger than this are corrected at once
+            gain: Fraction of a smaller error corrected per call
+
+        Returns:
+            Applied correction in seconds
+        """
+        correction = error if abs(error) > step_threshold else error * gain
+        self.offset += correction
+        return correction
+
+
+class ClockLeader:
+    """
+    ClockLeader broadcasts the local show clock to follower nodes from a background thread.
+    """
+
+    def __init__(self, clock: ShowClock, targets: List[Tuple[str, int]], interval: float = CLOCK_SYNC_INTERVAL):
+        """
+        Initialize the leader.
+
+        Args:
+            clock: Local show clock
+            targets: (host, port) destinations; broadcast addresses are allowed
+            interval: Seconds between clock packets
+        """
+        self.clock = clock
+        self.targets = list(targets)
+        self.interval = interval
+
+        self._socket = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._sequence = 0
+
+        self.stats = {
+            'packets': 0,
+            'send_errors': 0
+        }
+
+    def start(self):
+        """
+        Start broadcasting.
+        """
+        if self._thread is not None:
+            return
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="clock-leader")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Clock leader sending to {', '.join(f'{host}:{port}' for host, port in self.targets)}")
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stop broadcasting.
+
+        Args:
+            timeout: Maximum time to wait for the sender thread
+        """
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._socket.close()
+        self._socket = None
+
+    def make_packet(self) -> bytes:
+        """
+        Build a clock packet for the current show time.
+
+        Returns:
+            Packet bytes
+        """
+        self._sequence = (self._sequence + 1) & 0xFFFFFFFF
+        show_time = self.clock.now()
+        return CLOCK_PACKET.pack(CLOCK_MAGIC, self._sequence, show_time,
+                                 self.clock.frame(show_time), self.clock.fps)
+
+    def _run(self):
+        while not self._stop.is_set():
+            packet = self.make_packet()
+            for target in self.targets:
+                try:
+                    self._socket.sendto(packet, target)
+                    self.stats['packets'] += 1
+                except OSError as e:
+                    self.stats['send_errors'] += 1
+                    logger.debug(f"Error sending clock packet to {target}: {e}")
+
+            self._stop.wait(self.interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get a copy of the leader counters.
+
+        Returns:
+            Dictionary of counter name -> value
+        """
+        stats = dict(self.stats)
+        stats['role'] = "leader"
+        stats['show_time'] = self.clock.now()
+        stats['frame'] = self.clock.frame()
+        return stats
+
+
+class ClockFollower:
+    """
+    ClockFollower receives a leader's clock packets and disciplines the local show clock.
+
+    Each packet gives one sample of the leader's show time minus the local show time at arrival.
+    Network delay only ever makes that sample smaller, so the largest sample of the recent
+    window is used as the offset estimate. Jitter is the smoothed variation between
+    consecutive samples (as in RTP). The one-way delay itself cannot be measured this way;
+    on a LAN it is well below a frame.
+    """
+
+    def __init__(self, clock: ShowClock, port: int, host: str = "0.0.0.0",
+                 window: int = CLOCK_SYNC_WINDOW, timeout: float = CLOCK_SYNC_TIMEOUT):
+        """
+        Initialize the follower.
+
+        Args:
+            clock: Local show clock to discipline
+            port: UDP port to receive clock packets on
+            host: Interface to listen on
+            window: Number of recent samples used for the offset estimate
+            timeout: Seconds without packets after which the follower counts as unlocked
+        """
+        self.clock = clock
+        self.port = port
+        self.host = host
+        self.timeout = timeout
+
+        self._samples = deque(maxlen=max(1, window))
+        self._last_sample = None
+        self._last_sequence = None
+        self._last_packet_time = None
+        self._socket = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            'packets': 0,
+            'lost': 0,
+            'invalid': 0,
+            'steps': 0,
+            'offset_ms': 0.0,
+            'jitter_ms': 0.0,
+            'frame_error': 0,
+            'leader_fps': None
+        }
+
+    def start(self):
+        """
+        Start receiving clock packets.
+        """
+        if self._thread is not None:
+            return
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.settimeout(0.2)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="clock-follower")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Clock follower listening on {self.host}:{self.port}")
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stop receiving clock packets.
+
+        Args:
+            timeout: Maximum time to wait for the receiver thread
+        """
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._socket.close()
+        self._socket = None
+
+    @property
+    def locked(self) -> bool:
+        return self._last_packet_time is not None and time.monotonic() - self._last_packet_time < self.timeout
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data, _ = self._socket.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            self.handle_packet(data, self.clock.now())
+
+    def handle_packet(self, data: bytes, arrival_time: float):
+        """
+        Process one clock packet.
+
+        Args:
+            data: Packet bytes
+            arrival_time: Local show time at which the packet arrived
+        """
+        if len(data) != CLOCK_PACKET.size:
+            self.stats['invalid'] += 1
+            return
+
+        magic, sequence, leader_time, leader_frame, leader_fps = CLOCK_PACKET.unpack(data)
+        if magic != CLOCK_MAGIC:
+            self.stats['invalid'] += 1
+            return
+
+        if self._last_sequence is not None:
+            gap = (sequence - self._last_sequence) & 0xFFFFFFFF
+            if gap == 0 or gap > 0x7FFFFFFF:
+                return
+            self.stats['lost'] += gap - 1
+        self._last_sequence = sequence
+        self._last_packet_time = time.monotonic()
+        self.stats['packets'] += 1
+
+        if leader_fps != self.stats['leader_fps']:
+            if leader_fps != self.clock.fps:
+                logger.warning(f"Clock leader runs at {leader_fps} fps, this node at {self.clock.fps} fps")
+            self.stats['leader_fps'] = leader_fps
+
+        sample = leader_time - arrival_time
+        if self._last_sample is not None:
+            jitter = self.stats['jitter_ms'] / 1000.0
+            jitter += (abs(sample - self._last_sample) - jitter) / 16.0
+            self.stats['jitter_ms'] = jitter * 1000.0
+        self._last_sample = sample
+
+        # Samples taken before a correction are relative to the old offset
+        self._samples.append(sample)
+        error = max(self._samples)
+        self.stats['offset_ms'] = error * 1000.0
+        self.stats['frame_error'] = int(leader_frame) - self.clock.frame(arrival_time)
+
+        correction = self.clock.correct(error)
+        if abs(error) > CLOCK_SYNC_STEP_THRESHOLD:
+            self.stats['steps'] += 1
+            logger.info(f"Show clock stepped by {error * 1000.0:.1f} ms to follow the leader")
+
+        self._samples = deque((value - correction for value in self._samples), maxlen=self._samples.maxlen)
+        self._last_sample -= correction
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get a copy of the follower counters.
+
+        Returns:
+            Dictionary of counter name -> value; offset_ms is the leader's clock minus the
+            local clock before the latest correction
+        """
+        stats = dict(self.stats)
+        stats['role'] = "follower"
+        stats['locked'] = self.locked
+        stats['show_time'] = self.clock.now()
+        stats['frame'] = self.clock.frame()
+        return stats
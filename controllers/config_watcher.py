@@ -0,0 +1,317 @@
+"""
+Hot reload of the scene configuration file.
+
+FileWatcher reports changes to a single file, using inotify on Linux and falling back to
+polling the file's (mtime, size) elsewhere. ConfigReloader parses the changed file and diffs
+it against the live scene on the watcher thread; the render loop then calls apply_pending()
+between frames so only the changed fields are applied and running animations are preserved.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+
+sys.path.append('..')
+from config import CONFIG_WATCH_POLL_INTERVAL, CONFIG_WATCH_SETTLE_TIME
+from models.light_scene import LightScene
+from models.scene_diff import diff_scene, apply_scene_changes
+from models.scene_format import is_compact_scene_file, read_compact_scene, read_json, validate_scene_data
+from utils.file_cache import file_cache
+
+import logging
+
+logger = logging.getLogger("color_signal_system")
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """
+    FileWatcher calls a function from a background thread whenever a file changes.
+    The parent directory is watched rather than the file itself, so editors and
+    atomic saves that replace the file with a new one are detected as well.
+    """
+
+    def __init__(self, file_path: str, on_change: Callable[[], None],
+                 poll_interval: float = CONFIG_WATCH_POLL_INTERVAL,
+                 settle_time: float = CONFIG_WATCH_SETTLE_TIME,
+                 use_inotify: bool = True):
+        """
+        Initialize the watcher.
+
+        Args:
+            file_path: File to watch
+            on_change: Called on the watcher thread after the file changed
+            poll_interval: Seconds between checks when polling
+            settle_time: Quiet time in seconds to wait after a change so bursts of writes are reported once
+            use_inotify: Whether to use inotify when it is available
+        """
+        self.file_path = os.path.abspath(file_path)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.use_inotify = use_inotify
+        self.backend = None
+
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+
+    def start(self):
+        """
+        Start watching on a daemon thread.
+        """
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._fd = self._open_inotify() if self.use_inotify else None
+        self.backend = "inotify" if self._fd is not None else "poll"
+
+        self._thread = threading.Thread(target=self._run, name="config-watcher")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Watching {self.file_path} for changes ({self.backend})")
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stop watching.
+
+        Args:
+            timeout: Maximum time to wait for the watcher thread
+        """
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.file_path)
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError:
+            return None
+
+    def _open_inotify(self) -> Optional[int]:
+        libc = _load_inotify()
+        if libc is None:
+            return None
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+
+        directory = os.path.dirname(self.file_path).encode()
+        if libc.inotify_add_watch(fd, directory, IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            os.close(fd)
+            return None
+
+        return fd
+
+    def _wait_inotify(self) -> bool:
+        name = os.path.basename(self.file_path).encode()
+        readable, _, _ = select.select([self._fd], [], [], self.poll_interval)
+        if not readable:
+            return False
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+
+        offset = 0
+        touched = False
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            if data[offset:offset + length].rstrip(b"\0") == name:
+                touched = True
+            offset += length
+        return touched
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._fd is not None:
+                if not self._wait_inotify():
+                    continue
+            elif self._stop.wait(self.poll_interval):
+                break
+
+            if self._stat() == self._signature:
+                continue
+
+            while not self._stop.wait(self.settle_time):
+                signature = self._stat()
+                if signature == self._signature:
+                    break
+                self._signature = signature
+
+            if self._stop.is_set() or self._signature is None:
+                continue
+
+            try:
+                self.on_change()
+            except Exception as e:
+                logger.error(f"Error handling change of {self.file_path}: {e}")
+
+
+class ConfigReloader:
+    """
+    ConfigReloader keeps a live scene in sync with its configuration file.
+    Parsing and diffing happen on the watcher thread; apply_pending() must be called
+    from the render loop between frames. The scene is looked up by ID on every reload,
+    so changes reach it even after OSC loads replaced the scene object.
+    """
+
+    def __init__(self, file_path: str, light_scenes: Dict[int, LightScene], scene_ID: int,
+                 journal=None, use_inotify: bool = True):
+        """
+        Initialize the reloader.
+
+        Args:
+            file_path: Scene file passed via --config-file (JSON or compact)
+            light_scenes: Dictionary of scene_ID -> LightScene shared with the OSC handler
+            scene_ID: ID of the scene loaded from that file
+            journal: Optional StateJournal recording reloaded scenes
+            use_inotify: Whether to use inotify when it is available
+        """
+        self.file_path = file_path
+        self.light_scenes = light_scenes
+        self.scene_ID = scene_ID
+        self.journal = journal
+        self.watcher = FileWatcher(file_path, self.reload, use_inotify=use_inotify)
+
+        self._pending: Optional[Tuple[LightScene, Dict, List]] = None
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'reloads': 0,
+            'applied_changes': 0,
+            'errors': 0
+        }
+
+    @property
+    def scene(self) -> Optional[LightScene]:
+        """
+        Get the live scene kept in sync with the file.
+
+        Returns:
+            Current scene with the configured ID, or None if it was removed
+        """
+        return self.light_scenes.get(self.scene_ID)
+
+    def start(self):
+        """
+        Start watching the configuration file.
+        """
+        self.watcher.start()
+
+    def stop(self):
+        """
+        Stop watching the configuration file.
+        """
+        self.watcher.stop()
+
+    def reload(self):
+        """
+        Parse the configuration file and compute the changes against the live scene.
+        Invalid files are logged and ignored so the running show is not affected.
+        """
+        try:
+            if is_compact_scene_file(self.file_path):
+                header, effect_loaders = file_cache.get(
+                    self.file_path, "scene_compact", read_compact_scene,
+                    lambda parsed: validate_scene_data(parsed[0])
+                )
+                data = dict(header)
+                data["effects"] = {str(effect_id): loader() for effect_id, loader in effect_loaders.items()}
+            else:
+                data = file_cache.get(self.file_path, "scene_json", read_json, validate_scene_data)
+
+            scene = self.scene
+            if scene is None:
+                logger.warning(f"Scene {self.scene_ID} no longer exists; ignoring {self.file_path}")
+                return
+            changes = diff_scene(scene, data)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Ignoring invalid configuration in {self.file_path}: {e}")
+            return
+
+        self.stats['reloads'] += 1
+        if not changes:
+            logger.info(f"Configuration reloaded from {self.file_path}: no changes")
+            return
+
+        with self._lock:
+            self._pending = (scene, data, changes)
+        logger.info(f"Configuration reloaded from {self.file_path}: {len(changes)} changes queued")
+
+    def apply_pending(self) -> int:
+        """
+        Apply the latest reloaded changes to the live scene.
+        Call between frames from the thread that updates the scene.
+
+        Returns:
+            Number of applied changes
+        """
+        if self._pending is None:
+            return 0
+
+        with self._lock:
+            diffed_scene, data, changes = self._pending
+            self._pending = None
+
+        scene = self.scene
+        if scene is None:
+            logger.warning(f"Scene {self.scene_ID} no longer exists; reloaded configuration not applied")
+            return 0
+
+        try:
+            if scene is not diffed_scene:
+                # The scene was replaced after the file was diffed; diff against the new one
+                changes = diff_scene(scene, data)
+                if not changes:
+                    return 0
+            apply_scene_changes(scene, changes)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Error applying reloaded configuration: {e}")
+            return 0
+
+        self.stats['applied_changes'] += len(changes)
+        if self.journal is not None:
+            self.journal.record("scene", scene=scene.scene_ID, data=scene.to_dict())
+
+        return len(changes)
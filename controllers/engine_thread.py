@@ -0,0 +1,219 @@
+"""
+Render engine running independently of the simulator window.
+
+An EngineThread runs the frame hooks, advances the scenes and sends the hardware frame at the
+output frame rate on its own thread, the way the headless loop does. Every finished frame is
+published through a TripleBuffer, from which the simulator picks up the latest frame at its own
+refresh rate. Drawing, widget updates and window events therefore never delay the hardware
+output; a slow GUI frame only means some frames are never shown on screen.
+
+The frame hooks (config reloads, cues, audio routes) run on the engine thread and change the
+scenes, so the GUI holds EngineThread.lock, which the engine holds for each step, while it
+changes or reads the model: when handling events, refreshing or rebuilding widgets and drawing
+the overlays. It is never held across file dialogs. If the GUI holds the lock for longer than
+half a frame, e.g. while rebuilding the widgets, the engine sends the previous frame again
+instead of skipping the output, and the animation catches up on the next step.
+"""
+
+from typing import Any, Dict, Optional
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.append('..')
+from config import DEFAULT_FPS
+from models.animation_clock import AnimationClock
+
+import logging
+logger = logging.getLogger("color_signal_system")
+
+
+class TripleBuffer:
+    """
+    TripleBuffer passes frames from one writer thread to one reader thread without either
+    waiting for the other. The writer fills its back slot and swaps it with the middle slot;
+    the reader swaps the middle slot with its front slot when a newer frame is there. Only the
+    slot indices are exchanged under the lock, never the frame data.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty buffer.
+        """
+        self._slots = [None, None, None]
+        self._back = 0
+        self._middle = 1
+        self._front = 2
+        self._fresh = False
+        self._lock = threading.Lock()
+
+        self.written = 0
+        self.read_count = 0
+
+    def write(self, frame: np.ndarray):
+        """
+        Publish a frame. The frame is copied, so the caller may reuse its array.
+
+        Args:
+            frame: Frame to publish
+        """
+        slot = self._slots[self._back]
+        if slot is None or slot.shape != frame.shape or slot.dtype != frame.dtype:
+            slot = np.empty_like(frame)
+            self._slots[self._back] = slot
+        np.copyto(slot, frame)
+
+        with self._lock:
+            self._back, self._middle = self._middle, self._back
+            self._fresh = True
+            self.written += 1
+
+    def read(self) -> Optional[np.ndarray]:
+        """
+        Get the latest published frame. The array stays unchanged until the next call to read.
+
+        Returns:
+            Latest frame, or None if nothing has been published yet
+        """
+        with self._lock:
+            if self._fresh:
+                self._front, self._middle = self._middle, self._front
+                self._fresh = False
+                self.read_count += 1
+        return self._slots[self._front]
+
+
+class EngineThread:
+    """
+    EngineThread renders a SceneManager at a fixed output frame rate on a background thread.
+    """
+
+    def __init__(self, scene_manager, fps: int = DEFAULT_FPS, osc_handler=None):
+        """
+        Initialize the engine.
+
+        Args:
+            scene_manager: SceneManager to render; its frame hooks run on the engine thread
+            fps: Output frame rate
+            osc_handler: OSCHandler that sends each frame to the hardware (None: no output)
+        """
+        self.scene_manager = scene_manager
+        self.fps = fps
+        self.osc_handler = osc_handler
+        self.playing = True
+
+        self.lock = threading.RLock()
+        self.frames = TripleBuffer()
+        self.animation_clock = AnimationClock()
+        self._last_frame = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            'frames': 0,
+            'late_frames': 0,
+            'held_frames': 0,
+            'step_ms': 0.0,
+            'max_step_ms': 0.0
+        }
+
+    def start(self):
+        """
+        Start rendering on a background thread.
+        """
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self.animation_clock.reset()
+        self._thread = threading.Thread(target=self._run, name="render-engine")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Render engine started at {self.fps} FPS")
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stop rendering.
+
+        Args:
+            timeout: Maximum time to wait for the engine thread
+        """
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info(f"Render engine stats: {self.get_stats()}")
+
+    def step(self):
+        """
+        Render one frame: run the frame hooks, advance the scenes, publish the frame and send it
+        to the hardware.
+        """
+        step_start = time.perf_counter()
+
+        if not self.lock.acquire(timeout=0.5 / max(1, self.fps)):
+            # The GUI is changing the model; repeat the previous frame rather than send none
+            self.stats['held_frames'] += 1
+            if self._last_frame is not None and self.osc_handler is not None:
+                self.osc_handler.send_led_binary_data(self._last_frame)
+            return
+
+        try:
+            self.scene_manager.run_frame_hooks()
+
+            if self.playing:
+                dt, catch_up = self.animation_clock.tick()
+                if catch_up > 0:
+                    self.scene_manager.fast_forward(catch_up)
+                self.scene_manager.update(dt)
+            else:
+                self.animation_clock.reset()
+
+            frame = self.scene_manager.get_led_array()
+        finally:
+            self.lock.release()
+
+        self._last_frame = frame
+        self.frames.write(frame)
+
+        if self.osc_handler is not None:
+            self.osc_handler.send_led_binary_data(frame)
+
+        step_ms = (time.perf_counter() - step_start) * 1000.0
+        self.stats['frames'] += 1
+        self.stats['step_ms'] += (step_ms - self.stats['step_ms']) * 0.1
+        self.stats['max_step_ms'] = max(self.stats['max_step_ms'], step_ms)
+
+    def _run(self):
+        next_frame = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                logger.error(f"Error rendering frame: {e}")
+
+            interval = 1.0 / max(1, self.fps)
+            next_frame += interval
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            elif delay < -interval:
+                # Missed frames are not rendered late; the animation clock catches up instead
+                self.stats['late_frames'] += 1
+                next_frame = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get a copy of the engine counters.
+
+        Returns:
+            Dictionary of counter name -> value
+        """
+        stats = dict(self.stats)
+        stats['published'] = self.frames.written
+        stats['displayed'] = self.frames.read_count
+        return stats
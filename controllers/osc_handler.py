@@ -3,14 +3,18 @@ import re
 import sys
 import threading
 import json
-import struct
 import random
 from pythonosc import dispatcher, osc_server, udp_client
 
 sys.path.append('..')
+from controllers.osc_sender import OSCSendQueue
+from utils.save_worker import SaveWorker
+from utils.file_utils import write_json_atomic
+from utils.file_cache import file_cache
 from models.light_effect import LightEffect
 from models.light_segment import LightSegment
 from models.light_scene import LightScene
+from models.fixture_layout import pack_rgbx
 from config import (
     DEFAULT_LED_COUNT,
     DEFAULT_FPS,
@@ -49,7 +53,7 @@ class OSCHandler:
     """
     
     def __init__(self, light_scenes: Dict[int, LightScene] = None, ip: str = "127.0.0.1", 
-                 in_port: int = IN_PORT, out_port: int = OUT_PORT):
+                 in_port: int = IN_PORT, out_port: int = OUT_PORT, journal=None, layout=None):
         """
         Initialize the OSC handler.
         
@@ -58,6 +62,8 @@ class OSCHandler:
             ip: IP address to listen on
             in_port: Port to listen for incoming OSC messages
             out_port: Port to send outgoing OSC messages (uses in_port if None)
+            journal: Optional StateJournal recording every applied change
+            layout: Optional FixtureLayout splitting the LED output over physical strips
         """
         self.light_scenes = light_scenes or {1: LightScene(scene_ID=1)}
         self.ip = ip
@@ -71,6 +77,13 @@ class OSCHandler:
         self.server_thread = None
         
         self.client = udp_client.SimpleUDPClient(ip, self.out_port)
+        self.reply_queue = OSCSendQueue(self.client)
+        self.save_worker = SaveWorker()
+        self.journal = journal
+        self.layout = layout
+        self.render_pool = None
+        self.scene_manager = None
+        self.clock_sync = None
         
         self.led_binary_client = udp_client.SimpleUDPClient(LED_BINARY_OUT_IP, LED_BINARY_OUT_PORT)
         
@@ -106,6 +119,10 @@ class OSCHandler:
         self.dispatcher.map("/scene/*/remove_effect", self.scene_remove_effect_callback)
         self.dispatcher.map("/scene/*/change_effect", self.scene_change_effect_callback)
         
+        # Layer Management
+        self.dispatcher.map("/scene/*/layer/*/*", self.scene_layer_callback)
+        self.dispatcher.map("/scene/*/clear_layers", self.scene_clear_layers_callback)
+        
         # Segment Management
         self.dispatcher.map("/scene/*/effect/*/add_segment", self.scene_effect_add_segment_callback)
         self.dispatcher.map("/scene/*/effect/*/remove_segment", self.scene_effect_remove_segment_callback)
@@ -122,6 +139,9 @@ class OSCHandler:
         self.dispatcher.map("/effect/*/object/*/*", self.legacy_effect_object_callback)
         self.dispatcher.map("/palette/*", self.legacy_palette_callback)
         self.dispatcher.map("/request/init", self.init_callback)
+        self.dispatcher.map("/request/send_stats", self.send_stats_callback)
+        self.dispatcher.map("/request/cache_stats", self.cache_stats_callback)
+        self.dispatcher.map("/request/sync_stats", self.sync_stats_callback)
         
         # Binary data output
         self.dispatcher.map("/update_serial_output", self.update_serial_output_callback)
@@ -131,6 +151,7 @@ class OSCHandler:
         Start the OSC server in a separate thread.
         """
         try:
+            self.reply_queue.start()
             self.server = osc_server.ThreadingOSCUDPServer((self.ip, self.in_port), self.dispatcher)
             self.server_thread = threading.Thread(target=self.server.serve_forever)
             self.server_thread.daemon = True
@@ -148,6 +169,12 @@ class OSCHandler:
         if self.server:
             self.server.shutdown()
             logger.info("OSC server stopped")
+            
+        if not self.save_worker.wait(timeout=5.0):
+            logger.warning(f"{self.save_worker.pending()} background saves still pending at shutdown")
+            
+        self.reply_queue.stop()
+        logger.info(f"OSC reply queue stopped - stats: {self.reply_queue.get_stats()}")
 
     def set_simulator(self, simulator):
         """
@@ -158,19 +185,50 @@ class OSCHandler:
         """
         self.simulator = simulator
 
-    def make_color_binary(self, colors):
-        response_data = b""
+    def _journal(self, op: str, **fields):
+        """
+        Record an applied change in the state journal and forward it to the render pool,
+        if they are configured.
         
-        for color in colors:
-            r = max(0, min(255, int(color[0])))
-            g = max(0, min(255, int(color[1])))
-            b = max(0, min(255, int(color[2])))
+        Args:
+            op: Journal operation name
+            **fields: Operation fields
+        """
+        if self.journal is not None:
+            self.journal.record(op, **fields)
+        if self.render_pool is not None:
+            self.render_pool.submit(op, **fields)
+    
+    def _journal_palettes(self, scene_id: int, scene: LightScene, current_palette: str = None):
+        self._journal("palettes", scene=scene_id, palettes=scene.palettes,
+                      current_palette=current_palette or scene.current_palette)
+
+    def make_color_binary(self, colors):
+        return pack_rgbx(colors)
+
+    def _current_led_colors(self):
+        led_colors = None
+        
+        if self.render_pool is not None and self.render_pool.frame is not None:
+            led_colors = self.render_pool.frame
+        elif self.simulator and hasattr(self.simulator, 'scene_manager') and self.simulator.scene_manager:
+            led_colors = self.simulator.scene_manager.get_led_array()
+        elif self.scene_manager is not None:
+            led_colors = self.scene_manager.get_led_array()
+        elif self.light_scenes:
+            current_scene_id = None
+            if self.simulator and hasattr(self.simulator, 'active_scene_id'):
+                current_scene_id = self.simulator.active_scene_id
             
-            response_data += struct.pack("BBBB", r, g, b, 0)
+            if current_scene_id is None and self.light_scenes:
+                current_scene_id = min(self.light_scenes.keys())
+                
+            if current_scene_id in self.light_scenes:
+                led_colors = self.light_scenes[current_scene_id].get_led_array()
         
-        return response_data
+        return led_colors
 
-    def send_led_binary_data(self):
+    def send_led_binary_data(self, led_colors=None):
         import time
         from config import LED_BINARY_OSC_ADDRESS
         
@@ -181,25 +239,19 @@ class OSCHandler:
         
         self.last_binary_send_time = current_time
         
-        led_colors = []
-        
-        if self.simulator and hasattr(self.simulator, 'scene_manager') and self.simulator.scene_manager:
-            led_colors = self.simulator.scene_manager.get_led_output()
-        elif self.light_scenes:
-            current_scene_id = None
-            if self.simulator and hasattr(self.simulator, 'active_scene_id'):
-                current_scene_id = self.simulator.active_scene_id
-            
-            if current_scene_id is None and self.light_scenes:
-                current_scene_id = min(self.light_scenes.keys())
-                
-            if current_scene_id in self.light_scenes:
-                led_colors = self.light_scenes[current_scene_id].get_led_output()
+        if led_colors is None:
+            led_colors = self._current_led_colors()
         
-        if not led_colors:
+        if led_colors is None or len(led_colors) == 0:
             return
         
         try:
+            if self.layout is not None:
+                self.layout.render(led_colors)
+                for strip in self.layout.strips:
+                    self.led_binary_client.send_message(strip.address, self.layout.strip_view(strip.strip_ID).tobytes())
+                return
+            
             binary_data = self.make_color_binary(led_colors)
             
             self.led_binary_client.send_message(LED_BINARY_OSC_ADDRESS, binary_data)
@@ -250,7 +302,7 @@ class OSCHandler:
                 except:
                     pass
                     
-            self.client.send_message("/serial_output_updated", self.send_binary_enabled)
+            self.reply_queue.send_message("/serial_output_updated", self.send_binary_enabled)
 
         except Exception as e:
             logger.error(f"Error updating serial output: {e}")
@@ -306,6 +358,7 @@ class OSCHandler:
         if target_palette is not None:
             effect.current_palette = target_palette
             effect.set_palette(target_palette)
+            self._journal("effect_palette", scene=scene_id, effect=effect_id, palette=target_palette)
             
             logger.info(f"Immediately set palette to {target_palette} for effect {effect_id} in scene {scene_id}")
             
@@ -371,6 +424,7 @@ class OSCHandler:
             )
             
             scene.palette_transition_active = True
+            self._journal_palettes(scene_id, scene, target_palette)
             
             logger.info(f"Started palette transition to {target_palette} for effect {effect_id} in scene {scene_id}")
             
@@ -442,6 +496,7 @@ class OSCHandler:
             
             effect.add_segment(1, segment)
             scene.add_effect(effect_id, effect)
+            self._journal("effect", scene=scene_id, effect=effect_id, data=effect.to_dict())
             
             logger.info(f"Added effect {effect_id} to scene {scene_id}")
             
@@ -450,7 +505,7 @@ class OSCHandler:
                 if hasattr(self.simulator, '_add_notification'):
                     self.simulator._add_notification(f"Added effect {effect_id} into scene {scene_id}")
             
-            self.client.send_message(f"/scene/{scene_id}/effect_added", effect_id)
+            self.reply_queue.send_message(f"/scene/{scene_id}/effect_added", effect_id)
             
         except Exception as e:
             logger.error(f"Error adding effect: {e}")
@@ -505,13 +560,14 @@ class OSCHandler:
             )
             
             scene.effect_transition_active = True
+            self._journal("current_effect", scene=scene_id, effect=effect_id)
             
             logger.info(f"Started transition to effect {effect_id} in scene {scene_id}")
             
             if self.simulator:
                 self._update_simulator(scene_id, effect_id)
             
-            self.client.send_message(f"/scene/{scene_id}/effect_changing", effect_id)
+            self.reply_queue.send_message(f"/scene/{scene_id}/effect_changing", effect_id)
                 
         except Exception as e:
             logger.error(f"Error changing effect: {e}")
@@ -561,18 +617,111 @@ class OSCHandler:
                 if other_effects:
                     scene.current_effect_ID = other_effects[0]
             
-            del scene.effects[effect_id]
+            scene.remove_effect(effect_id)
+            self._journal("remove_effect", scene=scene_id, effect=effect_id)
             
             logger.info(f"Removed effect {effect_id} from scene {scene_id}")
             
             if self.simulator:
                 self._update_simulator(scene_id)
             
-            self.client.send_message(f"/scene/{scene_id}/effect_removed", effect_id)
+            self.reply_queue.send_message(f"/scene/{scene_id}/effect_removed", effect_id)
             
         except Exception as e:
             logger.error(f"Error removing effect: {e}")
 
+    def scene_layer_callback(self, address, *args):
+        """
+        Handle OSC messages for editing the layer stack of a scene.
+        Setting the effect of the layer just above the top of the stack adds a new layer.
+        
+        Args:
+            address: OSC address pattern (/scene/{scene_id}/layer/{index}/{effect|opacity|blend_mode|remove})
+            *args: OSC message arguments (value)
+        """
+        pattern = r"/scene/(\d+)/layer/(\d+)/(\w+)"
+        match = re.match(pattern, address)
+        
+        if not match:
+            logger.warning(f"Invalid address pattern: {address}")
+            return
+            
+        scene_id = int(match.group(1))
+        index = int(match.group(2))
+        param = match.group(3)
+        
+        if scene_id not in self.light_scenes:
+            logger.warning(f"Scene {scene_id} not found")
+            return
+            
+        scene = self.light_scenes[scene_id]
+        
+        try:
+            if param == "remove":
+                scene.remove_layer(index)
+            elif len(args) < 1:
+                logger.warning(f"Missing value for layer parameter {param}")
+                return
+            elif param == "effect":
+                effect_id = int(args[0])
+                if effect_id not in scene.effects:
+                    logger.warning(f"Effect {effect_id} not found in scene {scene_id}")
+                    return
+                if index == len(scene.layers):
+                    scene.add_layer(effect_id)
+                else:
+                    scene.update_layer(index, "effect_ID", effect_id)
+            elif param in ("opacity", "blend_mode") and index < len(scene.layers):
+                value = float(args[0]) if param == "opacity" else str(args[0])
+                scene.update_layer(index, param, value)
+            else:
+                logger.warning(f"Invalid layer parameter {param} for layer {index} in scene {scene_id}")
+                return
+            
+            layers = [layer.to_dict() for layer in scene.layers]
+            self._journal("layers", scene=scene_id, layers=layers)
+            
+            logger.info(f"Updated layer {index} of scene {scene_id}: {param}")
+            
+            if self.simulator:
+                self._update_simulator(scene_id)
+            
+            self.reply_queue.send_message(f"/scene/{scene_id}/layers", json.dumps(layers))
+            
+        except Exception as e:
+            logger.error(f"Error updating layer: {e}")
+
+    def scene_clear_layers_callback(self, address, *args):
+        """
+        Handle OSC messages for clearing the layer stack, so the scene renders only its current effect.
+        
+        Args:
+            address: OSC address pattern (/scene/{scene_id}/clear_layers)
+            *args: OSC message arguments (unused)
+        """
+        pattern = r"/scene/(\d+)/clear_layers"
+        match = re.match(pattern, address)
+        
+        if not match:
+            logger.warning(f"Invalid address pattern: {address}")
+            return
+            
+        scene_id = int(match.group(1))
+        
+        if scene_id not in self.light_scenes:
+            logger.warning(f"Scene {scene_id} not found")
+            return
+            
+        self.light_scenes[scene_id].set_layers([])
+        self._journal("layers", scene=scene_id, layers=[])
+        
+        logger.info(f"Cleared layers of scene {scene_id}")
+        
+        if self.simulator:
+            self._update_simulator(scene_id)
+        
+        self.reply_queue.send_message(f"/scene/{scene_id}/layers", "[]")
+
     def scene_change_palette_callback(self, address, *args):
         """
         Handle OSC messages for changing the palette for an entire scene with animation.
@@ -623,6 +772,7 @@ class OSCHandler:
             )
             
             scene.palette_transition_active = True
+            self._journal_palettes(scene_id, scene, target_palette)
             
             logger.info(f"Started palette transition to {target_palette} for scene {scene_id}")
             
@@ -668,6 +818,7 @@ class OSCHandler:
             return
             
         effect = scene.effects[effect_id]
+        previous_palette = effect.current_palette
         
         if isinstance(palette_id, str):
             if palette_id in scene.palettes:
@@ -712,6 +863,9 @@ class OSCHandler:
                     logger.warning(f"Invalid palette index: {idx}, out of range (0-{len(palettes)-1})")
         else:
             logger.warning(f"Unsupported palette ID type: {type(palette_id)}")
+            
+        if effect.current_palette != previous_palette:
+            self._journal("effect_palette", scene=scene_id, effect=effect_id, palette=effect.current_palette)
            
     def scene_effect_add_segment_callback(self, address, *args):
         """
@@ -788,6 +942,7 @@ class OSCHandler:
             segment.fade = True
             
             effect.add_segment(segment_id, segment)
+            self._journal("segment", scene=scene_id, effect=effect_id, segment=segment_id, data=segment.to_dict())
             
             logger.info(f"Added segment {segment_id} to effect {effect_id} in scene {scene_id}")
             
@@ -796,7 +951,7 @@ class OSCHandler:
                 if hasattr(self.simulator, '_add_notification'):
                     self.simulator._add_notification(f"Added segment {segment_id} into effect {effect_id}")
             
-            self.client.send_message(f"/scene/{scene_id}/effect/{effect_id}/segment_added", segment_id)
+            self.reply_queue.send_message(f"/scene/{scene_id}/effect/{effect_id}/segment_added", segment_id)
             
         except Exception as e:
             logger.error(f"Error adding segment: {e}")
@@ -851,6 +1006,7 @@ class OSCHandler:
                 return
                 
             effect.remove_segment(segment_id)
+            self._journal("remove_segment", scene=scene_id, effect=effect_id, segment=segment_id)
             
             logger.info(f"Removed segment {segment_id} from effect {effect_id} in scene {scene_id}")
             
@@ -863,7 +1019,7 @@ class OSCHandler:
                 if hasattr(self.simulator, '_add_notification'):
                     self.simulator._add_notification(f"Đã xóa segment {segment_id} khỏi effect {effect_id}")
             
-            self.client.send_message(f"/scene/{scene_id}/effect/{effect_id}/segment_removed", segment_id)
+            self.reply_queue.send_message(f"/scene/{scene_id}/effect/{effect_id}/segment_removed", segment_id)
             
         except Exception as e:
             logger.error(f"Error removing segment: {e}")
@@ -886,7 +1042,7 @@ class OSCHandler:
         try:
             scene_list = sorted(self.light_scenes.keys())
             
-            self.client.send_message("/scene_manager/scenes", scene_list)
+            self.reply_queue.send_message("/scene_manager/scenes", scene_list)
             
             if self.simulator and hasattr(self.simulator, '_add_notification'):
                 self.simulator._add_notification(f"Danh sách scene: {scene_list}")
@@ -928,39 +1084,45 @@ class OSCHandler:
                 
             if not os.path.exists(file_path):
                 logger.warning(f"File not found: {file_path}")
-                self.client.send_message("/scene_manager/load_error", f"File not found: {file_path}")
+                self.reply_queue.send_message("/scene_manager/load_error", f"File not found: {file_path}")
                 if self.simulator and hasattr(self.simulator, '_add_notification'):
                     self.simulator._add_notification(f"Không tìm thấy file: {file_path}")
                 return
                 
             from models.light_scene import LightScene
-            new_scene = LightScene.load_from_json(file_path)
+            new_scene = LightScene.load_from_file(file_path)
             
             if target_scene_id is not None:
                 new_scene.scene_ID = target_scene_id
                 
             self.light_scenes[new_scene.scene_ID] = new_scene
+            self._journal("scene", scene=new_scene.scene_ID, data=new_scene.to_dict())
             
             if hasattr(self.simulator, 'scene_manager') and self.simulator.scene_manager:
                 self.simulator.scene_manager.add_scene(new_scene.scene_ID, new_scene)
                 self.simulator.scene_manager.switch_scene(new_scene.scene_ID)
+            elif self.scene_manager is not None:
+                self.scene_manager.add_scene(new_scene.scene_ID, new_scene)
+                self.scene_manager.switch_scene(new_scene.scene_ID)
             
             logger.info(f"Successfully loaded scene from {file_path} as scene {new_scene.scene_ID}")
             
-            self.client.send_message("/scene_manager/scene_loaded", new_scene.scene_ID)
+            self.reply_queue.send_message("/scene_manager/scene_loaded", new_scene.scene_ID)
             
             if self.simulator:
                 self._update_simulator(new_scene.scene_ID)
                     
         except Exception as e:
             logger.error(f"Error loading scene: {e}")
-            self.client.send_message("/scene_manager/load_error", str(e))
+            self.reply_queue.send_message("/scene_manager/load_error", str(e))
             if self.simulator and hasattr(self.simulator, '_add_notification'):
                 self.simulator._add_notification(f"Error loading scene: {e}")
 
     def scene_effect_segment_callback(self, address, *args):
         """
         Handle OSC messages for updating segment parameters within a scene.
+        /.../segment/{id}/glide/{param} <value> <ms> glides the parameter to the value over ms;
+        /.../segment/{id}/glide_time/{param} <ms> sets the glide time used by plain updates of the parameter.
         """
         pattern = r"/scene/(\d+)/effect/(\d+)/segment/(\d+)/(.+)"
         match = re.match(pattern, address)
@@ -996,7 +1158,21 @@ class OSCHandler:
         segment = effect.segments[segment_id]
         ui_updated = False
 
-        if param_name in ["color", "move_range", "transparency", "dimmer_time", "length"] and isinstance(value, str):
+        if param_name.startswith("glide_time/"):
+            param_name = param_name[len("glide_time/"):]
+            effect.set_glide_time(segment_id, param_name, max(0.0, float(value)) / 1000.0)
+            logger.info(f"Set glide time of {param_name} to {value} ms")
+            return
+
+        glide = None
+        if param_name.startswith("glide/"):
+            param_name = param_name[len("glide/"):]
+            glide = max(0.0, float(args[1])) / 1000.0 if len(args) > 1 else 0.0
+
+        def set_param(name, new_value):
+            effect.update_segment_param(segment_id, name, new_value, glide)
+
+        if param_name in ["color", "move_range", "transparency", "dimmer_time", "length", "envelope"] and isinstance(value, str):
             try:
                 if '[' in value and ']' in value:
                     value = json.loads(value)
@@ -1013,29 +1189,29 @@ class OSCHandler:
         if param_name == "color":
             if isinstance(value, dict):
                 if "colors" in value:
-                    segment.update_param("color", value["colors"])
+                    set_param("color", value["colors"])
                     logger.info(f"Updated colors: {value['colors']}")
                     ui_updated = True
                     
                 if "speed" in value:
-                    segment.update_param("move_speed", value["speed"])
+                    set_param("move_speed", value["speed"])
                     logger.info(f"Updated speed: {value['speed']}")
                     ui_updated = True
                     
                 if "gradient" in value:
-                    segment.update_param("gradient", value["gradient"] == 1)
+                    set_param("gradient", value["gradient"] == 1)
                     logger.info(f"Updated gradient: {value['gradient']}")
                     ui_updated = True
                     
             elif isinstance(value, list):
-                segment.update_param("color", value)
+                set_param("color", value)
                 logger.info(f"Updated colors directly: {value}")
                 ui_updated = True
                 
             elif isinstance(value, (int, float)):
-                current_colors = segment.color.copy()
+                current_colors = list(segment.color)
                 current_colors[0] = int(value)
-                segment.update_param("color", current_colors)
+                set_param("color", current_colors)
                 logger.info(f"Updated first color to: {value}")
                 ui_updated = True
 
@@ -1043,53 +1219,61 @@ class OSCHandler:
             if isinstance(value, list) and len(value) >= 2:
                 range_min = min(value[0], value[1])
                 range_max = max(value[0], value[1])
-                segment.update_param("move_range", [range_min, range_max])
+                set_param("move_range", [range_min, range_max])
                 logger.info(f"Updated move_range to [{range_min}, {range_max}]")
                 ui_updated = True
             elif isinstance(value, (int, float)):
-                current_range = segment.move_range.copy()
+                current_range = list(segment.move_range)
                 current_range[1] = int(value)
                 range_min = min(current_range[0], current_range[1])
                 range_max = max(current_range[0], current_range[1])
-                segment.update_param("move_range", [range_min, range_max])
+                set_param("move_range", [range_min, range_max])
                 logger.info(f"Updated move_range max to {value}, resulting range: [{range_min}, {range_max}]")
                 ui_updated = True
 
         elif param_name == "transparency":
             if isinstance(value, list):
-                segment.update_param("transparency", value)
+                set_param("transparency", value)
                 logger.info(f"Updated transparency: {value}")
                 ui_updated = True
             elif isinstance(value, (int, float)):
                 value = max(0.0, min(1.0, float(value)))
-                segment.update_param("transparency", [value] * len(segment.transparency))
+                set_param("transparency", [value] * len(segment.transparency))
                 logger.info(f"Updated all transparency values to {value}")
                 ui_updated = True
 
         elif param_name == "dimmer_time":
             if isinstance(value, list) and len(value) >= 5:
-                segment.update_param("dimmer_time", value)
+                set_param("dimmer_time", value)
                 logger.info(f"Updated dimmer_time: {value}")
                 ui_updated = True
             elif isinstance(value, (int, float)):
-                current_dimmer = segment.dimmer_time.copy()
+                current_dimmer = list(segment.dimmer_time)
                 current_dimmer[4] = int(value)
-                segment.update_param("dimmer_time", current_dimmer)
+                set_param("dimmer_time", current_dimmer)
                 logger.info(f"Updated dimmer_time cycle to {value}")
                 ui_updated = True
                 
         elif param_name == "dimmer_time_ratio":
             if isinstance(value, (int, float)):
                 ratio = max(0.1, float(value))
-                segment.update_param("dimmer_time_ratio", ratio)
+                set_param("dimmer_time_ratio", ratio)
                 logger.info(f"Updated dimmer_time_ratio: {ratio}")
                 ui_updated = True
             elif isinstance(value, str) and value.replace('.', '', 1).isdigit():
                 ratio = max(0.1, float(value))
-                segment.update_param("dimmer_time_ratio", ratio)
+                set_param("dimmer_time_ratio", ratio)
                 logger.info(f"Updated dimmer_time_ratio from string: {ratio}")
                 ui_updated = True
 
+        elif param_name == "envelope":
+            try:
+                set_param("envelope", value if isinstance(value, list) and value else None)
+                logger.info(f"Updated envelope: {segment.envelope}")
+                ui_updated = True
+            except ValueError as e:
+                logger.error(f"Invalid envelope for segment {segment_id}: {e}")
+
         elif param_name == "is_edge_reflect":
             reflect_value = True
             if isinstance(value, bool):
@@ -1099,26 +1283,32 @@ class OSCHandler:
             elif isinstance(value, str):
                 reflect_value = value.lower() in ('true', 'yes', '1', 'on')
                 
-            segment.update_param("is_edge_reflect", reflect_value)
+            set_param("is_edge_reflect", reflect_value)
             logger.info(f"Updated is_edge_reflect: {reflect_value}")
             ui_updated = True
 
         elif param_name == "move_speed":
             if isinstance(value, (int, float)):
-                segment.update_param("move_speed", float(value))
+                set_param("move_speed", float(value))
                 logger.info(f"Updated move_speed: {value}")
                 ui_updated = True
             elif isinstance(value, str) and value.replace('-', '', 1).replace('.', '', 1).isdigit():
                 speed = float(value)
-                segment.update_param("move_speed", speed)
+                set_param("move_speed", speed)
                 logger.info(f"Updated move_speed from string: {speed}")
                 ui_updated = True
         
         else:
-            segment.update_param(param_name, value)
+            set_param(param_name, value)
             logger.info(f"Updated {param_name}: {value}")
             ui_updated = True
             
+        if ui_updated:
+            if glide is None:
+                glide = effect.tweens.glide_time(segment_id, param_name)
+            self._journal("segment", scene=scene_id, effect=effect_id, segment=segment_id,
+                          data=effect.segment_data(segment_id), glide=glide)
+            
         if ui_updated and self.simulator:
             self._update_simulator(scene_id, effect_id, segment_id)
     
@@ -1150,6 +1340,7 @@ class OSCHandler:
         
         if isinstance(palette_id, str) and palette_id in scene.palettes:
             scene.set_palette(palette_id)
+            self._journal_palettes(scene_id, scene)
             logger.info(f"Set palette for scene {scene_id} to {palette_id}")
             
             if self.simulator:
@@ -1187,6 +1378,7 @@ class OSCHandler:
         
         if isinstance(new_palettes, dict):
             scene.update_all_palettes(new_palettes)
+            self._journal_palettes(scene_id, scene)
             logger.info(f"Updated palettes for scene {scene_id}")
             
             if self.simulator:
@@ -1229,28 +1421,29 @@ class OSCHandler:
         scene = self.light_scenes[scene_id]
         
         try:
-            for effect in scene.effects.values():
-                effect.time = 0.0
-                for segment in effect.segments.values():
-                    if hasattr(segment, 'time'):
-                        segment.time = 0.0
-                        
             import os
             if not os.path.isabs(file_path):
                 file_path = os.path.abspath(file_path)
                 
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
             
-            scene.save_to_json(file_path)
-            logger.info(f"Successfully saved effects configuration to {file_path}")
+            snapshot = scene.snapshot()
             
-            self.client.send_message(f"/scene/{scene_id}/effects_saved", file_path)
+            def on_saved(error):
+                if error is None:
+                    logger.info(f"Successfully saved effects configuration to {file_path}")
+                    self.reply_queue.send_message(f"/scene/{scene_id}/effects_saved", file_path)
+                    if self.simulator and hasattr(self.simulator, '_add_notification'):
+                        self.simulator._add_notification(f"Đã lưu effects vào {file_path}")
+                else:
+                    self.reply_queue.send_message(f"/scene/{scene_id}/save_error", str(error))
+                    if self.simulator and hasattr(self.simulator, '_add_notification'):
+                        self.simulator._add_notification(f"Lỗi khi lưu: {error}")
             
-            if self.simulator and hasattr(self.simulator, '_add_notification'):
-                self.simulator._add_notification(f"Đã lưu effects vào {file_path}")
+            self.save_worker.submit(lambda: LightScene.write_snapshot(snapshot, file_path), on_saved)
         except Exception as e:
             logger.error(f"Error saving effects configuration: {e}")
-            self.client.send_message(f"/scene/{scene_id}/save_error", str(e))
+            self.reply_queue.send_message(f"/scene/{scene_id}/save_error", str(e))
             if self.simulator and hasattr(self.simulator, '_add_notification'):
                 self.simulator._add_notification(f"Lỗi khi lưu: {e}")
 
@@ -1289,20 +1482,21 @@ class OSCHandler:
                 
             if not os.path.exists(file_path):
                 logger.warning(f"File not found: {file_path}")
-                self.client.send_message(f"/scene/{scene_id}/load_error", f"File not found: {file_path}")
+                self.reply_queue.send_message(f"/scene/{scene_id}/load_error", f"File not found: {file_path}")
                 if self.simulator and hasattr(self.simulator, '_add_notification'):
                     self.simulator._add_notification(f"Không tìm thấy file: {file_path}")
                 return
             
             from models.light_scene import LightScene
-            new_scene = LightScene.load_from_json(file_path)
+            new_scene = LightScene.load_from_file(file_path)
             
             new_scene.scene_ID = scene_id
             
             self.light_scenes[scene_id] = new_scene
+            self._journal("scene", scene=scene_id, data=new_scene.to_dict())
             logger.info(f"Successfully loaded effects from {file_path}")
             
-            self.client.send_message(f"/scene/{scene_id}/effects_loaded", file_path)
+            self.reply_queue.send_message(f"/scene/{scene_id}/effects_loaded", file_path)
             
             if self.simulator:
                 self._update_simulator(scene_id)
@@ -1310,7 +1504,7 @@ class OSCHandler:
                     self.simulator._add_notification(f"Đã tải effects từ {file_path}")
         except Exception as e:
             logger.error(f"Error loading effects: {e}")
-            self.client.send_message(f"/scene/{scene_id}/load_error", str(e))
+            self.reply_queue.send_message(f"/scene/{scene_id}/load_error", str(e))
             if self.simulator and hasattr(self.simulator, '_add_notification'):
                 self.simulator._add_notification(f"Error loading effects: {e}")
                 
@@ -1355,16 +1549,23 @@ class OSCHandler:
                 
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
             
-            scene.save_palettes_to_json(file_path)
-            logger.info(f"Successfully saved palettes to {file_path}")
+            snapshot = scene.palettes_snapshot()
             
-            self.client.send_message(f"/scene/{scene_id}/palettes_saved", file_path)
+            def on_saved(error):
+                if error is None:
+                    logger.info(f"Successfully saved palettes to {file_path}")
+                    self.reply_queue.send_message(f"/scene/{scene_id}/palettes_saved", file_path)
+                    if self.simulator and hasattr(self.simulator, '_add_notification'):
+                        self.simulator._add_notification(f"Đã lưu bảng màu vào {file_path}")
+                else:
+                    self.reply_queue.send_message(f"/scene/{scene_id}/save_error", str(error))
+                    if self.simulator and hasattr(self.simulator, '_add_notification'):
+                        self.simulator._add_notification(f"Error while saving palettes: {error}")
             
-            if self.simulator and hasattr(self.simulator, '_add_notification'):
-                self.simulator._add_notification(f"Đã lưu bảng màu vào {file_path}")
+            self.save_worker.submit(lambda: write_json_atomic(file_path, snapshot), on_saved)
         except Exception as e:
             logger.error(f"Error saving palettes: {e}")
-            self.client.send_message(f"/scene/{scene_id}/save_error", str(e))
+            self.reply_queue.send_message(f"/scene/{scene_id}/save_error", str(e))
             if self.simulator and hasattr(self.simulator, '_add_notification'):
                 self.simulator._add_notification(f"Error while saving palettes: {e}")
 
@@ -1409,15 +1610,16 @@ class OSCHandler:
                 
             if not os.path.exists(file_path):
                 logger.warning(f"File not found: {file_path}")
-                self.client.send_message(f"/scene/{scene_id}/load_error", f"File not found: {file_path}")
+                self.reply_queue.send_message(f"/scene/{scene_id}/load_error", f"File not found: {file_path}")
                 if self.simulator and hasattr(self.simulator, '_add_notification'):
                     self.simulator._add_notification(f"File not found: {file_path}")
                 return
                 
             scene.load_palettes_from_json(file_path)
+            self._journal_palettes(scene_id, scene)
             logger.info(f"Successfully loaded palettes from {file_path}")
             
-            self.client.send_message(f"/scene/{scene_id}/palettes_loaded", file_path)
+            self.reply_queue.send_message(f"/scene/{scene_id}/palettes_loaded", file_path)
             
             if self.simulator:
                 self._update_simulator(scene_id)
@@ -1425,7 +1627,7 @@ class OSCHandler:
                     self.simulator._add_notification(f"Đã tải bảng màu từ {file_path}")
         except Exception as e:
             logger.error(f"Error loading palettes: {e}")
-            self.client.send_message(f"/scene/{scene_id}/load_error", str(e))
+            self.reply_queue.send_message(f"/scene/{scene_id}/load_error", str(e))
             if self.simulator and hasattr(self.simulator, '_add_notification'):
                 self.simulator._add_notification(f"Error loading palettes: {e}")
 
@@ -1479,6 +1681,9 @@ class OSCHandler:
             new_scene.add_effect(1, effect)
             
             self.light_scenes[scene_id] = new_scene
+            self._journal("scene", scene=scene_id, data=new_scene.to_dict())
+            if self.scene_manager is not None:
+                self.scene_manager.add_scene(scene_id, new_scene)
             logger.info(f"Added new scene with ID {scene_id}")
             
             if self.simulator:
@@ -1486,7 +1691,7 @@ class OSCHandler:
                 if hasattr(self.simulator, '_add_notification'):
                     self.simulator._add_notification(f"Đã tạo scene mới với ID {scene_id}")
             
-            self.client.send_message("/scene_manager/scene_added", scene_id)
+            self.reply_queue.send_message("/scene_manager/scene_added", scene_id)
             
         except Exception as e:
             logger.error(f"Error adding scene: {e}")
@@ -1521,6 +1726,9 @@ class OSCHandler:
                 return
                 
             del self.light_scenes[scene_id]
+            self._journal("remove_scene", scene=scene_id)
+            if self.scene_manager is not None:
+                self.scene_manager.remove_scene(scene_id)
             logger.info(f"Removed scene with ID {scene_id}")
             
             if self.simulator and hasattr(self.simulator, 'active_scene_id') and self.simulator.active_scene_id == scene_id:
@@ -1531,7 +1739,7 @@ class OSCHandler:
             elif self.simulator and hasattr(self.simulator, '_add_notification'):
                 self.simulator._add_notification(f"Đã xóa scene {scene_id}")
             
-            self.client.send_message("/scene_manager/scene_removed", scene_id)
+            self.reply_queue.send_message("/scene_manager/scene_removed", scene_id)
             
         except Exception as e:
             logger.error(f"Error removing scene: {e}")
@@ -1557,12 +1765,17 @@ class OSCHandler:
                 logger.warning(f"Scene {scene_id} does not exist")
                 return
             
+            if self.scene_manager is not None:
+                if scene_id not in self.scene_manager.scenes:
+                    self.scene_manager.add_scene(scene_id, self.light_scenes[scene_id])
+                self.scene_manager.switch_scene(scene_id)
+            
             if self.simulator:
                 self._update_simulator(scene_id)
                 if hasattr(self.simulator, '_add_notification'):
                     self.simulator._add_notification(f"Đã chuyển sang scene {scene_id}")
             
-            self.client.send_message("/scene_manager/scene_switched", scene_id)
+            self.reply_queue.send_message("/scene_manager/scene_switched", scene_id)
             
         except Exception as e:
             logger.error(f"Error switching scene: {e}")
@@ -1596,11 +1809,13 @@ class OSCHandler:
         
         if scene_id not in self.light_scenes:
             self.light_scenes[scene_id] = LightScene(scene_ID=scene_id)
+            self._journal("scene", scene=scene_id, data=self.light_scenes[scene_id].to_dict())
         
         scene = self.light_scenes[scene_id]
         
         if effect_id not in scene.effects:
             scene.add_effect(effect_id, LightEffect(effect_ID=effect_id, led_count=DEFAULT_LED_COUNT, fps=DEFAULT_FPS))
+            self._journal("effect", scene=scene_id, effect=effect_id, data=scene.effects[effect_id].to_dict())
         
         effect = scene.effects[effect_id]
         
@@ -1649,11 +1864,13 @@ class OSCHandler:
         
         if scene_id not in self.light_scenes:
             self.light_scenes[scene_id] = LightScene(scene_ID=scene_id)
+            self._journal("scene", scene=scene_id, data=self.light_scenes[scene_id].to_dict())
         
         scene = self.light_scenes[scene_id]
         
         if effect_id not in scene.effects:
             scene.add_effect(effect_id, LightEffect(effect_ID=effect_id, led_count=DEFAULT_LED_COUNT, fps=DEFAULT_FPS))
+            self._journal("effect", scene=scene_id, effect=effect_id, data=scene.effects[effect_id].to_dict())
         
         effect = scene.effects[effect_id]
         
@@ -1709,6 +1926,7 @@ class OSCHandler:
         
         for scene_id, scene in self.light_scenes.items():
             scene.update_palette(palette_id, colors)
+            self._journal_palettes(scene_id, scene)
             
         logger.info(f"Updated palette {palette_id} with {len(colors)} colors in all scenes")
         
@@ -1741,11 +1959,11 @@ class OSCHandler:
                 flat_colors = []
                 for color in colors:
                     flat_colors.extend(color)
-                self.client.send_message(f"/palette/{palette_id}", flat_colors)
+                self.reply_queue.send_message(f"/palette/{palette_id}", flat_colors)
             
             for effect_id, effect in scene.effects.items():
                 for segment_id, segment in effect.segments.items():
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/scene/{scene_id}/effect/{effect_id}/segment/{segment_id}/color", 
                         {
                             "colors": segment.color,
@@ -1754,7 +1972,7 @@ class OSCHandler:
                         }
                     )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/scene/{scene_id}/effect/{effect_id}/segment/{segment_id}/position",
                         {
                             "initial_position": segment.initial_position,
@@ -1764,7 +1982,7 @@ class OSCHandler:
                         }
                     )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/scene/{scene_id}/effect/{effect_id}/segment/{segment_id}/span",
                         {
                             "span": sum(segment.length),
@@ -1776,28 +1994,28 @@ class OSCHandler:
                         }
                     )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/scene/{scene_id}/effect/{effect_id}/segment/{segment_id}/transparency", 
                         segment.transparency
                     )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/scene/{scene_id}/effect/{effect_id}/segment/{segment_id}/is_edge_reflect", 
                         1 if segment.is_edge_reflect else 0
                     )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/scene/{scene_id}/effect/{effect_id}/segment/{segment_id}/dimmer_time",
                         segment.dimmer_time
                     )
                     
                     if hasattr(segment, 'dimmer_time_ratio'):
-                        self.client.send_message(
+                        self.reply_queue.send_message(
                             f"/scene/{scene_id}/effect/{effect_id}/segment/{segment_id}/dimmer_time_ratio",
                             segment.dimmer_time_ratio
                         )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/effect/{effect_id}/segment/{segment_id}/color", 
                         {
                             "colors": segment.color,
@@ -1806,7 +2024,7 @@ class OSCHandler:
                         }
                     )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/effect/{effect_id}/object/{segment_id}/color", 
                         {
                             "colors": segment.color,
@@ -1815,23 +2033,73 @@ class OSCHandler:
                         }
                     )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/effect/{effect_id}/object/{segment_id}/position/initial_position", 
                         segment.initial_position
                     )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/effect/{effect_id}/object/{segment_id}/position/speed", 
                         segment.move_speed
                     )
                     
-                    self.client.send_message(
+                    self.reply_queue.send_message(
                         f"/effect/{effect_id}/object/{segment_id}/position/range", 
                         segment.move_range
                     )
         
         logger.info("Sent initialization data")
         
+    def send_stats_callback(self, address, *args):
+        """
+        Handle requests for the outbound reply queue counters.
+        
+        Args:
+            address: OSC address pattern
+            *args: OSC message arguments (unused)
+        """
+        if address != "/request/send_stats":
+            return
+            
+        stats = self.reply_queue.get_stats()
+        self.reply_queue.send_message("/send_stats", [
+            stats['enqueued'], stats['sent_messages'], stats['sent_bundles'],
+            stats['dropped'], stats['send_errors'], stats['queued']
+        ])
+        
+    def cache_stats_callback(self, address, *args):
+        """
+        Handle requests for the parsed file cache counters.
+        
+        Args:
+            address: OSC address pattern
+            *args: OSC message arguments (unused)
+        """
+        if address != "/request/cache_stats":
+            return
+            
+        stats = file_cache.get_stats()
+        self.reply_queue.send_message("/cache_stats", [
+            stats['hits'], stats['misses'], stats['evictions'], stats['entries']
+        ])
+        
+    def sync_stats_callback(self, address, *args):
+        """
+        Handle requests for the show clock sync counters.
+        
+        Args:
+            address: OSC address pattern
+            *args: OSC message arguments (unused)
+        """
+        if address != "/request/sync_stats":
+            return
+        
+        if self.clock_sync is None:
+            self.reply_queue.send_message("/sync_stats", json.dumps({"role": None}))
+            return
+        
+        self.reply_queue.send_message("/sync_stats", json.dumps(self.clock_sync.get_stats()))
+        
     def _update_simulator(self, scene_id=None, effect_id=None, segment_id=None):
         """
         Update the simulator UI after parameter changes.
@@ -0,0 +1,233 @@
+from typing import Dict, List, Any, Optional
+from collections import deque
+from collections.abc import Iterable
+import sys
+import threading
+import time
+from pythonosc import osc_bundle_builder, osc_message_builder
+
+sys.path.append('..')
+from config import (
+    OSC_SEND_QUEUE_SIZE,
+    OSC_SEND_BATCH_SIZE,
+    OSC_SEND_MAX_BUNDLE_BYTES,
+    OSC_SEND_DROP_POLICY,
+)
+
+import logging
+
+logger = logging.getLogger("color_signal_system")
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+
+class OSCSendQueue:
+    """
+    OSCSendQueue decouples outbound OSC replies from the OSC server thread.
+    Callbacks enqueue messages without touching the socket; a dedicated sender thread
+    drains the queue and groups pending messages into OSC bundles.
+    """
+
+    def __init__(self, client, max_size: int = OSC_SEND_QUEUE_SIZE,
+                 batch_size: int = OSC_SEND_BATCH_SIZE,
+                 max_bundle_bytes: int = OSC_SEND_MAX_BUNDLE_BYTES,
+                 drop_policy: str = OSC_SEND_DROP_POLICY):
+        """
+        Initialize the send queue.
+
+        Args:
+            client: UDP client exposing send(content), e.g. SimpleUDPClient
+            max_size: Maximum number of queued messages
+            batch_size: Maximum number of messages drained per send cycle
+            max_bundle_bytes: Maximum datagram size for a bundle
+            drop_policy: "drop_oldest" or "drop_newest" when the queue is full
+        """
+        if drop_policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+
+        self.client = client
+        self.max_size = max(1, int(max_size))
+        self.batch_size = max(1, int(batch_size))
+        self.max_bundle_bytes = max_bundle_bytes
+        self.drop_policy = drop_policy
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._sending = False
+
+        self.stats = {
+            'enqueued': 0,
+            'sent_messages': 0,
+            'sent_bundles': 0,
+            'dropped': 0,
+            'send_errors': 0,
+            'high_watermark': 0
+        }
+
+    def send_message(self, address: str, value: Any):
+        """
+        Queue a message for sending. Mirrors SimpleUDPClient.send_message.
+        The message is built immediately so later changes to value are not sent.
+
+        Args:
+            address: OSC address the message shall go to
+            value: One or more arguments to be added to the message
+
+        Returns:
+            True if the message was queued, False if it was dropped
+        """
+        builder = osc_message_builder.OscMessageBuilder(address=address)
+        if value is None:
+            pass
+        elif not isinstance(value, Iterable) or isinstance(value, (str, bytes)):
+            builder.add_arg(value)
+        else:
+            for val in value:
+                builder.add_arg(val)
+        msg = builder.build()
+
+        with self._condition:
+            if len(self._queue) >= self.max_size:
+                self.stats['dropped'] += 1
+                if self.drop_policy == DROP_NEWEST:
+                    return False
+                self._queue.popleft()
+
+            self._queue.append(msg)
+            self.stats['enqueued'] += 1
+            self.stats['high_watermark'] = max(self.stats['high_watermark'], len(self._queue))
+            self._condition.notify()
+
+        return True
+
+    def set_client(self, client):
+        """
+        Replace the UDP client used by the sender thread.
+
+        Args:
+            client: New UDP client
+        """
+        with self._condition:
+            self.client = client
+
+    def start(self):
+        """
+        Start the sender thread.
+        """
+        if self._running:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="osc-sender")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """
+        Stop the sender thread after draining the queued messages.
+
+        Args:
+            timeout: Maximum time to wait for the sender thread
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def flush(self, timeout: float = 1.0) -> bool:
+        """
+        Wait until all queued messages have been handed to the socket.
+
+        Args:
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            True if the queue was drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._condition:
+                if not self._queue and not self._sending:
+                    return True
+            time.sleep(0.001)
+        return False
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get a copy of the queue counters.
+
+        Returns:
+            Dictionary of counter name -> value, including the current queue depth
+        """
+        with self._condition:
+            stats = dict(self.stats)
+            stats['queued'] = len(self._queue)
+        return stats
+
+    def _take_batch(self) -> List:
+        with self._condition:
+            while self._running and not self._queue:
+                self._condition.wait()
+
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            self._sending = bool(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if not self._running:
+                    break
+                continue
+
+            for packet, count in self._pack(batch):
+                try:
+                    self.client.send(packet)
+                    self.stats['sent_messages'] += count
+                    if count > 1:
+                        self.stats['sent_bundles'] += 1
+                except Exception as e:
+                    self.stats['send_errors'] += 1
+                    logger.error(f"Error sending OSC reply: {e}")
+
+            with self._condition:
+                self._sending = False
+
+    def _pack(self, messages: List):
+        """
+        Group messages into bundles that fit into max_bundle_bytes.
+        Single messages and oversized messages are sent as they are.
+        """
+        group = []
+        group_size = 16
+
+        for msg in messages:
+            msg_size = 4 + msg.size
+            if group and group_size + msg_size > self.max_bundle_bytes:
+                yield self._build_packet(group)
+                group = []
+                group_size = 16
+
+            group.append(msg)
+            group_size += msg_size
+
+        if group:
+            yield self._build_packet(group)
+
+    def _build_packet(self, group: List):
+        if len(group) == 1:
+            return group[0], 1
+
+        builder = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
+        for msg in group:
+            builder.add_content(msg)
+        return builder.build(), len(group)
@@ -0,0 +1,376 @@
+"""
+Multi-process rendering of independent zones.
+
+Each scene is a zone with a fixed number of LEDs. Zones are sharded across worker processes,
+which own the animation state of their scenes and write every rendered frame into their part
+of one shared-memory buffer. The parent only exchanges a small message with each worker per
+frame, so frames are never pickled; after render_frame() returns, the buffer holds all zones
+back to back.
+"""
+
+from typing import Any, Dict, List, Optional
+import multiprocessing
+from multiprocessing import shared_memory
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.append('..')
+from config import DEFAULT_LED_COUNT, RENDER_POOL_FRAME_TIMEOUT, RENDER_POOL_START_TIMEOUT
+from models.light_scene import LightScene
+from models.scene_diff import apply_scene_changes, diff_effect, diff_scene, diff_segment
+from models.cue_list import apply_scene_cue
+
+import logging
+
+logger = logging.getLogger("color_signal_system")
+
+
+def apply_live_op(scenes: Dict[int, LightScene], op: Dict[str, Any]):
+    """
+    Apply a journal-style operation (see models.state_journal.apply_op) to live scenes.
+    Effects, segments and whole scenes are diffed against the live objects rather than replaced,
+    so positions and timing of the running animation are kept.
+
+    Args:
+        scenes: Dictionary of scene_ID -> LightScene
+        op: Operation dictionary with an "op" name and its fields
+    """
+    name = op["op"]
+    scene = scenes.get(op.get("scene"))
+    if scene is None:
+        return
+
+    effect_id = op.get("effect")
+    effect = scene.effects.get(effect_id) if effect_id in scene.effects else None
+
+    if name == "scene":
+        changes = diff_scene(scene, op["data"])
+    elif name == "palettes":
+        changes = [("palettes", op["palettes"]), ("palette", op["current_palette"])]
+    elif name == "current_effect":
+        changes = [("current_effect", effect_id)]
+    elif name == "layers":
+        changes = [("layers", op["layers"])]
+    elif name == "remove_effect":
+        changes = [("remove_effect", effect_id)]
+    elif name == "effect":
+        if effect is None:
+            changes = [("effect_data", effect_id, op["data"])]
+        else:
+            changes = diff_effect(effect_id, effect, op["data"])
+    elif name == "effect_palette":
+        if effect is not None:
+            effect.set_palette(op["palette"])
+        return
+    elif name == "segment":
+        if effect is None:
+            return
+        segment = effect.segments.get(op["segment"])
+        if segment is None:
+            changes = [("add_segment", effect_id, op["segment"], op["data"])]
+        else:
+            changes = diff_segment(effect_id, op["segment"], segment, op["data"])
+    elif name == "remove_segment":
+        changes = [("remove_segment", effect_id, op["segment"])]
+    elif name == "cue":
+        apply_scene_cue(scene, op["cue"])
+        return
+    else:
+        return
+
+    apply_scene_changes(scene, changes, op.get("glide", 0.0))
+
+
+def _worker_main(conn, shm_name: str, total_leds: int, zones: List[tuple]):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frame = np.ndarray((total_leds, 3), dtype=np.uint8, buffer=shm.buf)
+    scenes = {scene_id: LightScene.from_dict(scene_data) for scene_id, _, _, scene_data in zones}
+    conn.send(None)
+
+    try:
+        while True:
+            command, ops, catch_up, dt = conn.recv()
+            if command == "stop":
+                break
+
+            error = None
+            for op in ops:
+                try:
+                    apply_live_op(scenes, op)
+                except Exception as e:
+                    error = f"Error applying {op.get('op')}: {e}"
+
+            for scene_id, start, count, _ in zones:
+                scene = scenes[scene_id]
+                if catch_up > 0:
+                    scene.fast_forward(catch_up)
+                scene.update(dt)
+                colors = scene.get_led_array()
+                zone = frame[start:start + count]
+                rendered = min(len(colors), count)
+                zone[:rendered] = colors[:rendered]
+                zone[rendered:] = 0
+
+            conn.send(error)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del frame
+        shm.close()
+
+
+class RenderPool:
+    """
+    RenderPool renders scenes as zones in worker processes.
+    Changes to the parent's scenes must be forwarded with submit(); they are applied by the
+    owning worker at the start of the next frame.
+    """
+
+    def __init__(self, light_scenes: Dict[int, LightScene], workers: int = 2,
+                 frame_timeout: float = RENDER_POOL_FRAME_TIMEOUT):
+        """
+        Initialize the pool.
+
+        Args:
+            light_scenes: Dictionary of scene_ID -> LightScene; each scene becomes a zone
+            workers: Number of worker processes (at most one per zone)
+            frame_timeout: Maximum time in seconds to wait for a worker to finish a frame
+        """
+        self.light_scenes = light_scenes
+        self.workers = max(1, min(int(workers), len(light_scenes)))
+        self.frame_timeout = frame_timeout
+
+        self.zones: Dict[int, tuple] = {}
+        start = 0
+        for scene_id in sorted(light_scenes):
+            count = self._zone_size(light_scenes[scene_id])
+            self.zones[scene_id] = (start, count)
+            start += count
+        self.total_leds = start
+
+        self.frame: Optional[np.ndarray] = None
+        self._previous_frame: Optional[np.ndarray] = None
+        self._shm = None
+        self._processes = []
+        self._connections = []
+        self._owner: Dict[int, int] = {}
+        self._pending_ops: List[List[Dict[str, Any]]] = []
+        self._ops_lock = threading.Lock()
+        self._late: List[bool] = []
+        self._skipped_time: List[float] = []
+
+        self.stats = {
+            'frames': 0,
+            'worker_errors': 0,
+            'dropped_ops': 0,
+            'timeouts': 0,
+            'held_frames': 0,
+            'last_frame_ms': 0.0
+        }
+
+    @staticmethod
+    def _zone_size(scene: LightScene) -> int:
+        data = scene.to_dict()
+        counts = [effect_data.get("led_count", 0) for effect_data in data["effects"].values()]
+        return max(counts) if counts else DEFAULT_LED_COUNT
+
+    def start(self):
+        """
+        Create the shared frame buffer and start the worker processes.
+        """
+        if self._processes:
+            return
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, self.total_leds * 3))
+        self.frame = np.ndarray((self.total_leds, 3), dtype=np.uint8, buffer=self._shm.buf)
+        self.frame[:] = 0
+        self._previous_frame = np.zeros_like(self.frame)
+
+        loads = [0] * self.workers
+        shards: List[List[tuple]] = [[] for _ in range(self.workers)]
+        for scene_id, (start, count) in sorted(self.zones.items(), key=lambda item: -item[1][1]):
+            worker = loads.index(min(loads))
+            loads[worker] += count
+            snapshot = LightScene.resolve_snapshot(self.light_scenes[scene_id].snapshot())
+            shards[worker].append((scene_id, start, count, snapshot))
+            self._owner[scene_id] = worker
+
+        context = multiprocessing.get_context("spawn")
+        for index, shard in enumerate(shards):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_worker_main, name=f"render-worker-{index}",
+                                      args=(child_conn, self._shm.name, self.total_leds, shard))
+            process.daemon = True
+            process.start()
+            child_conn.close()
+            self._processes.append(process)
+            self._connections.append(parent_conn)
+            self._pending_ops.append([])
+            self._late.append(False)
+            self._skipped_time.append(0.0)
+
+        for conn in self._connections:
+            if not conn.poll(RENDER_POOL_START_TIMEOUT):
+                self.stop()
+                raise TimeoutError("Render worker did not start in time")
+            conn.recv()
+
+        logger.info(f"Render pool started: {len(self.zones)} zones, {self.total_leds} LEDs, {self.workers} workers")
+
+    def submit(self, op: str, **fields):
+        """
+        Forward a change applied to the parent's scenes to the worker owning the scene.
+        Takes the same operations as StateJournal.record.
+
+        Args:
+            op: Operation name
+            **fields: Operation fields, including the scene ID as "scene"
+        """
+        worker = self._owner.get(fields.get("scene"))
+        if worker is None:
+            self.stats['dropped_ops'] += 1
+            logger.warning(f"Render pool has no zone for scene {fields.get('scene')}; restart to render it")
+            return
+
+        entry = dict(fields)
+        entry["op"] = op
+        with self._ops_lock:
+            self._pending_ops[worker].append(entry)
+
+    def render_frame(self, catch_up: float = 0.0, dt: Optional[float] = None) -> np.ndarray:
+        """
+        Render one frame of every zone in parallel and wait for all workers.
+
+        A worker that misses frame_timeout is not waited for: the previous frame is returned and
+        the worker's late reply is collected on a later frame. Until then the worker is sent no
+        new frames; its operations and the skipped time are passed on once it has caught up.
+
+        Args:
+            catch_up: Time in seconds to fast-forward the zones by first, e.g. after a stall
+            dt: Elapsed time in seconds to advance the zones by (default: one frame at each effect's frame rate)
+
+        Returns:
+            (total_leds, 3) uint8 view of the shared frame buffer with all zones back to back,
+            or a copy of the previous frame if a worker did not finish in time
+
+        Raises:
+            RuntimeError: If a worker process has exited
+        """
+        started = time.perf_counter()
+
+        for index, conn in enumerate(self._connections):
+            if self._late[index] and conn.poll():
+                self._receive(index)
+                self._late[index] = False
+
+        with self._ops_lock:
+            batches = self._pending_ops
+            self._pending_ops = [[] for _ in self._connections]
+            for index, late in enumerate(self._late):
+                if late:
+                    # Keep the operations of a busy worker, in order, for its next frame
+                    self._pending_ops[index] = batches[index]
+
+        sent = []
+        for index, (conn, ops) in enumerate(zip(self._connections, batches)):
+            self._check_alive(index)
+            if self._late[index]:
+                self._skipped_time[index] += catch_up + (dt or 0.0)
+                continue
+            conn.send(("frame", ops, catch_up + self._skipped_time[index], dt))
+            self._skipped_time[index] = 0.0
+            sent.append(index)
+
+        deadline = started + self.frame_timeout
+        for index in sent:
+            conn = self._connections[index]
+            if conn.poll(max(0.0, deadline - time.perf_counter())):
+                self._receive(index)
+                continue
+
+            self._check_alive(index)
+            self._late[index] = True
+            self.stats['timeouts'] += 1
+            logger.warning(f"Render worker {index} did not finish the frame in time; holding the previous frame")
+
+        self.stats['frames'] += 1
+        self.stats['last_frame_ms'] = (time.perf_counter() - started) * 1000.0
+
+        if any(self._late):
+            self.stats['held_frames'] += 1
+            return self._previous_frame
+
+        np.copyto(self._previous_frame, self.frame)
+        return self.frame
+
+    def _receive(self, index: int):
+        try:
+            error = self._connections[index].recv()
+        except EOFError:
+            raise RuntimeError(f"Render worker {index} closed its connection")
+        if error:
+            self.stats['worker_errors'] += 1
+            logger.error(error)
+
+    def _check_alive(self, index: int):
+        process = self._processes[index]
+        if not process.is_alive():
+            raise RuntimeError(f"Render worker {index} exited with code {process.exitcode}")
+
+    def zone(self, scene_ID: int) -> np.ndarray:
+        """
+        Get a zone's part of the frame buffer without copying.
+
+        Args:
+            scene_ID: Scene ID of the zone
+
+        Returns:
+            (led_count, 3) uint8 view into the frame buffer
+        """
+        start, count = self.zones[scene_ID]
+        return self.frame[start:start + count]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get a copy of the pool counters.
+
+        Returns:
+            Dictionary of counter name -> value
+        """
+        return dict(self.stats)
+
+    def stop(self, timeout: float = 2.0):
+        """
+        Stop the workers and release the shared frame buffer.
+
+        Args:
+            timeout: Maximum time to wait for each worker to exit
+        """
+        for conn in self._connections:
+            try:
+                conn.send(("stop", [], 0.0, None))
+            except (BrokenPipeError, OSError):
+                pass
+
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+        for conn in self._connections:
+            conn.close()
+
+        self._processes = []
+        self._connections = []
+        self._pending_ops = []
+        self._late = []
+        self._skipped_time = []
+
+        if self._shm is not None:
+            self.frame = None
+            self._previous_frame = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
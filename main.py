@@ -22,12 +22,22 @@ from config import (
     DEFAULT_FPS, DEFAULT_LED_COUNT, IN_PORT, OUT_PORT, DEFAULT_OSC_IP,
     DEFAULT_TRANSPARENCY, DEFAULT_LENGTH, DEFAULT_MOVE_SPEED,
     DEFAULT_MOVE_RANGE, DEFAULT_IS_EDGE_REFLECT,
-    DEFAULT_DIMMER_TIME, DEFAULT_DIMMER_TIME_RATIO
+    DEFAULT_DIMMER_TIME, DEFAULT_DIMMER_TIME_RATIO, ANIMATION_MAX_CATCH_UP,
+    AUDIO_SAMPLE_RATE, AUDIO_CHANNELS
 )
 from models.light_segment import LightSegment
 from models.light_effect import LightEffect
 from models.light_scene import LightScene
+from models.state_journal import StateJournal
+from models.fixture_layout import FixtureLayout
+from models.animation_clock import AnimationClock
+from models.cue_list import CueTimeline
 from controllers.osc_handler import OSCHandler
+from controllers.config_watcher import ConfigReloader
+from controllers.render_pool import RenderPool
+from controllers.clock_sync import ShowClock, ClockLeader, ClockFollower, parse_sync_targets
+from controllers.audio_input import AudioRouter
+from controllers.engine_thread import EngineThread
 from ui.led_simulator import LEDSimulator
 
 def create_default_segments(effect: LightEffect, count: int = 3):
@@ -57,6 +67,25 @@ def create_default_effects(scene: LightScene, num_effects: int = 3):
         create_default_segments(effect, count=3)
         scene.add_effect(effect_id, effect)
 
+def create_audio_router(args, scene_manager=None, scenes=None):
+    if not args.audio_input:
+        return None
+    if not args.audio_routes:
+        logger.warning("--audio-input needs --audio-routes; audio input disabled")
+        return None
+
+    try:
+        audio_router = AudioRouter.load_from_json(args.audio_routes, args.audio_input,
+                                                  scene_manager=scene_manager, scenes=scenes,
+                                                  sample_rate=args.audio_rate, channels=args.audio_channels,
+                                                  loop=args.audio_loop)
+        audio_router.analyzer.start()
+        logger.info(f"Audio routes loaded from {args.audio_routes}: {len(audio_router.routes)} routes")
+        return audio_router
+    except Exception as e:
+        logger.error(f"Error starting audio input {args.audio_input}: {e}")
+        return None
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='LED Color Signal Generator')
     parser.add_argument('--fps', type=int, default=DEFAULT_FPS, help=f'Frames per second (default: {DEFAULT_FPS})')
@@ -69,6 +98,19 @@ def parse_arguments():
     parser.add_argument('--config-file', type=str, help='Load configuration from a JSON file')
     parser.add_argument('--scale-factor', type=float, default=1.2, help='Scale factor for UI elements (default: 1.2)')
     parser.add_argument('--japanese-font', type=str, help='Path to Japanese font file')
+    parser.add_argument('--no-reload', action='store_true', help='Do not reload the configuration file when it changes')
+    parser.add_argument('--layout-file', type=str, help='Fixture layout JSON mapping the LED output onto physical strips')
+    parser.add_argument('--render-workers', type=int, default=0, help='Render scenes as zones in this many worker processes (headless mode only)')
+    parser.add_argument('--journal-dir', type=str, help='Directory for crash-safe live state journaling and recovery')
+    parser.add_argument('--sync-leader', type=str, help='Broadcast the show clock to these host:port targets, comma-separated (headless mode only)')
+    parser.add_argument('--sync-follow', type=int, help='Follow the show clock received on this UDP port (headless mode only)')
+    parser.add_argument('--cue-file', type=str, help='Run the cue list in this JSON file from startup')
+    parser.add_argument('--audio-input', type=str, help='Modulate segments from this WAV file, or "-" for raw 16-bit PCM on stdin')
+    parser.add_argument('--audio-routes', type=str, help='JSON file routing audio bands to segment parameters')
+    parser.add_argument('--audio-rate', type=int, default=AUDIO_SAMPLE_RATE, help=f'Sample rate of raw PCM on stdin (default: {AUDIO_SAMPLE_RATE})')
+    parser.add_argument('--audio-channels', type=int, default=AUDIO_CHANNELS, help=f'Channel count of raw PCM on stdin (default: {AUDIO_CHANNELS})')
+    parser.add_argument('--audio-loop', action='store_true', help='Restart the audio file when it ends')
+    parser.add_argument('--inline-engine', action='store_true', help='Render in the simulator loop instead of on a separate engine thread')
     return parser.parse_args()
 
 def main():
@@ -78,11 +120,25 @@ def main():
     logger.info(f"FPS: {args.fps}, LED Count: {args.led_count}, OSC: {args.osc_ip}:{args.in_port}:{args.out_port}")
     
     light_scenes = {}
+    config_scene = None
+    
+    journal = None
+    recovered_scenes = None
+    if args.journal_dir:
+        journal = StateJournal(args.journal_dir)
+        try:
+            recovered_scenes = journal.recover()
+        except Exception as e:
+            logger.error(f"Error recovering state from journal {args.journal_dir}: {e}")
     
-    if args.config_file and os.path.exists(args.config_file):
+    if recovered_scenes:
+        light_scenes = recovered_scenes
+        logger.info(f"Live state recovered from journal {args.journal_dir}")
+    elif args.config_file and os.path.exists(args.config_file):
         try:
-            scene = LightScene.load_from_json(args.config_file)
+            scene = LightScene.load_from_file(args.config_file)
             light_scenes[scene.scene_ID] = scene
+            config_scene = scene
             logger.info(f"Configuration loaded from {args.config_file}")
         except Exception as e:
             logger.error(f"Error loading configuration from {args.config_file}: {e}")
@@ -104,11 +160,34 @@ def main():
         if not os.path.exists(japanese_font):
             logger.warning(f"Japanese font not found. UI may not display Japanese characters properly.")
     
+    if journal:
+        journal.attach(light_scenes)
+        journal.start()
+    
+    layout = None
+    if args.layout_file:
+        try:
+            layout = FixtureLayout.load_from_json(args.layout_file)
+            logger.info(f"Fixture layout loaded from {args.layout_file}: {len(layout.strips)} strips, "
+                        f"{layout.total_leds} LEDs, {layout.logical_count} logical LEDs")
+        except Exception as e:
+            logger.error(f"Error loading fixture layout from {args.layout_file}: {e}")
+    
     osc_handler = None
     if not args.simulator_only:
-        osc_handler = OSCHandler(light_scenes, ip=args.osc_ip, in_port=args.in_port, out_port=args.out_port)
+        osc_handler = OSCHandler(light_scenes, ip=args.osc_ip, in_port=args.in_port, out_port=args.out_port,
+                                 journal=journal, layout=layout)
         osc_handler.start_server()
     
+    render_pool = None
+    engine = None
+    clock_sync = None
+    audio_router = None
+    config_reloader = None
+    if config_scene is not None and not args.no_reload:
+        config_reloader = ConfigReloader(args.config_file, light_scenes, config_scene.scene_ID, journal=journal)
+        config_reloader.start()
+    
     try:
         if not args.no_gui:
             logger.info("Starting LED Simulator...")
@@ -118,7 +197,24 @@ def main():
             for scene_id, scene in light_scenes.items():
                 scene_manager.add_scene(scene_id, scene)
             
-            simulator = LEDSimulator(scene_manager=scene_manager)
+            if config_reloader:
+                scene_manager.add_frame_hook(config_reloader.apply_pending)
+            
+            if args.cue_file:
+                timeline = CueTimeline(scene_manager)
+                timeline.load_file(args.cue_file)
+                timeline.start()
+                scene_manager.add_frame_hook(timeline.poll)
+            
+            audio_router = create_audio_router(args, scene_manager=scene_manager)
+            if audio_router:
+                scene_manager.add_frame_hook(audio_router.poll)
+            
+            if not args.inline_engine:
+                # The engine sends the hardware frames itself, so the GUI cannot delay them
+                engine = EngineThread(scene_manager, fps=args.fps, osc_handler=osc_handler)
+            
+            simulator = LEDSimulator(scene_manager=scene_manager, engine=engine)
             simulator.ui_state['scale_factor'] = args.scale_factor
             
             if os.path.exists(japanese_font):
@@ -128,23 +224,94 @@ def main():
             if not args.simulator_only and osc_handler:
                 osc_handler.set_simulator(simulator)
                 
-                if hasattr(scene_manager, 'osc_handler'):
+                if engine is None and hasattr(scene_manager, 'osc_handler'):
                     scene_manager.osc_handler = osc_handler
             
+            if engine:
+                engine.start()
             simulator.run()
             
         else:
             logger.info("Running in headless mode (no GUI)...")
             logger.info("Press Ctrl+C to exit")
             
+            scene_manager = None
+            if args.render_workers > 0:
+                render_pool = RenderPool(light_scenes, workers=args.render_workers)
+                render_pool.start()
+                if osc_handler:
+                    osc_handler.render_pool = render_pool
+            else:
+                from models.scene_manager import SceneManager
+                
+                scene_manager = SceneManager()
+                for scene_id, scene in sorted(light_scenes.items()):
+                    scene_manager.add_scene(scene_id, scene)
+                if osc_handler:
+                    osc_handler.scene_manager = scene_manager
+            
+            show_clock = ShowClock(args.fps)
+            if args.sync_leader:
+                clock_sync = ClockLeader(show_clock, parse_sync_targets(args.sync_leader))
+            elif args.sync_follow:
+                clock_sync = ClockFollower(show_clock, args.sync_follow)
+            if clock_sync:
+                clock_sync.start()
+                if osc_handler:
+                    osc_handler.clock_sync = clock_sync
+            
+            timeline = None
+            if args.cue_file:
+                timeline = CueTimeline(scene_manager, scenes=light_scenes)
+                if render_pool:
+                    timeline.on_scene_cue = lambda scene_id, cue: render_pool.submit("cue", scene=scene_id, cue=cue)
+                timeline.load_file(args.cue_file)
+                # Cue times are show times, so synced nodes fire each cue on the same frame
+                timeline.start(0.0)
+            
+            audio_router = create_audio_router(args, scene_manager=scene_manager, scenes=light_scenes)
+            if audio_router and render_pool:
+                audio_router.on_scene_cue = lambda scene_id, cue: render_pool.submit("cue", scene=scene_id, cue=cue)
+            
+            # Synced nodes catch up on any stall so their animations stay aligned with the show clock
+            animation_clock = AnimationClock(show_clock.now, max_catch_up=None if clock_sync else ANIMATION_MAX_CATCH_UP)
+            
+            last_frame = show_clock.frame() - 1
             while True:
-                for scene in light_scenes.values():
-                    scene.update()
+                frame = show_clock.frame()
+                if frame <= last_frame:
+                    if last_frame - frame > args.fps:
+                        logger.warning(f"Show clock moved back from frame {last_frame} to {frame}")
+                        last_frame = frame - 1
+                    else:
+                        show_clock.sleep_until(show_clock.frame_time(last_frame + 1))
+                        continue
+                
+                last_frame = frame
+                dt, catch_up = animation_clock.tick()
+                
+                if config_reloader and config_reloader.apply_pending() and render_pool:
+                    reloaded_scene = config_reloader.scene
+                    render_pool.submit("scene", scene=reloaded_scene.scene_ID, data=reloaded_scene.to_dict())
+                
+                if timeline:
+                    timeline.poll(show_clock.frame_time(frame))
+                
+                if audio_router:
+                    audio_router.poll()
+                
+                led_colors = None
+                if render_pool:
+                    led_colors = render_pool.render_frame(catch_up, dt)
+                else:
+                    if catch_up > 0:
+                        scene_manager.fast_forward(catch_up)
+                    scene_manager.update(dt)
                     
                 if osc_handler and hasattr(osc_handler, 'send_led_binary_data'):
-                    osc_handler.send_led_binary_data()
+                    osc_handler.send_led_binary_data(led_colors)
                     
-                time.sleep(1.0/args.fps)
+                show_clock.sleep_until(show_clock.frame_time(frame + 1))
                 
     except KeyboardInterrupt:
         logger.info("User interrupted. Shutting down...")
@@ -153,8 +320,20 @@ def main():
         import traceback
         traceback.print_exc()
     finally:
+        if engine:
+            engine.stop()
+        if audio_router:
+            audio_router.analyzer.stop()
+        if config_reloader:
+            config_reloader.stop()
         if not args.simulator_only and osc_handler:
             osc_handler.stop_server()
+        if render_pool:
+            render_pool.stop()
+        if clock_sync:
+            clock_sync.stop()
+        if journal:
+            journal.stop()
         logger.info("System shutdown complete.")
 
 if __name__ == "__main__":
@@ -1,6 +1,9 @@
 from .light_segment import LightSegment
 from .light_effect import LightEffect
 from .light_scene import LightScene
+from .effect_layer import EffectLayer
 from .scene_manager import SceneManager
+from .animation_clock import AnimationClock
+from .cue_list import CueTimeline
 
-__all__ = ['LightSegment', 'LightEffect', 'LightScene', 'SceneManager']
\ No newline at end of file
+__all__ = ['LightSegment', 'LightEffect', 'LightScene', 'EffectLayer', 'SceneManager', 'AnimationClock', 'CueTimeline']
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Wall-clock time base for animation updates.
+
+Segment speeds are given in LEDs per second, so animation is advanced by the real time that
+passed since the previous update rather than by a fixed 1 / fps step. Short delays are simply
+stepped over. After a longer stall (a slow frame, a dragged window, a stepped show clock) the
+bulk of the missed time is fast-forwarded in closed form and only the last step is simulated;
+stalls beyond the catch-up limit are dropped, so the animation resumes where it stopped.
+"""
+
+from typing import Callable, Optional, Tuple
+import sys
+import time
+
+sys.path.append('..')
+from config import ANIMATION_MAX_STEP, ANIMATION_MAX_CATCH_UP
+
+
+class AnimationClock:
+    """
+    AnimationClock measures the time between animation updates on a monotonic time source.
+    """
+
+    def __init__(self, time_source: Callable[[], float] = time.monotonic,
+                 max_step: float = ANIMATION_MAX_STEP,
+                 max_catch_up: Optional[float] = ANIMATION_MAX_CATCH_UP):
+        """
+        Initialize the clock.
+
+        Args:
+            time_source: Function returning the current time in seconds, e.g. ShowClock.now
+            max_step: Longest time span advanced with a single simulated step
+            max_catch_up: Longest stall that is fast-forwarded (None: no limit)
+        """
+        self.time_source = time_source
+        self.max_step = max_step
+        self.max_catch_up = max_catch_up
+        self._last = time_source()
+
+        self.stats = {
+            'ticks': 0,
+            'stalls': 0,
+            'caught_up': 0.0,
+            'dropped': 0.0
+        }
+
+    def reset(self):
+        """
+        Start measuring from now, e.g. when playback resumes after a pause.
+        """
+        self._last = self.time_source()
+
+    def tick(self) -> Tuple[float, float]:
+        """
+        Measure the time since the previous tick.
+
+        Returns:
+            Tuple of (step, catch_up): the time to advance with a regular update, and the time to
+            fast-forward before it; both are 0 if the time source did not move forward
+        """
+        now = self.time_source()
+        elapsed = now - self._last
+        self._last = now
+        self.stats['ticks'] += 1
+
+        if elapsed <= 0:
+            return 0.0, 0.0
+        if elapsed <= self.max_step:
+            return elapsed, 0.0
+
+        self.stats['stalls'] += 1
+        catch_up = elapsed - self.max_step
+        if self.max_catch_up is not None and catch_up > self.max_catch_up:
+            self.stats['dropped'] += catch_up - self.max_catch_up
+            catch_up = self.max_catch_up
+        self.stats['caught_up'] += catch_up
+        return self.max_step, catch_up
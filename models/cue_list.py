@@ -0,0 +1,320 @@
+"""
+Cue-list timeline for running shows from inside the process.
+
+A cue is a dictionary with a time in seconds from the start of the timeline, an action and the
+fields of that action:
+
+    {"time": 12.5, "action": "segment", "scene": 1, "effect": 1, "segment": 2, "param": "move_speed", "value": 40, "glide": 2.0}
+    {"time": 16.0, "action": "effect", "scene": 1, "effect": 2}
+    {"time": 16.0, "action": "palette", "scene": 1, "palette": "B"}
+    {"time": 20.0, "action": "effect_transition", "scene": 1, "effect": 3, "palette": "C", "fade_in": 1.0, "fade_out": 1.0}
+    {"time": 30.0, "action": "scene", "scene": 2}
+    {"time": 45.0, "action": "transition", "scene": 1, "effect": 1, "palette": "A", "fade_in": 2.0, "fade_out": 2.0}
+    {"time": 60.0, "action": "cue_file", "file": "act2.json"}
+
+Pending cues are kept in a heap ordered by time (cues with equal times keep their file order),
+so scheduling and firing a cue costs O(log n) however long the show is. Cues are applied at frame
+boundaries: every cue due at or before the frame's time is applied before the frame is rendered.
+Cue files are only parsed when the timeline reaches them; a "cue_file" cue schedules the cues of
+another file relative to its own time, so long shows can be split into acts loaded as they come up.
+A file may include itself or an earlier file later in the show (e.g. to loop an act), but an
+include that would expand a file again at the same time is rejected, since it would never end.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Set
+import heapq
+import itertools
+import os
+import sys
+import time
+
+sys.path.append('..')
+from models.scene_format import read_json
+from utils.file_cache import file_cache
+
+import logging
+
+logger = logging.getLogger("color_signal_system")
+
+SCENE_CUE_ACTIONS = ("segment", "effect", "palette", "effect_transition")
+MANAGER_CUE_ACTIONS = ("scene", "transition")
+CUE_ACTIONS = SCENE_CUE_ACTIONS + MANAGER_CUE_ACTIONS + ("cue_file",)
+
+_REQUIRED_FIELDS = {
+    "segment": ("effect", "segment", "param", "value"),
+    "effect": ("effect",),
+    "palette": ("palette",),
+    "scene": ("scene",),
+    "cue_file": ("file",)
+}
+
+
+def validate_cue(cue: Dict[str, Any]):
+    """
+    Check the structure of a single cue.
+
+    Args:
+        cue: Cue dictionary
+
+    Raises:
+        ValueError: If the time, action or action fields are missing or malformed
+    """
+    if not isinstance(cue, dict):
+        raise ValueError("Cue must be an object")
+    cue_time = cue.get("time")
+    if isinstance(cue_time, bool) or not isinstance(cue_time, (int, float)) or cue_time < 0:
+        raise ValueError(f"Cue needs a non-negative time: {cue}")
+    action = cue.get("action")
+    if action not in CUE_ACTIONS:
+        raise ValueError(f"Unknown cue action: {action}")
+    missing = [field for field in _REQUIRED_FIELDS.get(action, ()) if field not in cue]
+    if missing:
+        raise ValueError(f"Cue action {action} is missing {', '.join(missing)}")
+
+
+def validate_cue_data(data: Dict[str, Any]):
+    """
+    Check the structure of a cue file.
+
+    Args:
+        data: Dictionary with a "cues" list
+
+    Raises:
+        ValueError: If the cues are malformed
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("cues"), list):
+        raise ValueError("Cue file must contain a list of cues")
+    for index, cue in enumerate(data["cues"]):
+        try:
+            validate_cue(cue)
+        except ValueError as e:
+            raise ValueError(f"Cue {index}: {e}")
+
+
+def apply_scene_cue(scene, cue: Dict[str, Any]):
+    """
+    Apply a cue that changes a single scene.
+
+    Args:
+        scene: LightScene to change
+        cue: Cue dictionary with one of SCENE_CUE_ACTIONS; a move_speed segment cue with
+            "keep_direction" only sets the speed magnitude of a reflecting segment
+    """
+    action = cue["action"]
+
+    if action == "segment":
+        effect = scene.effects.get(cue["effect"]) if cue["effect"] in scene.effects else None
+        if effect is None or cue["segment"] not in effect.segments:
+            raise KeyError(f"Scene {scene.scene_ID} has no effect {cue['effect']} segment {cue['segment']}")
+        value = cue["value"]
+        if cue.get("keep_direction") and cue["param"] == "move_speed":
+            segment = effect.segments[cue["segment"]]
+            if segment.is_edge_reflect:
+                # Reflecting segments bounce by flipping the sign of their speed
+                value = abs(value) * segment.direction
+        effect.update_segment_param(cue["segment"], cue["param"], value, cue.get("glide", 0.0))
+    elif action == "effect":
+        scene.switch_effect(cue["effect"])
+    elif action == "palette":
+        scene.set_palette(cue["palette"])
+    elif action == "effect_transition":
+        scene.set_transition_params(cue.get("effect"), cue.get("palette"),
+                                    cue.get("fade_in", 0.0), cue.get("fade_out", 0.0))
+
+
+class CueTimeline:
+    """
+    CueTimeline applies time-stamped cues to a SceneManager or to a set of scenes.
+    """
+
+    def __init__(self, scene_manager=None, scenes: Optional[Dict[int, Any]] = None,
+                 time_source: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty, stopped timeline.
+
+        Args:
+            scene_manager: SceneManager receiving the cues (its scenes are used for scene cues)
+            scenes: Dictionary of scene_ID -> LightScene, when there is no scene manager
+            time_source: Function returning the current time in seconds, e.g. ShowClock.now
+        """
+        self.scene_manager = scene_manager
+        self._scenes = scenes if scenes is not None else {}
+        self.time_source = time_source
+        self.on_scene_cue: Optional[Callable[[int, Dict[str, Any]], None]] = None
+
+        self.start_time = None
+        self.position = 0.0
+
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        # Files being expanded at the time of each pending zero-time include, by sequence number
+        self._includes: Dict[int, frozenset] = {}
+
+        self.stats = {
+            'scheduled': 0,
+            'applied': 0,
+            'errors': 0,
+            'files': 0
+        }
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> bool:
+        return self.start_time is not None
+
+    @property
+    def scenes(self) -> Dict[int, Any]:
+        return self.scene_manager.scenes if self.scene_manager is not None else self._scenes
+
+    def add_cue(self, cue: Dict[str, Any], offset: float = 0.0):
+        """
+        Schedule a cue.
+
+        Args:
+            cue: Cue dictionary (see the module docstring)
+            offset: Added to the cue's time, e.g. the time of the cue file it came from
+
+        Raises:
+            ValueError: If the cue is malformed
+        """
+        self._schedule(cue, offset)
+
+    def _schedule(self, cue: Dict[str, Any], offset: float) -> int:
+        validate_cue(cue)
+        sequence = next(self._sequence)
+        heapq.heappush(self._queue, (offset + cue["time"], sequence, cue))
+        self.stats['scheduled'] += 1
+        return sequence
+
+    def load_file(self, file_path: str, at: float = 0.0):
+        """
+        Schedule a cue file. The file is parsed when the timeline reaches the given time.
+
+        Args:
+            file_path: Path to the JSON cue file
+            at: Timeline time at which the file's cues start
+        """
+        self.add_cue({"time": 0.0, "action": "cue_file", "file": os.path.abspath(file_path)}, at)
+
+    def start(self, at: Optional[float] = None):
+        """
+        Start the timeline.
+
+        Args:
+            at: Time (on the time source) at which the timeline starts (default: now)
+        """
+        self.start_time = self.time_source() if at is None else at
+
+    def stop(self):
+        """
+        Stop the timeline. Pending cues are kept.
+        """
+        self.start_time = None
+
+    def next_cue_time(self) -> Optional[float]:
+        """
+        Get the timeline time of the next pending cue.
+
+        Returns:
+            Time in seconds, or None if no cues are pending
+        """
+        return self._queue[0][0] if self._queue else None
+
+    def poll(self, now: Optional[float] = None) -> Set[int]:
+        """
+        Apply every cue that is due. Call at each frame boundary, before updating the scenes;
+        without arguments it can be registered as a SceneManager frame hook.
+
+        Args:
+            now: Current time on the time source, e.g. the frame's show time (default: time_source())
+
+        Returns:
+            IDs of the scenes changed by scene cues
+        """
+        changed = set()
+        if self.start_time is None:
+            return changed
+
+        self.position = (self.time_source() if now is None else now) - self.start_time
+
+        while self._queue and self._queue[0][0] <= self.position:
+            cue_time, sequence, cue = heapq.heappop(self._queue)
+            try:
+                scene_ID = self._apply(cue, cue_time, self._includes.pop(sequence, frozenset()))
+                if scene_ID is not None:
+                    changed.add(scene_ID)
+                self.stats['applied'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error applying cue at {cue_time:.3f}s ({cue.get('action')}): {e}")
+
+        return changed
+
+    def _apply(self, cue: Dict[str, Any], cue_time: float, includes: frozenset = frozenset()) -> Optional[int]:
+        action = cue["action"]
+
+        if action == "cue_file":
+            self._load_cues(cue["file"], cue_time, includes)
+            return None
+
+        if action in MANAGER_CUE_ACTIONS:
+            if self.scene_manager is None:
+                raise ValueError(f"Cue action {action} needs a scene manager")
+            if action == "scene":
+                self.scene_manager.switch_scene(cue["scene"])
+            else:
+                self.scene_manager.set_transition_params(cue.get("scene"), cue.get("effect"), cue.get("palette"),
+                                                         cue.get("fade_in", 0.0), cue.get("fade_out", 0.0))
+            return None
+
+        scene_ID = cue.get("scene")
+        if scene_ID is None and self.scene_manager is not None:
+            scene_ID = self.scene_manager.current_scene
+        if scene_ID is None and len(self._scenes) == 1:
+            scene_ID = next(iter(self._scenes.keys()))
+        scenes = self.scenes
+        if scene_ID not in scenes:
+            raise KeyError(f"No scene {scene_ID}")
+
+        apply_scene_cue(scenes[scene_ID], cue)
+        if self.on_scene_cue:
+            self.on_scene_cue(scene_ID, cue)
+        return scene_ID
+
+    def _load_cues(self, file_path: str, offset: float, includes: frozenset = frozenset()):
+        data = file_cache.get(file_path, "cue_list", read_json, validate_cue_data)
+        base_dir = os.path.dirname(file_path)
+        includes = includes | {os.path.realpath(file_path)}
+
+        for cue in data["cues"]:
+            if cue["action"] != "cue_file":
+                self._schedule(cue, offset)
+                continue
+
+            cue = dict(cue, file=os.path.normpath(os.path.join(base_dir, cue["file"])))
+            if cue["time"] > 0:
+                self._schedule(cue, offset)
+            elif os.path.realpath(cue["file"]) in includes:
+                self.stats['errors'] += 1
+                logger.error(f"Cue file {file_path} includes {cue['file']} at time 0, which is already being "
+                             f"expanded at {offset:.3f}s; the include is ignored")
+            else:
+                self._includes[self._schedule(cue, offset)] = includes
+
+        self.stats['files'] += 1
+        logger.info(f"Loaded {len(data['cues'])} cues from {file_path} at {offset:.3f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get a copy of the timeline counters.
+
+        Returns:
+            Dictionary of counter name -> value, with the current position and pending cue count
+        """
+        stats = dict(self.stats)
+        stats['pending'] = len(self._queue)
+        stats['position'] = self.position
+        stats['running'] = self.running
+        return stats
@@ -0,0 +1,43 @@
+from typing import Dict
+import sys
+sys.path.append('..')
+from utils.color_utils import BLEND_MODES
+
+
+class EffectLayer:
+    """
+    EffectLayer places a LightEffect in a scene's layer stack.
+    Layers are composited bottom to top; each layer's coverage comes from its segments' transparency
+    and is scaled by the layer opacity.
+    """
+    
+    def __init__(self, effect_ID: int, opacity: float = 1.0, blend_mode: str = "normal"):
+        """
+        Initialize a layer.
+        
+        Args:
+            effect_ID: ID of the effect rendered by this layer
+            opacity: Layer opacity (0.0-1.0)
+            blend_mode: One of normal/over, add, multiply, max, screen
+        """
+        if blend_mode not in BLEND_MODES:
+            raise ValueError(f"Unknown blend mode: {blend_mode}")
+        
+        self.effect_ID = int(effect_ID)
+        self.opacity = max(0.0, min(1.0, float(opacity)))
+        self.blend_mode = blend_mode
+    
+    def to_dict(self) -> Dict:
+        return {
+            "effect_ID": self.effect_ID,
+            "opacity": self.opacity,
+            "blend_mode": self.blend_mode
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict):
+        return cls(
+            effect_ID=data["effect_ID"],
+            opacity=data.get("opacity", 1.0),
+            blend_mode=data.get("blend_mode", "normal")
+        )
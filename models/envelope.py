@@ -0,0 +1,228 @@
+"""
+Brightness envelopes of segments, compiled into lookup tables.
+
+An envelope is a list of [time_ms, level] or [time_ms, level, curve] points that repeats every
+time_ms of its last point. Before the first point the level holds the first point's level;
+between points it ramps with the curve of the point it ramps to: "linear", "exponential"
+(slow start, fast finish) or "s_curve" (eased at both ends). dimmer_time_ratio stretches the
+times, as it does for dimmer_time.
+
+Segments without an envelope use the dimmer_time trapezoid
+[fade_in_start, fade_in_end, fade_out_start, fade_out_end, cycle_length] as a preset.
+
+An envelope is compiled once, when a segment's parameters change, into a table of levels with
+one entry per millisecond of its cycle (at most ENVELOPE_LUT_SIZE entries). The tables of the
+segments rendered together are kept back to back in one array, so the brightness of all of
+them is a single indexed read per frame.
+"""
+
+from typing import Any, Iterable, List, Optional, Tuple
+import math
+import sys
+import weakref
+import numpy as np
+
+sys.path.append('..')
+from config import ENVELOPE_LUT_SIZE, ENVELOPE_BANK_CACHE_SIZE
+
+ENVELOPE_CURVES = ("linear", "exponential", "s_curve")
+
+_EXPONENTIAL_RATE = 4.0
+
+
+def normalize_envelope(points: Optional[Iterable]) -> Optional[Tuple[tuple, ...]]:
+    """
+    Check envelope points and bring them into their stored form.
+
+    Args:
+        points: Sequence of [time_ms, level] or [time_ms, level, curve] points (None for no envelope)
+
+    Returns:
+        Tuple of (time_ms, level, curve) tuples, or None
+
+    Raises:
+        ValueError: If the points are malformed, out of order or out of range
+    """
+    if points is None:
+        return None
+
+    result = []
+    last_time = 0.0
+    for point in points:
+        if not isinstance(point, (list, tuple)) or len(point) not in (2, 3):
+            raise ValueError(f"Envelope point must be [time_ms, level] or [time_ms, level, curve]: {point}")
+        time_ms, level = float(point[0]), float(point[1])
+        curve = point[2] if len(point) == 3 else "linear"
+        if time_ms < last_time:
+            raise ValueError(f"Envelope point times must not decrease: {point}")
+        if not 0.0 <= level <= 1.0:
+            raise ValueError(f"Envelope level must be between 0 and 1: {point}")
+        if curve not in ENVELOPE_CURVES:
+            raise ValueError(f"Unknown envelope curve: {curve}")
+        result.append((time_ms, level, curve))
+        last_time = time_ms
+
+    if not result or result[-1][0] <= 0:
+        raise ValueError("Envelope needs a point after 0 ms")
+    return tuple(result)
+
+
+def envelope_to_list(points: Optional[tuple]) -> Optional[List[list]]:
+    """
+    Convert stored envelope points to the nested lists used in JSON files.
+
+    Args:
+        points: Stored envelope points, or None
+
+    Returns:
+        List of [time_ms, level, curve] lists, or None
+    """
+    return [list(point) for point in points] if points is not None else None
+
+
+class Envelope:
+    """
+    Envelope is a compiled, immutable brightness envelope: a table of levels over one cycle.
+    Use get_envelope to obtain a shared instance.
+    """
+
+    __slots__ = ('table', 'cycle', 'scale', '__weakref__')
+
+    def __init__(self, table: np.ndarray, cycle: float):
+        """
+        Initialize an envelope.
+
+        Args:
+            table: Levels sampled at equal steps over one cycle
+            cycle: Cycle length in milliseconds
+        """
+        self.table = table
+        self.cycle = float(cycle)
+        # Exactly 1.0 when the table has one entry per millisecond
+        self.scale = len(table) / self.cycle
+
+    def level(self, time: float) -> float:
+        """
+        Get the level at a segment time.
+
+        Args:
+            time: Segment time in seconds
+
+        Returns:
+            Brightness level from 0.0 to 1.0
+        """
+        index = int((time * 1000) % self.cycle * self.scale)
+        return float(self.table[min(index, len(self.table) - 1)])
+
+
+FULL_ENVELOPE = Envelope(np.ones(1), 1.0)
+
+_envelopes = weakref.WeakValueDictionary()
+
+
+def _dimmer_table(dimmer_time: tuple, ratio: float) -> Optional[Tuple[np.ndarray, float]]:
+    if not dimmer_time or len(dimmer_time) < 5 or dimmer_time[4] <= 0:
+        return None
+
+    cycle = int(dimmer_time[4] * ratio)
+    if cycle <= 0:
+        return None
+
+    fade_in_start, fade_in_end, fade_out_start, fade_out_end = (int(value * ratio) for value in dimmer_time[:4])
+    samples = min(cycle, ENVELOPE_LUT_SIZE)
+    current_time = np.arange(samples) if samples == cycle else np.floor(np.arange(samples) * (cycle / samples))
+
+    table = np.select(
+        [current_time < fade_in_start, current_time < fade_in_end,
+         current_time < fade_out_start, current_time < fade_out_end],
+        [0.0, (current_time - fade_in_start) / max(1, fade_in_end - fade_in_start),
+         1.0, 1.0 - (current_time - fade_out_start) / max(1, fade_out_end - fade_out_start)],
+        0.0)
+    return table, cycle
+
+
+def _points_table(points: tuple, ratio: float) -> Optional[Tuple[np.ndarray, float]]:
+    times = np.array([point[0] for point in points]) * ratio
+    levels = np.array([point[1] for point in points])
+    curves = np.array([ENVELOPE_CURVES.index(point[2]) for point in points])
+
+    cycle = times[-1]
+    if cycle <= 0:
+        return None
+
+    samples = max(1, min(int(math.ceil(cycle)), ENVELOPE_LUT_SIZE))
+    sample_time = np.arange(samples) * (cycle / samples)
+
+    # Ramp k runs from point k - 1 to point k; before the first point the level holds
+    target = np.clip(np.searchsorted(times, sample_time, side='right'), 0, len(points) - 1)
+    source = np.maximum(target - 1, 0)
+    span = times[target] - times[source]
+    progress = np.clip(np.divide(sample_time - times[source], span, out=np.ones_like(span), where=span > 0), 0.0, 1.0)
+
+    curve = curves[target]
+    shaped = np.select([curve == 1, curve == 2],
+                       [np.expm1(_EXPONENTIAL_RATE * progress) / np.expm1(_EXPONENTIAL_RATE),
+                        progress * progress * (3.0 - 2.0 * progress)],
+                       progress)
+    table = np.where(sample_time < times[0], levels[0], levels[source] + (levels[target] - levels[source]) * shaped)
+    return table, cycle
+
+
+def get_envelope(fade: bool, dimmer_time: tuple, dimmer_time_ratio: float, points: Optional[tuple]) -> Envelope:
+    """
+    Get the compiled envelope for a segment's parameters, compiling it if needed.
+
+    Args:
+        fade: Whether fading is enabled (FULL_ENVELOPE is returned otherwise)
+        dimmer_time: Fade timing parameters used when there are no envelope points
+        dimmer_time_ratio: Ratio to stretch or shrink the envelope times
+        points: Normalized envelope points, or None
+
+    Returns:
+        Shared Envelope
+    """
+    if not fade:
+        return FULL_ENVELOPE
+
+    ratio = 1.0 if dimmer_time_ratio is None else dimmer_time_ratio
+    key = (dimmer_time, ratio, points) if points is None else (None, ratio, points)
+    envelope = _envelopes.get(key)
+    if envelope is None:
+        compiled = _points_table(points, ratio) if points is not None else _dimmer_table(dimmer_time, ratio)
+        envelope = Envelope(*compiled) if compiled is not None else FULL_ENVELOPE
+        _envelopes[key] = envelope
+    return envelope
+
+
+_banks = {}
+
+
+def envelope_levels(envelopes: List[Envelope], times: np.ndarray) -> np.ndarray:
+    """
+    Evaluate many envelopes at once.
+
+    Args:
+        envelopes: Envelope of each segment
+        times: Segment times in seconds
+
+    Returns:
+        Brightness level of each segment
+    """
+    key = tuple(envelopes)
+    bank = _banks.get(key)
+    if bank is None:
+        if len(_banks) >= ENVELOPE_BANK_CACHE_SIZE:
+            _banks.clear()
+
+        unique = list(dict.fromkeys(envelopes))
+        offsets = dict(zip(unique, np.cumsum([0] + [len(envelope.table) for envelope in unique[:-1]]).tolist()))
+        bank = (np.concatenate([envelope.table for envelope in unique]) if unique else np.ones(1),
+                np.array([offsets[envelope] for envelope in envelopes], dtype=np.int64),
+                np.array([envelope.cycle for envelope in envelopes], dtype=np.float64),
+                np.array([envelope.scale for envelope in envelopes], dtype=np.float64),
+                np.array([len(envelope.table) - 1 for envelope in envelopes], dtype=np.int64))
+        _banks[key] = bank
+
+    table, offset, cycle, scale, last = bank
+    index = (np.mod(np.asarray(times, dtype=np.float64) * 1000, cycle) * scale).astype(np.int64)
+    return table[offset + np.minimum(index, last)]
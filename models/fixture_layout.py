@@ -0,0 +1,200 @@
+"""
+Mapping of the logical LED space onto physical strips.
+
+An effect renders a single row of logical LEDs. A FixtureLayout describes how that row is
+distributed over physical strips, each with its own length, direction and offset into the
+logical space. The layout precomputes one index array, so a frame is mapped onto every strip
+with a single numpy gather into a contiguous RGBX output buffer; each strip's output is a
+zero-copy slice of that buffer.
+"""
+
+from typing import Any, Dict, List, Optional
+import sys
+import numpy as np
+
+sys.path.append('..')
+from config import LED_BINARY_OSC_ADDRESS
+from models.scene_format import read_json
+from utils.file_cache import file_cache
+
+
+def pack_rgbx(colors) -> bytes:
+    """
+    Pack LED colors into the 4-bytes-per-LED binary format (r, g, b, 0).
+
+    Args:
+        colors: Sequence or array of [r, g, b] values
+
+    Returns:
+        Packed binary data
+    """
+    colors = np.asarray(colors)
+    if colors.size == 0:
+        return b""
+
+    packed = np.zeros((len(colors), 4), dtype=np.uint8)
+    packed[:, :3] = np.clip(colors[:, :3], 0, 255)
+    return packed.tobytes()
+
+
+def validate_layout_data(data: Dict[str, Any]):
+    """
+    Check the structure of a fixture layout dictionary.
+
+    Args:
+        data: Dictionary with a "strips" list
+
+    Raises:
+        ValueError: If strips are missing or malformed
+    """
+    strips = data.get("strips") if isinstance(data, dict) else None
+    if not isinstance(strips, list) or not strips:
+        raise ValueError("Fixture layout must contain a non-empty list of strips")
+
+    for strip in strips:
+        if not isinstance(strip, dict) or "strip_ID" not in strip or "length" not in strip:
+            raise ValueError(f"Invalid strip definition: {strip}")
+        if int(strip["length"]) <= 0 or int(strip.get("offset", 0)) < 0:
+            raise ValueError(f"Strip {strip['strip_ID']} must have a positive length and a non-negative offset")
+
+
+class Strip:
+    """
+    Strip describes one physical LED strip.
+    """
+
+    def __init__(self, strip_ID: int, length: int, offset: int = 0, reversed: bool = False,
+                 address: Optional[str] = None):
+        """
+        Initialize a strip.
+
+        Args:
+            strip_ID: Unique identifier for this strip
+            length: Number of LEDs on the strip
+            offset: Logical LED index shown by the first LED in the strip's data order
+            reversed: Whether the strip is wired in the opposite direction of the logical space
+            address: OSC address for the strip's output (default: LED_BINARY_OSC_ADDRESS/strip_ID)
+        """
+        self.strip_ID = strip_ID
+        self.length = int(length)
+        self.offset = int(offset)
+        self.reversed = bool(reversed)
+        self.address = address or f"{LED_BINARY_OSC_ADDRESS}/{strip_ID}"
+
+    def to_dict(self) -> Dict:
+        return {
+            "strip_ID": self.strip_ID,
+            "length": self.length,
+            "offset": self.offset,
+            "reversed": self.reversed,
+            "address": self.address
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict):
+        return cls(
+            strip_ID=data["strip_ID"],
+            length=data["length"],
+            offset=data.get("offset", 0),
+            reversed=data.get("reversed", False),
+            address=data.get("address")
+        )
+
+
+class FixtureLayout:
+    """
+    FixtureLayout maps logical LED colors onto a set of physical strips.
+    Strips are stored in output order; the output buffer holds the strips back to back.
+    """
+
+    def __init__(self, strips: List[Strip]):
+        """
+        Initialize the layout and precompute the gather index.
+
+        Args:
+            strips: Physical strips in output order
+        """
+        self.strips = list(strips)
+
+        lengths = np.array([strip.length for strip in self.strips], dtype=np.int64)
+        offsets = np.array([strip.offset for strip in self.strips], dtype=np.int64)
+        reversed_flags = np.array([strip.reversed for strip in self.strips], dtype=bool)
+
+        self.starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self.total_leds = int(lengths.sum())
+        self.logical_count = int((offsets + lengths).max())
+
+        strip_lengths = np.repeat(lengths, lengths)
+        position = np.arange(self.total_leds, dtype=np.int64) - np.repeat(self.starts, lengths)
+        position = np.where(np.repeat(reversed_flags, lengths), strip_lengths - 1 - position, position)
+        self.index = np.repeat(offsets, lengths) + position
+
+        self._source = np.zeros((self.logical_count + 1, 4), dtype=np.uint8)
+        self.buffer = np.zeros((self.total_leds, 4), dtype=np.uint8)
+        self._views = {
+            strip.strip_ID: self.buffer[start:start + strip.length]
+            for strip, start in zip(self.strips, self.starts.tolist())
+        }
+
+    def render(self, colors) -> np.ndarray:
+        """
+        Map a frame of logical LED colors onto all strips.
+        Logical LEDs beyond the rendered frame are black.
+
+        Args:
+            colors: Array or sequence of [r, g, b] values in logical order
+
+        Returns:
+            The layout's (total_leds, 4) RGBX output buffer, reused between frames
+        """
+        colors = np.asarray(colors)
+        count = min(len(colors), self.logical_count)
+
+        if count:
+            self._source[:count, :3] = np.clip(colors[:count, :3], 0, 255)
+        self._source[count:, :3] = 0
+
+        np.take(self._source, self.index, axis=0, out=self.buffer)
+        return self.buffer
+
+    def strip_view(self, strip_ID: int) -> np.ndarray:
+        """
+        Get a strip's part of the output buffer without copying.
+
+        Args:
+            strip_ID: Strip identifier
+
+        Returns:
+            (length, 4) RGBX view into the output buffer
+        """
+        return self._views[strip_ID]
+
+    def strip_views(self) -> Dict[int, np.ndarray]:
+        """
+        Get every strip's part of the output buffer without copying.
+
+        Returns:
+            Dictionary of strip_ID -> (length, 4) RGBX view, in output order
+        """
+        return self._views
+
+    def to_dict(self) -> Dict:
+        return {"strips": [strip.to_dict() for strip in self.strips]}
+
+    @classmethod
+    def from_dict(cls, data: Dict):
+        validate_layout_data(data)
+        return cls([Strip.from_dict(strip_data) for strip_data in data["strips"]])
+
+    @classmethod
+    def load_from_json(cls, file_path: str):
+        """
+        Load a fixture layout from a JSON file.
+
+        Args:
+            file_path: Path to the JSON file
+
+        Returns:
+            A new FixtureLayout instance
+        """
+        return cls.from_dict(file_cache.get(file_path, "fixture_layout", read_json, validate_layout_data))
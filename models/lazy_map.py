@@ -0,0 +1,174 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from collections.abc import MutableMapping
+import sys
+import threading
+
+sys.path.append('..')
+from utils.file_cache import clone_data
+
+
+class _Pending:
+    """
+    Placeholder for a value that has not been built yet.
+    """
+
+    __slots__ = ('loader',)
+
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+
+
+class RawEntry:
+    """
+    The raw data of a pending entry, captured without running its loader.
+    The loader runs when the entry is resolved, typically on the thread that writes it out.
+    """
+
+    __slots__ = ('loader',)
+
+    def __init__(self, loader: Callable[[], Any]):
+        self.loader = loader
+
+    def resolve(self) -> Any:
+        """
+        Run the loader.
+
+        Returns:
+            Copy of the raw data that shares no containers with the loader
+        """
+        return clone_data(self.loader())
+
+
+class LazyMap(MutableMapping):
+    """
+    LazyMap is a dictionary whose values can be registered as raw data and built on first access.
+    It is used for effects and scenes so that loading a large file only constructs what is used.
+    Iteration over keys, len() and membership tests never build anything.
+    """
+
+    def __init__(self, build: Callable[[Any, Any], Any]):
+        """
+        Initialize a LazyMap.
+
+        Args:
+            build: Function (key, data) -> value used to materialize pending entries
+        """
+        self._build = build
+        self._data: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+
+    def add_pending(self, key, loader: Callable[[], Any]):
+        """
+        Register a value that will be built on first access.
+
+        Args:
+            key: Mapping key
+            loader: Function returning the raw data passed to build
+        """
+        with self._lock:
+            self._data[key] = _Pending(loader)
+
+    def is_materialized(self, key) -> bool:
+        """
+        Check whether the value for a key has already been built.
+
+        Args:
+            key: Mapping key
+
+        Returns:
+            True if the key exists and its value is built
+        """
+        value = self._data.get(key)
+        return key in self._data and not isinstance(value, _Pending)
+
+    def pending_keys(self) -> List:
+        """
+        Get the keys whose values have not been built yet.
+
+        Returns:
+            List of keys in insertion order
+        """
+        return [key for key, value in list(self._data.items()) if isinstance(value, _Pending)]
+
+    def materialized_items(self) -> List:
+        """
+        Get (key, value) pairs for values that are already built, without building others.
+
+        Returns:
+            List of (key, value) tuples in insertion order
+        """
+        return [(key, value) for key, value in list(self._data.items()) if not isinstance(value, _Pending)]
+
+    def raw(self, key):
+        """
+        Get the raw data for a pending key without building it.
+
+        Args:
+            key: Mapping key
+
+        Returns:
+            Raw data from the loader, or None if the value is already built
+        """
+        value = self._data[key]
+        if isinstance(value, _Pending):
+            return value.loader()
+        return None
+
+    def raw_entry(self, key) -> Optional[RawEntry]:
+        """
+        Capture the raw data for a pending key without running its loader.
+
+        Args:
+            key: Mapping key
+
+        Returns:
+            RawEntry for the pending value, or None if the value is already built
+        """
+        value = self._data[key]
+        if isinstance(value, _Pending):
+            return RawEntry(value.loader)
+        return None
+
+    def materialize(self, key):
+        """
+        Build the value for a key if it is still pending.
+
+        Args:
+            key: Mapping key
+
+        Returns:
+            The built value
+        """
+        return self[key]
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        if not isinstance(value, _Pending):
+            return value
+
+        with self._lock:
+            value = self._data[key]
+            if isinstance(value, _Pending):
+                value = self._build(key, value.loader())
+                self._data[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator:
+        return iter(list(self._data.keys()))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"LazyMap({len(self._data)} items, {len(self.pending_keys())} pending)"
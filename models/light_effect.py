@@ -1,8 +1,13 @@
 from typing import Dict, List, Any, Tuple, Optional
 import json
 import sys
+import numpy as np
 sys.path.append('..')
 from models.light_segment import LightSegment
+from models.segment_store import SegmentStore
+from models.tween_engine import TweenEngine
+from models.segment_compositor import SegmentIntervalIndex, composite_segments
+from utils.file_utils import write_json_atomic
 from utils.color_utils import blend_colors, apply_transparency, apply_brightness
 
 class LightEffect:
@@ -18,10 +23,13 @@ class LightEffect:
         Args:
             effect_ID: Unique identifier for this effect
             led_count: Total number of LEDs
-            fps: Frame rate for animation updates
+            fps: Nominal frame rate, used as the update step when no elapsed time is given
         """
         self.effect_ID = effect_ID
         self.segments: Dict[int, LightSegment] = {}
+        self.segment_store = SegmentStore()
+        self.segment_index = SegmentIntervalIndex()
+        self.tweens = TweenEngine()
         self.led_count = led_count
         self.fps = fps
         self.time_step = 1.0 / fps
@@ -55,7 +63,13 @@ class LightEffect:
             segment_ID: Unique identifier for the segment
             segment: LightSegment instance to add
         """
+        old_segment = self.segments.get(segment_ID)
+        if old_segment is not None and old_segment is not segment:
+            self.tweens.cancel(segment_ID)
+            old_segment._detach()
+        
         self.segments[segment_ID] = segment
+        segment._attach(self.segment_store)
         
         if hasattr(segment, 'calculate_rgb'):
             segment.rgb_color = segment.calculate_rgb(self.current_palette)
@@ -68,30 +82,100 @@ class LightEffect:
             segment_ID: ID of the segment to remove
         """
         if segment_ID in self.segments:
-            del self.segments[segment_ID]
+            self.tweens.cancel(segment_ID)
+            self.segments.pop(segment_ID)._detach()
     
-    def update_segment_param(self, segment_ID: int, param_name: str, value: Any):
+    def update_segment_param(self, segment_ID: int, param_name: str, value: Any, glide: Optional[float] = None):
         """
         Update a parameter of a specific LightSegment.
+        move_speed, move_range, transparency and dimmer_time_ratio can glide to the new value
+        over the following frames instead of jumping.
         
         Args:
             segment_ID: ID of the segment to update
             param_name: Name of the parameter to update
             value: New value for the parameter
+            glide: Glide time in seconds (default: the glide time set for the parameter, 0 to jump)
         """
         if segment_ID in self.segments:
-            self.segments[segment_ID].update_param(param_name, value)
+            if glide is None:
+                glide = self.tweens.glide_time(segment_ID, param_name)
+            segment = self.segments[segment_ID]
+            if not self.tweens.glide(segment, segment_ID, param_name, value, glide, self.time):
+                segment.update_param(param_name, value)
+    
+    def set_glide_time(self, segment_ID: int, param_name: str, glide: float):
+        """
+        Set the glide time used when a segment parameter is updated without an explicit glide.
+        
+        Args:
+            segment_ID: ID of the segment
+            param_name: Name of the parameter
+            glide: Glide time in seconds (0 to jump)
+        """
+        if glide > 0:
+            self.tweens.glide_times[(segment_ID, param_name)] = glide
+        else:
+            self.tweens.glide_times.pop((segment_ID, param_name), None)
     
-    def update_all(self):
+    def segment_data(self, segment_ID: int) -> Dict:
         """
-        Update all segments based on the frame rate.
+        Get the dictionary representation of a segment, with gliding parameters at their targets.
+        
+        Args:
+            segment_ID: ID of the segment
+            
+        Returns:
+            Segment dictionary in LightSegment.to_dict format
+        """
+        data = self.segments[segment_ID].to_dict()
+        for param_name, value in self.tweens.target_values(segment_ID).items():
+            data[param_name] = list(value) if isinstance(value, (list, tuple)) else value
+        return data
+    
+    def update_all(self, dt: Optional[float] = None):
+        """
+        Advance all segments by the time since the previous update.
         Process movement and time-based effects for each frame.
+        All segments are advanced with one vectorized step over the segment store.
+        
+        Args:
+            dt: Elapsed time in seconds (default: one frame at the effect's frame rate)
         """
-        self.time += self.time_step
+        if dt is None:
+            dt = self.time_step
         
-        for segment in self.segments.values():
-            segment.time = self.time
-            segment.update_position(self.fps)
+        self.time += dt
+        
+        store = self.segment_store
+        store.time[:store.count] = self.time
+        self.tweens.update(self.segments, store, self.time)
+        store.step(dt)
+    
+    def fast_forward(self, elapsed: float):
+        """
+        Advance the animation by a time span without stepping through the frames in between,
+        e.g. when a suspended scene becomes active again.
+        Whole frames are advanced in closed form; the remainder is advanced with one regular update.
+        
+        Args:
+            elapsed: Time span in seconds
+        """
+        if elapsed <= 0:
+            return
+        
+        frames = int(elapsed * self.fps)
+        if frames > 0:
+            self.update_all()
+            self.time += (frames - 1) * self.time_step
+            
+            store = self.segment_store
+            store.time[:store.count] = self.time
+            store.advance(frames - 1, self.time_step)
+        
+        remainder = elapsed - frames * self.time_step
+        if remainder > 1e-9:
+            self.update_all(remainder)
     
     def get_led_output(self) -> List[List[int]]:
         """
@@ -100,42 +184,33 @@ class LightEffect:
         Returns:
             List of RGB color values for each LED [r, g, b]
         """
-
-        led_colors = [[0, 0, 0] for _ in range(self.led_count)]
-        led_transparency = [0.0 for _ in range(self.led_count)] 
-        
+        return self._composite_segments()[0].tolist()
+    
+    def _composite_segments(self) -> Tuple[np.ndarray, np.ndarray]:
         from config import DEFAULT_COLOR_PALETTES
         palette = DEFAULT_COLOR_PALETTES.get(self.current_palette, DEFAULT_COLOR_PALETTES["A"])
-
-        sorted_segments = sorted(self.segments.items(), key=lambda item: item[0])
-
-        for segment_id, segment in sorted_segments:
-            segment_light_data = segment.get_light_data(palette)
-
-            for led_idx, (segment_color, segment_transparency) in segment_light_data.items():
-                if 0 <= led_idx < self.led_count:
-                    
-                    current_led_color = led_colors[led_idx]
-                    current_led_transparency = led_transparency[led_idx] 
-
-                    final_transparency = segment_transparency + current_led_transparency * (1.0 - segment_transparency)
-                    final_transparency = max(0.0, min(1.0, final_transparency)) # Clamp to [0, 1]
-
-                    final_color = [0, 0, 0]
-                    if final_transparency > 1e-6: 
-                        for i in range(3): 
-                            final_color[i] = int(
-                                (segment_color[i] * segment_transparency + 
-                                 current_led_color[i] * current_led_transparency * (1.0 - segment_transparency)) / final_transparency
-                            )
-                        final_color = [max(0, min(255, c)) for c in final_color]
-                    else:
-                        final_color = [0, 0, 0] 
-
-                    led_colors[led_idx] = final_color
-                    led_transparency[led_idx] = final_transparency
         
-        return led_colors
+        sorted_segments = [self.segments[segment_id] for segment_id in sorted(self.segments)]
+        return composite_segments(sorted_segments, palette, self.led_count, self.segment_index)
+    
+    def get_led_array(self) -> np.ndarray:
+        """
+        Get the final LED colors as an array, e.g. for mapping onto a FixtureLayout.
+        
+        Returns:
+            (led_count, 3) uint8 array of RGB values
+        """
+        return self._composite_segments()[0]
+    
+    def get_led_layer(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the LED colors together with their coverage, for compositing in a layer stack.
+        
+        Returns:
+            Tuple of a (led_count, 3) uint8 RGB array and a (led_count,) float32 coverage array
+        """
+        led_colors, led_transparency = self._composite_segments()
+        return led_colors, led_transparency.astype(np.float32)
         
     def to_dict(self) -> Dict:
         """
@@ -145,8 +220,8 @@ class LightEffect:
             Dictionary containing effect properties
         """
         segments_dict = {}
-        for segment_id, segment in self.segments.items():
-            segments_dict[str(segment_id)] = segment.to_dict()
+        for segment_id in self.segments:
+            segments_dict[str(segment_id)] = self.segment_data(segment_id)
             
         return {
             "effect_ID": self.effect_ID,
@@ -190,10 +265,7 @@ class LightEffect:
         Args:
             file_path: Path to save the JSON file
         """
-        data = self.to_dict()
-        
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        write_json_atomic(file_path, self.to_dict())
             
     @classmethod
     def load_from_json(cls, file_path: str):
@@ -1,9 +1,21 @@
 from typing import Dict, List, Any, Optional
 import json
 import sys
+import time
+import numpy as np
 sys.path.append('..')
 from models.light_effect import LightEffect
 from models.light_segment import LightSegment
+from models.effect_layer import EffectLayer
+from models.lazy_map import LazyMap, RawEntry
+from models.segment_template import intern_palette, intern_palettes, palettes_to_lists
+from models.scene_format import (
+    SCENE_FORMAT_EXTENSION, is_compact_scene_file, read_compact_scene, write_compact_scene,
+    read_json, validate_scene_data, validate_palette_data
+)
+from utils.file_cache import file_cache
+from utils.file_utils import write_json_atomic
+from utils.color_utils import blend_frames
 from config import DEFAULT_COLOR_PALETTES
 
 class LightScene:
@@ -22,9 +34,10 @@ class LightScene:
             scene_ID: Unique identifier for this scene
         """
         self.scene_ID = scene_ID
-        self.effects: Dict[int, LightEffect] = {}
+        self.effects: LazyMap = LazyMap(self._materialize_effect)
         self.current_effect_ID = None
-        self.palettes = DEFAULT_COLOR_PALETTES.copy()
+        self.layers: List[EffectLayer] = []
+        self.palettes = intern_palettes(DEFAULT_COLOR_PALETTES)
         self.current_palette = "A"
         self.next_effect_idx = None
         self.next_palette_idx = None
@@ -33,6 +46,7 @@ class LightScene:
         self.transition_start_time = 0.0
         self.effect_transition_active = False
         self.palette_transition_active = False
+        self.suspended_at = None
         
     def add_effect(self, effect_ID: int, effect: LightEffect):
         """
@@ -48,6 +62,24 @@ class LightScene:
         if self.current_effect_ID is None:
             self.current_effect_ID = effect_ID
     
+    def add_pending_effect(self, effect_ID: int, loader):
+        """
+        Register an effect that is only constructed when it is first accessed.
+        
+        Args:
+            effect_ID: Unique identifier for the effect
+            loader: Function returning the effect dictionary (LightEffect.to_dict format)
+        """
+        self.effects.add_pending(effect_ID, loader)
+        
+        if self.current_effect_ID is None:
+            self.current_effect_ID = effect_ID
+    
+    def _materialize_effect(self, effect_ID: int, data: Dict) -> LightEffect:
+        effect = LightEffect.from_dict(data)
+        effect.current_palette = self.current_palette
+        return effect
+    
     def remove_effect(self, effect_ID: int):
         """
         Remove a LightEffect from the scene.
@@ -63,6 +95,56 @@ class LightScene:
                     self.current_effect_ID = next(iter(self.effects.keys()))
                 else:
                     self.current_effect_ID = None
+            
+            self.layers = [layer for layer in self.layers if layer.effect_ID != effect_ID]
+    
+    def set_layers(self, layers: List):
+        """
+        Replace the layer stack. An empty stack renders only the current effect.
+        
+        Args:
+            layers: EffectLayer instances or layer dictionaries, bottom layer first
+        """
+        self.layers = [layer if isinstance(layer, EffectLayer) else EffectLayer.from_dict(layer) for layer in layers]
+    
+    def add_layer(self, effect_ID: int, opacity: float = 1.0, blend_mode: str = "normal", index: int = None):
+        """
+        Add an effect to the layer stack.
+        
+        Args:
+            effect_ID: ID of the effect to render in the layer
+            opacity: Layer opacity (0.0-1.0)
+            blend_mode: One of normal/over, add, multiply, max, screen
+            index: Position in the stack (default: on top)
+        """
+        layer = EffectLayer(effect_ID, opacity, blend_mode)
+        if index is None or index >= len(self.layers):
+            self.layers.append(layer)
+        else:
+            self.layers.insert(max(0, index), layer)
+    
+    def update_layer(self, index: int, param_name: str, value: Any):
+        """
+        Update a parameter of a layer.
+        
+        Args:
+            index: Position of the layer in the stack
+            param_name: effect_ID, opacity or blend_mode
+            value: New value for the parameter
+        """
+        data = self.layers[index].to_dict()
+        data[param_name] = value
+        self.layers[index] = EffectLayer.from_dict(data)
+    
+    def remove_layer(self, index: int):
+        """
+        Remove a layer from the stack.
+        
+        Args:
+            index: Position of the layer in the stack
+        """
+        if 0 <= index < len(self.layers):
+            del self.layers[index]
     
     def set_palette(self, palette_id: str):
         """
@@ -74,7 +156,7 @@ class LightScene:
         if palette_id in self.palettes:
             self.current_palette = palette_id
 
-            for effect in self.effects.values():
+            for effect_id, effect in self.effects.materialized_items():
                 effect.set_palette(palette_id)
     
     def update_palette(self, palette_id: str, colors: List[List[int]]):
@@ -86,7 +168,7 @@ class LightScene:
             colors: New color values
         """
         if palette_id in self.palettes:
-            self.palettes[palette_id] = colors
+            self.palettes[palette_id] = intern_palette(colors)
 
             if palette_id == self.current_palette:
                 self.set_palette(palette_id)
@@ -98,7 +180,7 @@ class LightScene:
         Args:
             new_palettes: Dictionary of palette_id -> color list
         """
-        self.palettes = new_palettes.copy()
+        self.palettes = intern_palettes(new_palettes)
         
         if self.current_palette in self.palettes:
             self.set_palette(self.current_palette)
@@ -117,14 +199,20 @@ class LightScene:
         if effect_ID in self.effects:
             self.current_effect_ID = effect_ID
     
-    def update(self):
+    def update(self, dt: Optional[float] = None):
         """
         Update the current LightEffect.
         Delegates to the active effect's update_all method.
+        A suspended scene is resumed first.
+        
+        Args:
+            dt: Elapsed time in seconds (default: one frame at the current effect's frame rate)
         """
+        if self.suspended_at is not None:
+            self.resume()
 
         if hasattr(self, 'effect_transition_active') and self.effect_transition_active:
-            self.transition_start_time += 1.0 / self.effects[self.current_effect_ID].fps
+            self.transition_start_time += dt if dt is not None else 1.0 / self.effects[self.current_effect_ID].fps
             
             if self.transition_start_time >= self.fade_out_time + self.fade_in_time:
                 if self.next_effect_idx is not None and self.next_effect_idx in self.effects:
@@ -135,7 +223,7 @@ class LightScene:
                 self.transition_start_time = 0.0
         
         if hasattr(self, 'palette_transition_active') and self.palette_transition_active:
-            self.transition_start_time += 1.0 / self.effects[self.current_effect_ID].fps
+            self.transition_start_time += dt if dt is not None else 1.0 / self.effects[self.current_effect_ID].fps
             
             if self.transition_start_time >= self.fade_out_time + self.fade_in_time:
                 if self.next_palette_idx is not None:
@@ -148,8 +236,45 @@ class LightScene:
                 if hasattr(self, '_notify_palette_change'):
                     self._notify_palette_change()
         
+        for effect in self._active_effects():
+            effect.update_all(dt)
+    
+    def _active_effects(self) -> List[LightEffect]:
+        if self.layers:
+            return [self.effects[effect_ID] for effect_ID in dict.fromkeys(layer.effect_ID for layer in self.layers)
+                    if effect_ID in self.effects]
         if self.current_effect_ID is not None and self.current_effect_ID in self.effects:
-            self.effects[self.current_effect_ID].update_all()
+            return [self.effects[self.current_effect_ID]]
+        return []
+    
+    def suspend(self):
+        """
+        Stop updating the scene while it is not shown.
+        The scene's clock keeps running: resume() moves it to where it would be by then.
+        """
+        if self.suspended_at is None:
+            self.suspended_at = time.monotonic()
+    
+    def resume(self):
+        """
+        Continue a suspended scene, fast-forwarding its shown effects over the time it was suspended.
+        """
+        if self.suspended_at is None:
+            return
+        
+        elapsed = time.monotonic() - self.suspended_at
+        self.suspended_at = None
+        self.fast_forward(elapsed)
+    
+    def fast_forward(self, elapsed: float):
+        """
+        Advance the shown effects by a time span without stepping through the frames in between.
+        
+        Args:
+            elapsed: Time span in seconds
+        """
+        for effect in self._active_effects():
+            effect.fast_forward(elapsed)
     
     def get_led_output(self) -> List[List[int]]:
         """
@@ -158,9 +283,43 @@ class LightScene:
         Returns:
             List of RGB color values for each LED
         """
+        if self.layers:
+            return self._composite_layers().tolist()
         if self.current_effect_ID is not None and self.current_effect_ID in self.effects:
             return self.effects[self.current_effect_ID].get_led_output()
         return []
+    
+    def get_led_array(self) -> np.ndarray:
+        """
+        Get the LED output from the current effect, or the composited layer stack, as an array.
+        
+        Returns:
+            (led_count, 3) uint8 array of RGB values
+        """
+        if self.layers:
+            return self._composite_layers()
+        if self.current_effect_ID is not None and self.current_effect_ID in self.effects:
+            return self.effects[self.current_effect_ID].get_led_array()
+        return np.zeros((0, 3), dtype=np.uint8)
+
+    def _composite_layers(self) -> np.ndarray:
+        rendered = {}
+        frames = []
+        
+        for layer in self.layers:
+            if layer.effect_ID not in self.effects:
+                continue
+            if layer.effect_ID not in rendered:
+                rendered[layer.effect_ID] = self.effects[layer.effect_ID].get_led_layer()
+            frames.append((layer, rendered[layer.effect_ID]))
+        
+        size = max((len(colors) for _, (colors, _) in frames), default=0)
+        output = np.zeros((size, 3), dtype=np.float32)
+        
+        for layer, (colors, alpha) in frames:
+            blend_frames(output[:len(colors)], colors, alpha, layer.blend_mode, layer.opacity)
+        
+        return np.clip(output + 0.5, 0, 255).astype(np.uint8)
 
     def set_transition_params(self, next_effect_idx=None, next_palette_idx=None, fade_in_time=0.0, fade_out_time=0.0):
         self.next_effect_idx = next_effect_idx
@@ -172,74 +331,224 @@ class LightScene:
         self.effect_transition_active = next_effect_idx is not None
         self.palette_transition_active = next_palette_idx is not None
     
-    def save_to_json(self, file_path: str):
+    def to_dict(self) -> Dict:
         """
-        Save the complete scene configuration to a JSON file.
+        Convert the scene to a dictionary representation for serialization.
+        Effects that have not been materialized are written from their raw data.
         
-        Args:
-            file_path: Path to save the JSON file
+        Returns:
+            Dictionary containing scene properties
         """
         data = {
             "scene_ID": self.scene_ID,
             "current_effect_ID": self.current_effect_ID,
             "current_palette": self.current_palette,
             "palettes": self.palettes,
+            "layers": [layer.to_dict() for layer in self.layers],
             "effects": {}
         }
         
-        for effect_id, effect in self.effects.items():
-            effect_data = effect.to_dict()
+        for effect_id in self.effects:
+            if self.effects.is_materialized(effect_id):
+                effect_data = self.effects[effect_id].to_dict()
+            else:
+                effect_data = self.effects.raw(effect_id)
             data["effects"][str(effect_id)] = effect_data
-        
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+            
+        return data
     
     @classmethod
-    def load_from_json(cls, file_path: str):
+    def from_dict(cls, data: Dict, effect_loaders: Dict = None):
         """
-        Load a scene configuration from a JSON file.
+        Create a scene from a dictionary representation (deserialization).
+        Effects are registered as pending and constructed on first access.
         
         Args:
-            file_path: Path to the JSON file
+            data: Dictionary containing scene properties
+            effect_loaders: Optional effect_id -> loader mapping used instead of data["effects"]
             
         Returns:
-            A new LightScene instance with the loaded configuration
+            A new LightScene instance
         """
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        
         scene = cls(scene_ID=data["scene_ID"])
         
         if "palettes" in data:
-            scene.palettes = data["palettes"]
+            scene.palettes = intern_palettes(data["palettes"])
         
         if "current_palette" in data:
             scene.current_palette = data["current_palette"]
 
-        for effect_id_str, effect_data in data["effects"].items():
-            effect_id = int(effect_id_str)
-            effect = LightEffect.from_dict(effect_data)
-            scene.add_effect(effect_id, effect)
+        if effect_loaders is None:
+            effect_loaders = {
+                int(effect_id_str): (lambda effect_data=effect_data: effect_data)
+                for effect_id_str, effect_data in data.get("effects", {}).items()
+            }
+            
+        for effect_id, loader in effect_loaders.items():
+            scene.add_pending_effect(effect_id, loader)
         
         if "current_effect_ID" in data and data["current_effect_ID"] is not None:
             scene.current_effect_ID = data["current_effect_ID"]
+        
+        if data.get("layers"):
+            scene.set_layers(data["layers"])
             
         return scene
     
-    def save_palettes_to_json(self, file_path: str):
+    def snapshot(self) -> Dict:
         """
-        Save only color palettes to a JSON file.
+        Take a detached copy of the scene state for saving on another thread.
+        The running animation is not modified; effect time is written as 0.0 by LightEffect.to_dict.
+        Effects that have not been materialized are captured as a RawEntry without decoding them;
+        write_snapshot or resolve_snapshot resolves them on the thread that writes the copy.
         
-        Args:
-            file_path: Path to save the JSON file
+        Returns:
+            Dictionary in to_dict format that shares no mutable state with the scene
         """
         data = {
-            "palettes": self.palettes,
+            "scene_ID": self.scene_ID,
+            "current_effect_ID": self.current_effect_ID,
+            "current_palette": self.current_palette,
+            "palettes": palettes_to_lists(self.palettes),
+            "layers": [layer.to_dict() for layer in self.layers],
+            "effects": {}
+        }
+        
+        for effect_id in self.effects:
+            effect_data = self.effects.raw_entry(effect_id)
+            if effect_data is None:
+                effect_data = self.effects[effect_id].to_dict()
+            data["effects"][str(effect_id)] = effect_data
+            
+        return data
+    
+    @staticmethod
+    def resolve_snapshot(data: Dict) -> Dict:
+        """
+        Replace the raw entries of a snapshot with plain effect dictionaries.
+        
+        Args:
+            data: Scene dictionary from snapshot
+            
+        Returns:
+            The same dictionary, in to_dict format
+        """
+        effects = data.get("effects", {})
+        for effect_id, effect_data in effects.items():
+            if isinstance(effect_data, RawEntry):
+                effects[effect_id] = effect_data.resolve()
+        return data
+    
+    def palettes_snapshot(self) -> Dict:
+        """
+        Take a detached copy of the palettes for saving on another thread.
+        
+        Returns:
+            Dictionary in save_palettes_to_json format
+        """
+        return {
+            "palettes": palettes_to_lists(self.palettes),
             "current_palette": self.current_palette
         }
+    
+    @staticmethod
+    def write_snapshot(data: Dict, file_path: str):
+        """
+        Atomically write a scene dictionary, choosing the format from the file extension.
+        
+        Args:
+            data: Scene dictionary in to_dict or snapshot format
+            file_path: Path to save the file
+        """
+        if file_path.lower().endswith(SCENE_FORMAT_EXTENSION):
+            write_compact_scene(file_path, data)
+        else:
+            write_json_atomic(file_path, LightScene.resolve_snapshot(data))
+    
+    def save_to_json(self, file_path: str):
+        """
+        Save the complete scene configuration to a JSON file.
+        
+        Args:
+            file_path: Path to save the JSON file
+        """
+        write_json_atomic(file_path, self.to_dict())
+    
+    @classmethod
+    def load_from_json(cls, file_path: str):
+        """
+        Load a scene configuration from a JSON file.
         
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        Args:
+            file_path: Path to the JSON file
+            
+        Returns:
+            A new LightScene instance with the loaded configuration
+        """
+        data = file_cache.get(file_path, "scene_json", read_json, validate_scene_data)
+        return cls.from_dict(data)
+    
+    def save_to_compact(self, file_path: str, compress: bool = True):
+        """
+        Save the complete scene configuration to a compact binary scene file.
+        
+        Args:
+            file_path: Path to save the file
+            compress: Whether to compress effect data
+        """
+        write_compact_scene(file_path, self.to_dict(), compress)
+    
+    @classmethod
+    def load_from_compact(cls, file_path: str):
+        """
+        Load a scene from a compact binary scene file.
+        Effects stay encoded until they are first accessed.
+        
+        Args:
+            file_path: Path to the scene file
+            
+        Returns:
+            A new LightScene instance with the loaded configuration
+        """
+        header, effect_loaders = file_cache.get(
+            file_path, "scene_compact", read_compact_scene,
+            lambda parsed: validate_scene_data(parsed[0])
+        )
+        return cls.from_dict(header, effect_loaders)
+    
+    def save_to_file(self, file_path: str):
+        """
+        Save the scene, choosing the compact binary format for files ending in .tlscene
+        and JSON otherwise.
+        
+        Args:
+            file_path: Path to save the file
+        """
+        self.write_snapshot(self.to_dict(), file_path)
+    
+    @classmethod
+    def load_from_file(cls, file_path: str):
+        """
+        Load a scene from either a JSON file or a compact binary scene file.
+        
+        Args:
+            file_path: Path to the scene file
+            
+        Returns:
+            A new LightScene instance with the loaded configuration
+        """
+        if is_compact_scene_file(file_path):
+            return cls.load_from_compact(file_path)
+        return cls.load_from_json(file_path)
+    
+    def save_palettes_to_json(self, file_path: str):
+        """
+        Save only color palettes to a JSON file.
+        
+        Args:
+            file_path: Path to save the JSON file
+        """
+        write_json_atomic(file_path, self.palettes_snapshot())
     
     def load_palettes_from_json(self, file_path: str):
         """
@@ -248,11 +557,10 @@ class LightScene:
         Args:
             file_path: Path to the JSON file
         """
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        data = file_cache.get(file_path, "palettes", read_json, validate_palette_data)
         
         if "palettes" in data:
-            self.palettes = data["palettes"]
+            self.palettes = intern_palettes(data["palettes"])
         
         if "current_palette" in data:
             self.set_palette(data["current_palette"])
\ No newline at end of file
@@ -4,13 +4,39 @@ import sys
 sys.path.append('..')
 from config import DEFAULT_COLOR_PALETTES
 from utils.color_utils import interpolate_colors, apply_brightness
+from models.segment_store import SegmentStore
+from models.segment_template import SegmentTemplate, intern_palette, intern_values
+from models.envelope import envelope_to_list
+
+def _template_field(name: str):
+    def get(self):
+        return getattr(self.template, name)
+
+    def set(self, value):
+        self.template = self.template.replace(**{name: value})
+
+    return property(get, set)
+
 
 class LightSegment:
     """
     LightSegment represents a segment of light with specific properties like color, position, and movement.
     This class follows the specification from the LED tape light signal processing system.
+    Appearance parameters live in a shared SegmentTemplate and are exposed as tuples; assigning
+    a parameter replaces the template instead of modifying it.
     """
 
+    __slots__ = ('segment_ID', 'template', 'initial_position', 'rgb_color', '_store', '_row', '_move_range')
+
+    color = _template_field('color')
+    transparency = _template_field('transparency')
+    dimmer_time = _template_field('dimmer_time')
+    dimmer_time_ratio = _template_field('dimmer_time_ratio')
+    gradient = _template_field('gradient')
+    fade = _template_field('fade')
+    gradient_colors = _template_field('gradient_colors')
+    envelope = _template_field('envelope')
+
     def __init__(self, segment_ID: int, color: List[int], transparency: List[float], 
                 length: List[int], move_speed: float, move_range: List[int], 
                 initial_position: int, is_edge_reflect: bool, dimmer_time: List[int], 
@@ -31,10 +57,11 @@ class LightSegment:
             dimmer_time_ratio: Ratio to stretch or shrink dimmer_time (default: 1.0)
         """
         self.segment_ID = segment_ID
-        self.color = color
-        self.transparency = transparency
-        self.length = length
-        self.move_speed = move_speed
+        self.template = SegmentTemplate.get(color, transparency, length, dimmer_time, dimmer_time_ratio)
+        
+        self._store = SegmentStore(1)
+        self._row = self._store.add(self, float(initial_position), move_speed, 0, 0, 0, is_edge_reflect)
+        self._store.total_length[self._row] = self.template.total_length
         
         if move_range and len(move_range) >= 2:
             self.move_range = [min(move_range[0], move_range[1]), max(move_range[0], move_range[1])]
@@ -42,20 +69,100 @@ class LightSegment:
             self.move_range = move_range
             
         self.initial_position = initial_position
-        self.current_position = float(initial_position)
-        self.is_edge_reflect = is_edge_reflect
-        self.dimmer_time = dimmer_time
-        self.dimmer_time_ratio = dimmer_time_ratio
-        self.time = 0.0
+
+        self.rgb_color = self.calculate_rgb()
+
+    @property
+    def current_position(self) -> float:
+        return float(self._store.position[self._row])
+
+    @current_position.setter
+    def current_position(self, value: float):
+        self._store.position[self._row] = value
+
+    @property
+    def move_speed(self) -> float:
+        return float(self._store.speed[self._row])
+
+    @move_speed.setter
+    def move_speed(self, value: float):
+        self._store.speed[self._row] = value
+
+    @property
+    def direction(self) -> int:
+        return 1 if self._store.speed[self._row] >= 0 else -1
+
+    @direction.setter
+    def direction(self, value: int):
+        speed = abs(self._store.speed[self._row])
+        self._store.speed[self._row] = speed if value >= 0 else -speed
+
+    @property
+    def is_edge_reflect(self) -> bool:
+        return bool(self._store.reflect[self._row])
+
+    @is_edge_reflect.setter
+    def is_edge_reflect(self, value: bool):
+        self._store.reflect[self._row] = bool(value)
+
+    @property
+    def time(self) -> float:
+        return float(self._store.time[self._row])
+
+    @time.setter
+    def time(self, value: float):
+        self._store.time[self._row] = value
+
+    @property
+    def move_range(self) -> tuple:
+        return self._move_range
+
+    @move_range.setter
+    def move_range(self, value: List[int]):
+        self._move_range = intern_values(value)
+        if value and len(value) >= 2:
+            self._store.range_min[self._row] = min(value[0], value[1])
+            self._store.range_max[self._row] = max(value[0], value[1])
+        else:
+            self._store.range_min[self._row] = -math.inf
+            self._store.range_max[self._row] = math.inf
+
+    @property
+    def length(self) -> tuple:
+        return self.template.length
+
+    @length.setter
+    def length(self, value: List[int]):
+        self.template = self.template.replace(length=value)
+        self._store.total_length[self._row] = self.template.total_length
+
+    @property
+    def total_length(self):
+        return self.template.total_length
+
+    def _attach(self, store: SegmentStore):
+        """
+        Move the segment's motion state into another store, e.g. the store of the effect it is added to.
         
-        self.direction = 1 if move_speed >= 0 else -1
+        Args:
+            store: Target SegmentStore
+        """
+        if store is self._store:
+            return
         
-        self.gradient = False
-        self.fade = False
-        self.gradient_colors = [0, -1, -1]
+        old_store, old_row = self._store, self._row
+        self._row = store.add(self, old_store.position[old_row], old_store.speed[old_row],
+                              old_store.range_min[old_row], old_store.range_max[old_row],
+                              old_store.total_length[old_row], old_store.reflect[old_row],
+                              old_store.time[old_row])
+        self._store = store
+        old_store.remove(old_row)
 
-        self.rgb_color = self.calculate_rgb()
-        self.total_length = sum(self.length)
+    def _detach(self):
+        """
+        Move the segment's motion state into a private store, e.g. when it is removed from an effect.
+        """
+        self._attach(SegmentStore(1))
 
     def update_param(self, param_name: str, value: Any):
         """
@@ -75,7 +182,7 @@ class LightSegment:
         elif param_name == 'gradient':
             self.gradient = value
             if self.gradient and self.gradient_colors[0] == 0:
-                self.gradient_colors[0] = 1
+                self.gradient_colors = (1,) + self.gradient_colors[1:]
         elif param_name == 'move_range':
             if value and len(value) >= 2:
                 self.move_range = [min(value[0], value[1]), max(value[0], value[1])]
@@ -96,51 +203,26 @@ class LightSegment:
                 logger = logging.getLogger("color_signal_system")
                 logger.info(f"Segment {self.segment_ID} direction changed: {old_direction} → {self.direction}")
         else:
-            setattr(self, param_name, value)
+            try:
+                setattr(self, param_name, value)
+            except AttributeError:
+                import logging
+                logger = logging.getLogger("color_signal_system")
+                logger.warning(f"Segment {self.segment_ID} has no parameter {param_name}")
     
-    def update_position(self, fps: int):
+    def update_position(self, fps: int, dt: Optional[float] = None):
         """
         Update the position of the segment based on move_speed and fps.
         Based on the move_speed, only specified LED particles are moved in 1 second.
+        Effects advance all of their segments at once with SegmentStore.step instead.
         
         Args:
             fps: Frames per second
+            dt: Elapsed time in seconds (default: 1 / fps)
         """
-        dt = 1.0 / fps
-        self.time += dt
-        
-        delta = self.move_speed * dt
-        new_position = self.current_position + delta
-        
-        total_length = sum(self.length)
-        
-        if self.is_edge_reflect:
-            if new_position < self.move_range[0]:
-                new_position = self.move_range[0]
-                self.direction = 1 
-                self.move_speed = abs(self.move_speed)  
-                
-            elif new_position + total_length - 1 > self.move_range[1]:
-                new_position = self.move_range[1] - total_length + 1
-                self.direction = -1
-                self.move_speed = -abs(self.move_speed)
-        else:
-            range_width = self.move_range[1] - self.move_range[0] + 1
-            if new_position < self.move_range[0]:
-                overshoot = self.move_range[0] - new_position
-                new_position = self.move_range[1] - overshoot + 1
-            elif new_position + total_length - 1 > self.move_range[1]:
-                overshoot = new_position + total_length - 1 - self.move_range[1]
-                new_position = self.move_range[0] + overshoot - 1
-                
-            if new_position < self.move_range[0]:
-                new_position = self.move_range[0]
-            elif new_position + total_length - 1 > self.move_range[1]:
-                new_position = self.move_range[1] - total_length + 1
-                
-        self.current_position = new_position
+        self._store.step(1.0 / fps if dt is None else dt, self._row, self._row + 1)
 
-    def calculate_rgb(self, palette_name: str = "A") -> List[List[int]]:
+    def calculate_rgb(self, palette_name: str = "A") -> tuple:
         """
         Calculate RGB color values from color palette indices.
         
@@ -148,7 +230,7 @@ class LightSegment:
             palette_name: Name of the palette to use
             
         Returns:
-            List of RGB values corresponding to each color index in format [[r0, g0, b0], ..., [r3, g3, b3]]
+            Shared tuple of RGB values corresponding to each color index in format ((r0, g0, b0), ..., (r3, g3, b3))
         """
         palette = DEFAULT_COLOR_PALETTES.get(palette_name, DEFAULT_COLOR_PALETTES["A"])
         
@@ -171,45 +253,19 @@ class LightSegment:
             else:
                 rgb_values.append([255, 0, 0])
         
-        return rgb_values
+        return intern_palette(rgb_values)
 
     def apply_dimming(self) -> float:
         """
-        Apply fade effect based on dimmer_time parameters.
-        Implements the fade in/out functionality as specified in the requirements.
-        Uses dimmer_time_ratio to scale the timing values.
+        Apply fade effect based on the segment's brightness envelope.
+        Without envelope points the dimmer_time trapezoid is used, scaled by dimmer_time_ratio.
+        The envelope is compiled into a lookup table when the parameters change; effects
+        evaluate all of their segments at once with models.envelope.envelope_levels instead.
         
         Returns:
             Brightness level from 0.0 to 1.0
         """
-        if not self.fade or not self.dimmer_time or len(self.dimmer_time) < 5 or self.dimmer_time[4] <= 0:
-            return 1.0 
-        
-        ratio = getattr(self, 'dimmer_time_ratio', 1.0)
-        cycle_time = int(self.dimmer_time[4] * ratio)
-        
-        if cycle_time <= 0:
-            return 1.0
-            
-        current_time = int((self.time * 1000) % cycle_time)
-        
-        fade_in_start = int(self.dimmer_time[0] * ratio)
-        fade_in_end = int(self.dimmer_time[1] * ratio)
-        fade_out_start = int(self.dimmer_time[2] * ratio)
-        fade_out_end = int(self.dimmer_time[3] * ratio)
-
-        if current_time < fade_in_start:
-            return 0.0
-        elif current_time < fade_in_end:
-            progress = (current_time - fade_in_start) / max(1, fade_in_end - fade_in_start)
-            return progress
-        elif current_time < fade_out_start:
-            return 1.0 
-        elif current_time < fade_out_end:
-            progress = (current_time - fade_out_start) / max(1, fade_out_end - fade_out_start)
-            return 1.0 - progress 
-        else:
-            return 0.0
+        return self.template.compiled_envelope.level(self.time)
 
     def get_light_data(self, palette: List[List[int]]) -> Dict[int, tuple[List[int], float]]:
         """
@@ -224,17 +280,9 @@ class LightSegment:
         light_data = {}
         brightness = self.apply_dimming()
 
-        segment_colors = self.color[:4]
-        while len(segment_colors) < 4:
-            segment_colors.append(segment_colors[-1] if segment_colors else 0)
-            
-        segment_transparencies = self.transparency[:4]
-        while len(segment_transparencies) < 4:
-            segment_transparencies.append(segment_transparencies[-1] if segment_transparencies else 1.0)
-
-        segment_lengths = self.length[:3]
-        while len(segment_lengths) < 3:
-            segment_lengths.append(segment_lengths[-1] if segment_lengths else 0)
+        segment_colors = self.template.padded_color
+        segment_transparencies = self.template.padded_transparency
+        segment_lengths = self.template.padded_length
         
         total_segment_length = sum(segment_lengths)
         if total_segment_length <= 0:
@@ -283,22 +331,25 @@ class LightSegment:
         return light_data
 
     def to_dict(self):
-        return {
+        data = {
             "segment_ID": self.segment_ID,
-            "color": self.color,
-            "transparency": self.transparency,
-            "length": self.length,
+            "color": list(self.color),
+            "transparency": list(self.transparency),
+            "length": list(self.length),
             "move_speed": self.move_speed,
-            "move_range": self.move_range,
+            "move_range": list(self.move_range) if self.move_range is not None else None,
             "initial_position": self.initial_position,
             "current_position": self.current_position,
             "is_edge_reflect": self.is_edge_reflect,
-            "dimmer_time": self.dimmer_time,
-            "dimmer_time_ratio": getattr(self, 'dimmer_time_ratio', 1.0),
-            "gradient": getattr(self, 'gradient', False),
-            "fade": getattr(self, 'fade', False),
-            "gradient_colors": getattr(self, 'gradient_colors', [0, -1, -1])
+            "dimmer_time": list(self.dimmer_time),
+            "dimmer_time_ratio": self.dimmer_time_ratio,
+            "gradient": self.gradient,
+            "fade": self.fade,
+            "gradient_colors": list(self.gradient_colors)
         }
+        if self.envelope is not None:
+            data["envelope"] = envelope_to_list(self.envelope)
+        return data
 
     @classmethod
     def from_dict(cls, data):
@@ -318,13 +369,11 @@ class LightSegment:
         if "current_position" in data:
             segment.current_position = data["current_position"]
         
-        if "gradient" in data:
-            segment.gradient = data["gradient"]
-        
-        if "fade" in data:
-            segment.fade = data["fade"]
-        
-        if "gradient_colors" in data:
-            segment.gradient_colors = data["gradient_colors"]
+        segment.template = segment.template.replace(
+            gradient=data.get("gradient", False),
+            fade=data.get("fade", False),
+            gradient_colors=data.get("gradient_colors", (0, -1, -1)),
+            envelope=data.get("envelope")
+        )
         
         return segment
\ No newline at end of file
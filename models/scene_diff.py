@@ -0,0 +1,203 @@
+"""
+Field-level diff between a live LightScene and scene data loaded from a file.
+
+diff_scene() only reads the live objects and returns a list of changes; apply_scene_changes()
+applies them, normally at a frame boundary. Runtime state (segment position, time and the
+direction a reflecting segment is currently moving in) is never part of the diff, so segments
+whose configuration did not change keep moving undisturbed.
+"""
+
+from typing import Any, Dict, List, Tuple
+import sys
+sys.path.append('..')
+from models.light_effect import LightEffect
+from models.light_scene import LightScene
+from models.light_segment import LightSegment
+from models.segment_template import intern_palettes
+from models.envelope import envelope_to_list, normalize_envelope
+
+SEGMENT_FIELDS = [
+    "color", "transparency", "length", "move_speed", "move_range", "initial_position",
+    "is_edge_reflect", "dimmer_time", "dimmer_time_ratio", "gradient", "fade", "gradient_colors", "envelope"
+]
+
+SEGMENT_DEFAULTS = {
+    "dimmer_time_ratio": 1.0,
+    "gradient": False,
+    "fade": False,
+    "gradient_colors": [0, -1, -1],
+    "envelope": None
+}
+
+Change = Tuple
+
+
+def _segment_value(segment: LightSegment, name: str) -> Any:
+    value = getattr(segment, name, SEGMENT_DEFAULTS.get(name))
+    if name == "envelope":
+        return envelope_to_list(value)
+    return list(value) if isinstance(value, (list, tuple)) else value
+
+
+def diff_segment(effect_id: int, segment_id: int, segment: LightSegment, data: Dict) -> List[Change]:
+    """
+    Compute the changes needed to bring a live segment in line with segment data.
+
+    Args:
+        effect_id: ID of the effect containing the segment
+        segment_id: Segment ID
+        segment: Live segment
+        data: Segment dictionary in LightSegment.to_dict format
+
+    Returns:
+        List of change tuples for apply_scene_changes
+    """
+    changes = []
+
+    for name in SEGMENT_FIELDS:
+        if name not in data and name not in SEGMENT_DEFAULTS:
+            continue
+
+        new_value = data.get(name, SEGMENT_DEFAULTS.get(name))
+        old_value = _segment_value(segment, name)
+
+        if name == "move_speed" and segment.is_edge_reflect and data.get("is_edge_reflect", True):
+            if abs(old_value) == abs(new_value):
+                continue
+            new_value = abs(new_value) * (1 if old_value >= 0 else -1)
+
+        if name == "move_range" and isinstance(new_value, list) and len(new_value) >= 2:
+            new_value = [min(new_value[0], new_value[1]), max(new_value[0], new_value[1])]
+
+        if name == "envelope":
+            try:
+                new_value = envelope_to_list(normalize_envelope(new_value))
+            except (TypeError, ValueError):
+                pass
+
+        if old_value != new_value:
+            changes.append(("segment_param", effect_id, segment_id, name, new_value))
+
+    return changes
+
+
+def diff_effect(effect_id: int, effect: LightEffect, data: Dict) -> List[Change]:
+    """
+    Compute the changes needed to bring a live effect in line with effect data.
+
+    Args:
+        effect_id: Effect ID
+        effect: Live effect
+        data: Effect dictionary in LightEffect.to_dict format
+
+    Returns:
+        List of change tuples for apply_scene_changes
+    """
+    changes = []
+
+    for name in ("led_count", "fps"):
+        if name in data and getattr(effect, name) != data[name]:
+            changes.append(("effect_param", effect_id, name, data[name]))
+
+    new_segments = {int(segment_id): segment_data for segment_id, segment_data in data.get("segments", {}).items()}
+
+    for segment_id in list(effect.segments.keys()):
+        if segment_id not in new_segments:
+            changes.append(("remove_segment", effect_id, segment_id))
+
+    for segment_id, segment_data in new_segments.items():
+        segment = effect.segments.get(segment_id)
+        if segment is None:
+            changes.append(("add_segment", effect_id, segment_id, segment_data))
+        else:
+            changes.extend(diff_segment(effect_id, segment_id, segment, segment_data))
+
+    return changes
+
+
+def diff_scene(scene: LightScene, data: Dict) -> List[Change]:
+    """
+    Compute the changes needed to bring a live scene in line with scene data.
+    Effects that have not been materialized are compared and replaced as raw data.
+
+    Args:
+        scene: Live scene
+        data: Scene dictionary in LightScene.to_dict format
+
+    Returns:
+        List of change tuples for apply_scene_changes
+    """
+    changes = []
+
+    if "palettes" in data and intern_palettes(data["palettes"]) != scene.palettes:
+        changes.append(("palettes", data["palettes"]))
+
+    if "current_palette" in data and data["current_palette"] != scene.current_palette:
+        changes.append(("palette", data["current_palette"]))
+
+    new_effects = {int(effect_id): effect_data for effect_id, effect_data in data.get("effects", {}).items()}
+
+    for effect_id in list(scene.effects.keys()):
+        if effect_id not in new_effects:
+            changes.append(("remove_effect", effect_id))
+
+    for effect_id, effect_data in new_effects.items():
+        if effect_id not in scene.effects:
+            changes.append(("effect_data", effect_id, effect_data))
+        elif not scene.effects.is_materialized(effect_id):
+            if scene.effects.raw(effect_id) != effect_data:
+                changes.append(("effect_data", effect_id, effect_data))
+        else:
+            changes.extend(diff_effect(effect_id, scene.effects[effect_id], effect_data))
+
+    if data.get("current_effect_ID") is not None and data["current_effect_ID"] != scene.current_effect_ID:
+        changes.append(("current_effect", data["current_effect_ID"]))
+
+    if data.get("layers", []) != [layer.to_dict() for layer in scene.layers]:
+        changes.append(("layers", data.get("layers", [])))
+
+    return changes
+
+
+def apply_scene_changes(scene: LightScene, changes: List[Change], glide: float = 0.0):
+    """
+    Apply changes computed by diff_scene to a live scene.
+
+    Args:
+        scene: Live scene
+        changes: List of change tuples
+        glide: Glide time in seconds for segment parameters that support gliding
+    """
+    for change in changes:
+        kind = change[0]
+
+        if kind == "palettes":
+            scene.update_all_palettes(change[1])
+        elif kind == "palette":
+            scene.set_palette(change[1])
+        elif kind == "remove_effect":
+            scene.remove_effect(change[1])
+        elif kind == "effect_data":
+            scene.add_pending_effect(change[1], lambda effect_data=change[2]: effect_data)
+        elif kind == "current_effect":
+            scene.switch_effect(change[1])
+        elif kind == "layers":
+            scene.set_layers(change[1])
+        elif kind == "effect_param":
+            effect = scene.effects.get(change[1])
+            if effect is not None:
+                setattr(effect, change[2], change[3])
+                if change[2] == "fps":
+                    effect.time_step = 1.0 / change[3]
+        elif kind == "remove_segment":
+            effect = scene.effects.get(change[1])
+            if effect is not None:
+                effect.remove_segment(change[2])
+        elif kind == "add_segment":
+            effect = scene.effects.get(change[1])
+            if effect is not None:
+                effect.add_segment(change[2], LightSegment.from_dict(change[3]))
+        elif kind == "segment_param":
+            effect = scene.effects.get(change[1])
+            if effect is not None and change[2] in effect.segments:
+                effect.update_segment_param(change[2], change[3], change[4], glide)
@@ -0,0 +1,247 @@
+"""
+Compact binary scene file format.
+
+Layout (all integers little-endian):
+    magic           8 bytes   b"TLSCENE\\0"
+    version         uint16
+    flags           uint16    bit 0: effect blobs are zlib-compressed
+    header_length   uint32
+    header          compact JSON: scene fields, palettes and the effect index
+    effect blobs    one compact JSON document per effect, located by the index
+
+The header is small and parsed eagerly. Effect blobs are only decoded when an
+effect is first accessed, so a scene with hundreds of effects opens quickly.
+"""
+
+from typing import Dict, List, Any, Callable, Tuple
+import json
+import struct
+import zlib
+
+from models.lazy_map import RawEntry
+from utils.file_utils import write_file_atomic
+
+SCENE_FORMAT_MAGIC = b"TLSCENE\0"
+SCENE_FORMAT_EXTENSION = ".tlscene"
+SCENE_FORMAT_VERSION = 1
+FLAG_COMPRESSED = 0x1
+
+_PREAMBLE = struct.Struct("<8sHHI")
+
+
+def _dumps(data: Any) -> bytes:
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def is_compact_scene_file(file_path: str) -> bool:
+    """
+    Check whether a file starts with the compact scene magic.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        True if the file is in compact scene format
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(SCENE_FORMAT_MAGIC)) == SCENE_FORMAT_MAGIC
+    except OSError:
+        return False
+
+
+def encode_scene(scene_data: Dict[str, Any], compress: bool = True) -> bytes:
+    """
+    Encode a scene dictionary (as produced by LightScene.to_dict) into compact format.
+
+    Effects given as a RawEntry are resolved here; those still backed by a blob of a compact
+    file with the same compression are copied as they are, without being decoded.
+
+    Args:
+        scene_data: Scene dictionary with an "effects" mapping
+        compress: Whether to zlib-compress effect blobs
+
+    Returns:
+        Encoded file contents
+    """
+    header = {key: value for key, value in scene_data.items() if key != "effects"}
+    index = []
+    blobs = []
+    offset = 0
+
+    for effect_id, effect_data in scene_data.get("effects", {}).items():
+        if isinstance(effect_data, RawEntry):
+            loader = effect_data.loader
+            if isinstance(loader, EffectBlob) and loader.compressed == compress:
+                blob = bytes(loader.blob)
+            else:
+                blob = _dumps(effect_data.resolve())
+                if compress:
+                    blob = zlib.compress(blob)
+        else:
+            blob = _dumps(effect_data)
+            if compress:
+                blob = zlib.compress(blob)
+        index.append([int(effect_id), offset, len(blob)])
+        blobs.append(blob)
+        offset += len(blob)
+
+    header["effects"] = index
+    header_bytes = _dumps(header)
+    flags = FLAG_COMPRESSED if compress else 0
+
+    preamble = _PREAMBLE.pack(SCENE_FORMAT_MAGIC, SCENE_FORMAT_VERSION, flags, len(header_bytes))
+    return b"".join([preamble, header_bytes] + blobs)
+
+
+def decode_scene(contents: bytes) -> Tuple[Dict[str, Any], Dict[int, Callable[[], Dict]]]:
+    """
+    Decode the header of a compact scene file.
+
+    Args:
+        contents: Complete file contents
+
+    Returns:
+        Tuple of (scene header dictionary, effect_id -> loader returning the effect dictionary)
+    """
+    if len(contents) < _PREAMBLE.size:
+        raise ValueError("Truncated scene file")
+
+    magic, version, flags, header_length = _PREAMBLE.unpack_from(contents, 0)
+    if magic != SCENE_FORMAT_MAGIC:
+        raise ValueError("Not a compact scene file")
+    if version > SCENE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported scene format version: {version}")
+
+    header_start = _PREAMBLE.size
+    body_start = header_start + header_length
+    header = json.loads(contents[header_start:body_start].decode('utf-8'))
+
+    view = memoryview(contents)
+    compressed = bool(flags & FLAG_COMPRESSED)
+    loaders = {}
+
+    for effect_id, offset, length in header.pop("effects", []):
+        start = body_start + offset
+        if start + length > len(contents):
+            raise ValueError(f"Effect {effect_id} extends past end of file")
+        loaders[int(effect_id)] = EffectBlob(view[start:start + length], compressed)
+
+    return header, loaders
+
+
+class EffectBlob:
+    """
+    Loader for one encoded effect of a compact scene file; calling it decodes the effect.
+    """
+
+    __slots__ = ('blob', 'compressed')
+
+    def __init__(self, blob: memoryview, compressed: bool):
+        self.blob = blob
+        self.compressed = compressed
+
+    def __call__(self) -> Dict:
+        data = zlib.decompress(self.blob) if self.compressed else bytes(self.blob)
+        return json.loads(data.decode('utf-8'))
+
+
+def validate_scene_data(data: Dict[str, Any]):
+    """
+    Check the structure of a scene dictionary.
+
+    Args:
+        data: Scene dictionary (or compact header)
+
+    Raises:
+        ValueError: If required fields are missing or malformed
+    """
+    if not isinstance(data, dict) or "scene_ID" not in data:
+        raise ValueError("Scene data must be an object with a scene_ID")
+    if "effects" in data and not isinstance(data["effects"], dict):
+        raise ValueError("Scene effects must be an object")
+    if "layers" in data and not isinstance(data["layers"], list):
+        raise ValueError("Scene layers must be a list")
+    if "palettes" in data:
+        validate_palette_data(data)
+
+
+def validate_palette_data(data: Dict[str, Any]):
+    """
+    Check the structure of palette data.
+
+    Args:
+        data: Dictionary with a "palettes" mapping of palette_id -> list of [r, g, b]
+
+    Raises:
+        ValueError: If the palettes are malformed
+    """
+    palettes = data.get("palettes") if isinstance(data, dict) else None
+    if palettes is None:
+        return
+    if not isinstance(palettes, dict):
+        raise ValueError("Palettes must be an object")
+
+    for palette_id, colors in palettes.items():
+        if not isinstance(colors, list):
+            raise ValueError(f"Palette {palette_id} must be a list of colors")
+        for color in colors:
+            if not isinstance(color, list) or len(color) < 3:
+                raise ValueError(f"Palette {palette_id} contains an invalid color: {color}")
+
+
+def validate_scene_manager_data(data: Dict[str, Any]):
+    """
+    Check the structure of a scene manager file.
+
+    Args:
+        data: Dictionary with a "scenes" list
+
+    Raises:
+        ValueError: If the scenes are malformed
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("scenes", []), list):
+        raise ValueError("Scene manager data must contain a list of scenes")
+    for scene_data in data.get("scenes", []):
+        validate_scene_data(scene_data)
+
+
+def write_compact_scene(file_path: str, scene_data: Dict[str, Any], compress: bool = True):
+    """
+    Atomically write a scene dictionary to a compact scene file.
+
+    Args:
+        file_path: Path to save the file
+        scene_data: Scene dictionary with an "effects" mapping
+        compress: Whether to zlib-compress effect blobs
+    """
+    write_file_atomic(file_path, encode_scene(scene_data, compress))
+
+
+def read_json(file_path: str) -> Any:
+    """
+    Read and parse a JSON file.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Parsed data
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_compact_scene(file_path: str) -> Tuple[Dict[str, Any], Dict[int, Callable[[], Dict]]]:
+    """
+    Read a compact scene file. Effect blobs stay encoded until their loader is called.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Tuple of (scene header dictionary, effect_id -> loader returning the effect dictionary)
+    """
+    with open(file_path, 'rb') as f:
+        contents = f.read()
+    return decode_scene(contents)
@@ -1,10 +1,16 @@
 import json
 import copy
+import threading
+import numpy as np
 from typing import Dict, List, Any, Optional
 
+from models.lazy_map import LazyMap
 from models.light_scene import LightScene
 from models.light_effect import LightEffect
 from models.light_segment import LightSegment
+from models.scene_format import read_json, validate_scene_manager_data
+from utils.file_cache import file_cache
+from utils.file_utils import write_json_atomic
 
 
 import logging
@@ -24,7 +30,7 @@ class SceneManager:
     
     def __init__(self):
         """Khởi tạo SceneManager."""
-        self.scenes = {}
+        self.scenes = LazyMap(self._materialize_scene)
         self.current_scene = None
         self.next_scene_idx = None
         self.next_effect_idx = None
@@ -35,12 +41,92 @@ class SceneManager:
         self.is_transitioning = False
         self.transition_opacity = 1.0
         self.osc_handler = None
+        self.frame_hooks = []
+        self.active_scene = None
+        
+    def add_frame_hook(self, hook):
+        """
+        Register a function to run at every frame boundary, before the scene is updated.
+        
+        Args:
+            hook: Function without arguments, e.g. ConfigReloader.apply_pending
+        """
+        self.frame_hooks.append(hook)
+    
+    def run_frame_hooks(self):
+        """
+        Run the registered frame hooks. Called by the render loop between frames,
+        also while playback is paused.
+        """
+        for hook in self.frame_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Error in frame hook: {e}")
         
     def add_scene(self, scene_ID: int, scene: LightScene):
         self.scenes[scene_ID] = scene
         
         if self.current_scene is None:
             self.current_scene = scene_ID
+        elif scene_ID != self.current_scene:
+            scene.suspend()
+    
+    def _activate_current_scene(self):
+        """
+        Suspend the previously shown scene and resume the current one when the current scene changed,
+        so only the shown scene is updated and the resumed one continues where it would be by now.
+        """
+        if self.active_scene == self.current_scene:
+            return
+        
+        if self.active_scene in self.scenes and self.scenes.is_materialized(self.active_scene):
+            self.scenes[self.active_scene].suspend()
+        
+        if self.current_scene in self.scenes:
+            self.scenes[self.current_scene].resume()
+        
+        self.active_scene = self.current_scene
+    
+    def _materialize_scene(self, scene_ID: int, scene_data: Dict) -> LightScene:
+        scene = LightScene.from_dict(scene_data)
+        
+        if scene_data.get("current_effect_ID") is None and scene.effects:
+            scene.current_effect_ID = min(scene.effects.keys())
+        
+        if scene.current_effect_ID in scene.effects:
+            scene.effects.materialize(scene.current_effect_ID)
+            
+        return scene
+    
+    def prefetch_scene(self, scene_ID: int, effect_ID: int = None):
+        """
+        Build a pending scene (and the effect it will show) on a background thread,
+        so that switching to it later does not construct anything on the render path.
+        
+        Args:
+            scene_ID: ID of the scene to build
+            effect_ID: Optional effect to build as well (defaults to the scene's current effect)
+        """
+        if scene_ID not in self.scenes:
+            return
+        
+        if self.scenes.is_materialized(scene_ID):
+            scene = self.scenes[scene_ID]
+            if effect_ID is None or effect_ID not in scene.effects or scene.effects.is_materialized(effect_ID):
+                return
+        
+        def build():
+            try:
+                scene = self.scenes[scene_ID]
+                if effect_ID is not None and effect_ID in scene.effects:
+                    scene.effects.materialize(effect_ID)
+            except Exception as e:
+                logger.error(f"Error prefetching scene {scene_ID}: {e}")
+        
+        thread = threading.Thread(target=build, name=f"prefetch-scene-{scene_ID}")
+        thread.daemon = True
+        thread.start()
     
     def remove_scene(self, scene_ID: int):
 
@@ -53,6 +139,9 @@ class SceneManager:
                     self.current_scene = None
             
             del self.scenes[scene_ID]
+            
+            if self.active_scene == scene_ID:
+                self.active_scene = None
     
     def switch_scene(self, scene_ID: int):
         if scene_ID in self.scenes:
@@ -61,7 +150,9 @@ class SceneManager:
                 self.is_transitioning = True
                 self.transition_start_time = 0.0
                 self.transition_opacity = 0.0
+                self.prefetch_scene(scene_ID)
             else:
+                self.scenes.materialize(scene_ID)
                 self.current_scene = scene_ID
                 self.next_scene_idx = None
     
@@ -72,19 +163,33 @@ class SceneManager:
         self.fade_in_time = max(0, fade_in_time)
         self.fade_out_time = max(0, fade_out_time)
         
+        if next_scene_idx is not None:
+            self.prefetch_scene(next_scene_idx, next_effect_idx)
+        elif next_effect_idx is not None and self.current_scene is not None:
+            self.prefetch_scene(self.current_scene, next_effect_idx)
+        
         if next_scene_idx is not None or next_effect_idx is not None or next_palette_idx is not None:
             self.is_transitioning = True
             self.transition_start_time = 0.0
             self.transition_opacity = 0.0
     
-    def update(self):
+    def update(self, dt: Optional[float] = None):
+        """
+        Advance the transition and the current scene.
+        
+        Args:
+            dt: Elapsed time in seconds (default: one frame at the current effect's frame rate)
+        """
         if self.current_scene is None or self.current_scene not in self.scenes:
             return
         
         current_scene = self.scenes[self.current_scene]
         
         if self.is_transitioning:
-            self.transition_start_time += 1.0 / current_scene.effects[current_scene.current_effect_ID].fps if current_scene.current_effect_ID in current_scene.effects else 0.03
+            if dt is not None:
+                self.transition_start_time += dt
+            else:
+                self.transition_start_time += 1.0 / current_scene.effects[current_scene.current_effect_ID].fps if current_scene.current_effect_ID in current_scene.effects else 0.03
             
             if self.transition_start_time <= self.fade_out_time:
                 self.transition_opacity = 1.0 - (self.transition_start_time / self.fade_out_time)
@@ -119,11 +224,26 @@ class SceneManager:
                 self.next_effect_idx = None
                 self.next_palette_idx = None
 
-        current_scene.update()
+        self._activate_current_scene()
+        current_scene.update(dt)
 
         if hasattr(self, 'osc_handler') and self.osc_handler is not None:
             self.osc_handler.send_led_binary_data()
     
+    def fast_forward(self, elapsed: float):
+        """
+        Advance the current scene by a time span without rendering the frames in between,
+        e.g. to catch up after frames were missed or the show clock was stepped.
+        
+        Args:
+            elapsed: Time span in seconds
+        """
+        if self.current_scene is None or self.current_scene not in self.scenes:
+            return
+        
+        self._activate_current_scene()
+        self.scenes[self.current_scene].fast_forward(elapsed)
+    
     def set_scene_manager_osc_handler(self):
         if self.simulator and hasattr(self.simulator, 'scene_manager'):
             self.simulator.scene_manager.osc_handler = self
@@ -143,6 +263,23 @@ class SceneManager:
         
         return led_colors
     
+    def get_led_array(self) -> np.ndarray:
+        """
+        Get the LED output of the current scene as an array, with the transition fade applied.
+        
+        Returns:
+            (led_count, 3) uint8 array of RGB values
+        """
+        if self.current_scene is None or self.current_scene not in self.scenes:
+            return np.zeros((0, 3), dtype=np.uint8)
+        
+        led_array = self.scenes[self.current_scene].get_led_array()
+        
+        if self.is_transitioning and self.transition_opacity < 1.0:
+            led_array = (led_array * max(0.0, self.transition_opacity)).astype(np.uint8)
+        
+        return led_array
+    
     def save_scenes_to_json(self, file_path: str):
         data = {
             "scenes": [],
@@ -154,74 +291,31 @@ class SceneManager:
         }
         
         for scene_id, scene in self.scenes.items():
-            scene_data = {
-                "scene_ID": scene.scene_ID,
-                "current_effect_ID": scene.current_effect_ID,
-                "current_palette": scene.current_palette,
-                "palettes": scene.palettes,
-                "effects": {}
-            }
-            
-            for effect_id, effect in scene.effects.items():
-                effect_data = {
-                    "effect_ID": effect.effect_ID,
-                    "led_count": effect.led_count,
-                    "fps": effect.fps,
-                    "segments": {}
-                }
-                
-                for segment_id, segment in effect.segments.items():
-                    segment_data = segment.to_dict()
-                    effect_data["segments"][str(segment_id)] = segment_data
-                
-                scene_data["effects"][str(effect_id)] = effect_data
-            
-            data["scenes"].append(scene_data)
+            data["scenes"].append(scene.to_dict())
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        write_json_atomic(file_path, data)
     
     def load_scenes_from_json(self, file_path: str):
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            self.scenes = {}
+            data = file_cache.get(file_path, "scene_manager", read_json, validate_scene_manager_data)
+            self.scenes = LazyMap(self._materialize_scene)
+            self.current_scene = None
+            self.active_scene = None
         
             for scene_data in data.get("scenes", []):
-                scene = LightScene(scene_ID=scene_data["scene_ID"])
-        
-                if "palettes" in scene_data:
-                    scene.palettes = scene_data["palettes"]
-                if "current_palette" in scene_data:
-                    scene.current_palette = scene_data["current_palette"]
+                self.scenes.add_pending(scene_data["scene_ID"], lambda scene_data=scene_data: scene_data)
                 
-                for effect_id_str, effect_data in scene_data.get("effects", {}).items():
-                    effect_id = int(effect_id_str)
-                    effect = LightEffect(
-                        effect_ID=effect_id,
-                        led_count=effect_data["led_count"],
-                        fps=effect_data["fps"]
-                    )
-                    
-                    for segment_id_str, segment_data in effect_data.get("segments", {}).items():
-                        segment_id = int(segment_id_str)
-                        segment = LightSegment.from_dict(segment_data)
-                        effect.add_segment(segment_id, segment)
-                    
-                    scene.add_effect(effect_id, effect)
-                
-                if "current_effect_ID" in scene_data and scene_data["current_effect_ID"] is not None:
-                    scene.current_effect_ID = scene_data["current_effect_ID"]
-                elif scene.effects:
-                    scene.current_effect_ID = min(scene.effects.keys())
-                
-                self.add_scene(scene.scene_ID, scene)
+                if self.current_scene is None:
+                    self.current_scene = scene_data["scene_ID"]
             
             if "current_scene" in data and data["current_scene"] is not None and data["current_scene"] in self.scenes:
                 self.current_scene = data["current_scene"]
             elif self.scenes:
                 self.current_scene = min(self.scenes.keys())
             
+            if self.current_scene is not None:
+                self.scenes.materialize(self.current_scene)
+            
             if "transition_params" in data:
                 self.fade_in_time = data["transition_params"].get("fade_in_time", 0.0)
                 self.fade_out_time = data["transition_params"].get("fade_out_time", 0.0)
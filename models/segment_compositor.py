@@ -0,0 +1,204 @@
+"""
+Vectorized compositing of light segments into an LED frame.
+
+All segments are rendered at once into flat per-LED arrays. A SegmentIntervalIndex over the
+segment extents finds the LED spans covered by more than one segment: LEDs outside those spans
+are written directly, and only the overlapped LEDs go through the alpha blending steps,
+one overlap depth at a time.
+"""
+
+from typing import List, Tuple
+import sys
+import numpy as np
+
+sys.path.append('..')
+from models.envelope import envelope_levels
+
+_FALLBACK_RGB = np.array([255, 0, 0], dtype=np.float64)
+
+
+class SegmentIntervalIndex:
+    """
+    SegmentIntervalIndex keeps segment extents sorted by start LED.
+    The sort order is reused between frames, so updating it after segments moved is close to linear.
+    """
+
+    def __init__(self):
+        self.order = np.zeros(0, dtype=np.int64)
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.ends = np.zeros(0, dtype=np.int64)
+
+    def update(self, starts: np.ndarray, ends: np.ndarray):
+        """
+        Update the extents.
+
+        Args:
+            starts: First LED of each segment
+            ends: Last LED of each segment (inclusive)
+        """
+        if len(starts) != len(self.order):
+            self.order = np.argsort(starts, kind='stable')
+        else:
+            self.order = self.order[np.argsort(starts[self.order], kind='stable')]
+        self.starts = starts
+        self.ends = ends
+
+    def overlap_spans(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the LED spans covered by more than one segment.
+
+        Returns:
+            Tuple of span starts and span ends (inclusive); spans may touch or overlap each other
+        """
+        if len(self.order) < 2:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        starts = self.starts[self.order]
+        ends = self.ends[self.order]
+        reach = np.maximum.accumulate(ends)[:-1]
+        overlapping = starts[1:] <= reach
+        return starts[1:][overlapping], np.minimum(ends[1:], reach)[overlapping]
+
+    def overlap_mask(self, led_count: int) -> np.ndarray:
+        """
+        Mark the LEDs covered by more than one segment.
+
+        Args:
+            led_count: Number of LEDs in the frame
+
+        Returns:
+            Boolean array of length led_count
+        """
+        span_starts, span_ends = self.overlap_spans()
+        span_starts = np.clip(span_starts, 0, led_count)
+        span_ends = np.clip(span_ends + 1, 0, led_count)
+
+        edges = np.zeros(led_count + 1, dtype=np.int64)
+        np.add.at(edges, span_starts, 1)
+        np.add.at(edges, span_ends, -1)
+        return np.cumsum(edges[:-1]) > 0
+
+
+def render_segments(segments: List, palette: List[List[int]]):
+    """
+    Compute the color and transparency of every LED covered by each segment.
+    Produces the same values as LightSegment.get_light_data for all segments at once.
+
+    Args:
+        segments: Segments in compositing order
+        palette: Palette used to resolve color indices
+
+    Returns:
+        Tuple of (led index, segment number, RGB float array, transparency, segment starts, segment ends)
+    """
+    count = len(segments)
+    templates = [segment.template for segment in segments]
+    lengths = np.array([template.padded_length for template in templates], dtype=np.float64).reshape(count, 3)
+    color_ids = np.array([template.padded_color for template in templates], dtype=np.int64).reshape(count, 4)
+    transparency = np.array([template.padded_transparency for template in templates],
+                            dtype=np.float64).reshape(count, 4)
+    position = np.array([segment.current_position for segment in segments], dtype=np.float64)
+    brightness = envelope_levels([template.compiled_envelope for template in templates],
+                                 [segment.time for segment in segments])
+
+    palette_rgb = np.asarray(palette, dtype=np.float64).reshape(-1, 3)
+    valid_color = (color_ids >= 0) & (color_ids < len(palette_rgb))
+    rgb = np.where(valid_color[..., None], palette_rgb[np.clip(color_ids, 0, max(0, len(palette_rgb) - 1))],
+                   _FALLBACK_RGB) if len(palette_rgb) else np.broadcast_to(_FALLBACK_RGB, (count, 4, 3))
+
+    total = lengths[:, 0] + lengths[:, 1] + lengths[:, 2]
+    starts = np.floor(position).astype(np.int64)
+    ends = np.floor(position + total - 1e-9).astype(np.int64)
+    led_counts = np.where(total > 0, ends - starts + 1, 0)
+
+    owner = np.repeat(np.arange(count), led_counts)
+    first = np.concatenate(([0], np.cumsum(led_counts)[:-1]))
+    led = starts[owner] + np.arange(len(owner)) - np.repeat(first, led_counts)
+
+    seg_total = total[owner]
+    rel = np.clip(led - position[owner], 0, seg_total - 1e-9)
+    seg_lengths = lengths[owner]
+    split_1 = seg_lengths[:, 0]
+    split_2 = split_1 + seg_lengths[:, 1]
+
+    part = np.where(rel < split_1, 0, np.where(rel < split_2, 1, 2))
+    # Subtract the part lengths one at a time, as LightSegment.get_light_data does, so t rounds the same way
+    part_offset = np.choose(part, [rel, rel - split_1, rel - split_1 - seg_lengths[:, 1]])
+    part_length = np.take_along_axis(seg_lengths, part[:, None], axis=1)[:, 0]
+    t = np.divide(part_offset, part_length, out=np.zeros_like(rel), where=part_length > 0)
+    t = np.clip(t, 0.0, 1.0)
+
+    c1 = rgb[owner, part]
+    c2 = rgb[owner, part + 1]
+    colors = np.clip(np.trunc(c1 + (c2 - c1) * t[:, None]), 0, 255)
+    colors = np.clip(np.trunc(colors * brightness[owner][:, None]), 0, 255)
+
+    tr1 = transparency[owner, part]
+    tr2 = transparency[owner, part + 1]
+    alpha = tr1 + (tr2 - tr1) * t
+
+    return led, owner, colors, alpha, np.where(total > 0, starts, 0), np.where(total > 0, ends, -1)
+
+
+def composite_segments(segments: List, palette: List[List[int]], led_count: int,
+                       index: SegmentIntervalIndex = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Composite segments into an LED frame, later segments on top.
+
+    Args:
+        segments: Segments in compositing order
+        palette: Palette used to resolve color indices
+        led_count: Number of LEDs in the frame
+        index: Interval index reused between frames (a temporary one is used if None)
+
+    Returns:
+        Tuple of a (led_count, 3) uint8 RGB array and a (led_count,) float transparency array
+    """
+    out_colors = np.zeros((max(0, led_count), 3), dtype=np.float64)
+    out_alpha = np.zeros(max(0, led_count), dtype=np.float64)
+
+    if not segments or led_count <= 0:
+        return out_colors.astype(np.uint8), out_alpha
+
+    led, owner, colors, alpha, starts, ends = render_segments(segments, palette)
+
+    index = index or SegmentIntervalIndex()
+    index.update(starts, ends)
+
+    visible = (led >= 0) & (led < led_count)
+    led, owner, colors, alpha = led[visible], owner[visible], colors[visible], alpha[visible]
+
+    overlapped = index.overlap_mask(led_count)[led]
+
+    direct = ~overlapped
+    _blend_step(out_colors, out_alpha, led[direct], colors[direct], alpha[direct])
+
+    if overlapped.any():
+        led, owner, colors, alpha = led[overlapped], owner[overlapped], colors[overlapped], alpha[overlapped]
+        order = np.lexsort((owner, led))
+        led, colors, alpha = led[order], colors[order], alpha[order]
+
+        group_start = np.flatnonzero(np.concatenate(([True], led[1:] != led[:-1])))
+        depth = np.arange(len(led)) - np.repeat(group_start, np.diff(np.append(group_start, len(led))))
+
+        for level in range(int(depth.max()) + 1):
+            step = depth == level
+            _blend_step(out_colors, out_alpha, led[step], colors[step], alpha[step])
+
+    return out_colors.astype(np.uint8), out_alpha
+
+
+def _blend_step(out_colors: np.ndarray, out_alpha: np.ndarray, led: np.ndarray,
+                colors: np.ndarray, alpha: np.ndarray):
+    current_colors = out_colors[led]
+    current_alpha = out_alpha[led]
+
+    final_alpha = np.clip(alpha + current_alpha * (1.0 - alpha), 0.0, 1.0)
+    mixed = (colors * alpha[:, None] + current_colors * current_alpha[:, None] * (1.0 - alpha)[:, None])
+    visible = final_alpha > 1e-6
+    final_colors = np.divide(mixed, final_alpha[:, None], out=np.zeros_like(mixed), where=visible[:, None])
+    final_colors = np.clip(np.trunc(final_colors), 0, 255)
+
+    out_colors[led] = final_colors
+    out_alpha[led] = final_alpha
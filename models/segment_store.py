@@ -0,0 +1,194 @@
+from typing import List
+import numpy as np
+
+
+class SegmentStore:
+    """
+    SegmentStore keeps the motion state of many segments in contiguous arrays (one row per segment),
+    so all segments of an effect are advanced with a single vectorized step.
+    Rows are kept packed: removing a segment moves the last row into its place.
+    """
+
+    def __init__(self, capacity: int = 8):
+        """
+        Initialize an empty store.
+
+        Args:
+            capacity: Initial number of rows
+        """
+        self.count = 0
+        self.owners: List = []
+        self._allocate_arrays(max(1, capacity))
+
+    def _allocate_arrays(self, capacity: int):
+        old = getattr(self, 'position', None)
+        self.capacity = capacity
+
+        for name, dtype in (('position', np.float64), ('speed', np.float64), ('range_min', np.float64),
+                            ('range_max', np.float64), ('total_length', np.float64), ('time', np.float64),
+                            ('reflect', bool)):
+            array = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+
+    def add(self, owner, position: float, speed: float, range_min: float, range_max: float,
+            total_length: float, reflect: bool, time: float = 0.0) -> int:
+        """
+        Add a row for a segment.
+
+        Args:
+            owner: Segment viewing the row; its _row is updated when rows move
+            position: Current position
+            speed: Signed speed in LEDs per second
+            range_min: Left edge of the move range
+            range_max: Right edge of the move range
+            total_length: Total segment length in LEDs
+            reflect: Whether to reflect (True) or wrap (False) at the edges
+            time: Segment time in seconds
+
+        Returns:
+            Row index
+        """
+        if self.count == self.capacity:
+            self._allocate_arrays(self.capacity * 2)
+
+        row = self.count
+        self.position[row] = position
+        self.speed[row] = speed
+        self.range_min[row] = range_min
+        self.range_max[row] = range_max
+        self.total_length[row] = total_length
+        self.reflect[row] = reflect
+        self.time[row] = time
+        self.owners.append(owner)
+        self.count += 1
+        return row
+
+    def remove(self, row: int):
+        """
+        Remove a row, moving the last row into its place.
+
+        Args:
+            row: Row index
+        """
+        last = self.count - 1
+        if row != last:
+            for array in (self.position, self.speed, self.range_min, self.range_max,
+                          self.total_length, self.time, self.reflect):
+                array[row] = array[last]
+            moved = self.owners[last]
+            self.owners[row] = moved
+            moved._row = row
+        self.owners.pop()
+        self.count = last
+
+    def step(self, dt: float, start: int = 0, stop: int = None):
+        """
+        Advance segment positions by one frame, reflecting or wrapping at the edges of the move range.
+
+        Args:
+            dt: Frame time in seconds
+            start: First row to advance
+            stop: Row after the last row to advance (default: all rows)
+        """
+        rows = slice(start, self.count if stop is None else stop)
+        speed = self.speed[rows]
+        range_min = self.range_min[rows]
+        range_max = self.range_max[rows]
+        last_offset = self.total_length[rows] - 1
+        reflect = self.reflect[rows]
+
+        self.time[rows] += dt
+        position = self.position[rows] + speed * dt
+
+        below = position < range_min
+        above = ~below & (position + last_offset > range_max)
+
+        bounce_low = reflect & below
+        bounce_high = reflect & above
+        position = np.where(bounce_low, range_min, position)
+        position = np.where(bounce_high, range_max - last_offset, position)
+        speed[bounce_low] = np.abs(speed[bounce_low])
+        speed[bounce_high] = -np.abs(speed[bounce_high])
+
+        wrap = ~reflect
+        wrap_low = wrap & below
+        wrap_high = wrap & above
+        position = np.where(wrap_low, range_max - (range_min - position) + 1, position)
+        position = np.where(wrap_high, range_min + (position + last_offset - range_max) - 1, position)
+
+        clamp_low = wrap & (position < range_min)
+        clamp_high = wrap & ~clamp_low & (position + last_offset > range_max)
+        position = np.where(clamp_low, range_min, position)
+        position = np.where(clamp_high, range_max - last_offset, position)
+
+        self.position[rows] = position
+
+    def advance(self, frames: int, dt: float, start: int = 0, stop: int = None):
+        """
+        Advance segment positions by many frames at once, in closed form.
+        Gives the positions that stepping frame by frame would reach, without the cost of the
+        frames in between. Rows must be inside their move range, which holds after any step().
+        Reflecting segments follow the exact bounce pattern of step(), as do wrapping segments
+        that land exactly on the opposite edge when they wrap; faster wrapping segments are
+        approximated by wrapping modulo the range.
+
+        Args:
+            frames: Number of frames to advance
+            dt: Frame time in seconds
+            start: First row to advance
+            stop: Row after the last row to advance (default: all rows)
+        """
+        if frames <= 0:
+            return
+
+        if frames % 2:
+            # Ranges shorter than the segment alternate between two positions every frame
+            self.step(dt, start, stop)
+            frames -= 1
+            if not frames:
+                return
+
+        rows = slice(start, self.count if stop is None else stop)
+        speed = self.speed[rows]
+        last_offset = self.total_length[rows] - 1
+        range_max = self.range_max[rows] - last_offset
+        reflect = self.reflect[rows]
+        position = self.position[rows]
+
+        self.time[rows] += frames * dt
+
+        free = ~(np.isfinite(self.range_min[rows]) & np.isfinite(range_max))
+        moving = ~free & (range_max >= self.range_min[rows]) & (speed != 0)
+
+        lo = np.where(moving, self.range_min[rows], 0.0)
+        hi = np.where(moving, range_max, 0.0)
+        span = hi - lo
+        step = np.where(moving, np.abs(speed) * dt, 1.0)
+        backward = speed < 0
+        # Mirror segments moving left so every segment moves towards hi
+        mirrored = np.where(backward, lo + hi - position, position)
+
+        to_edge = np.floor((hi - mirrored) / step) + 1
+        before_edge = frames < to_edge
+        since_edge = np.maximum(frames - to_edge, 0)
+        half_period = np.floor(span / step) + 1
+
+        phase = np.mod(since_edge, 2 * half_period)
+        returning = phase < half_period
+        reflected = np.where(returning, hi - phase * step, lo + (phase - half_period) * step)
+
+        # Wrapping lands on the opposite edge as long as the overshoot is clamped away
+        wrap_gap = np.where(backward, last_offset + 1, 1.0)
+        lattice = lo + np.mod(since_edge, half_period) * step
+        modulo = lo + np.mod(mirrored - lo + frames * step, span + wrap_gap)
+        wrapped = np.where(step <= wrap_gap, lattice, np.minimum(modulo, hi))
+
+        mirrored = np.where(before_edge, mirrored + frames * step, np.where(reflect, reflected, wrapped))
+        result = np.clip(np.where(backward, lo + hi - mirrored, mirrored), lo, hi)
+
+        result = np.where(moving, result, np.where(free, position + speed * frames * dt, position))
+        bounce = moving & reflect & ~before_edge & returning
+        speed[bounce] = -speed[bounce]
+        self.position[rows] = result
@@ -0,0 +1,240 @@
+"""
+Shared, immutable segment parameters.
+
+Show libraries contain many segments with identical colors, transparencies, lengths and fade
+timing. Parameter values are interned as tuples and bundled into SegmentTemplate flyweights,
+so identical segments share one template instead of each holding its own lists. A segment
+never modifies its template: changing a parameter swaps in another interned template
+(copy on write). Palettes are interned the same way, as tuples of RGB tuples.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import sys
+import weakref
+
+sys.path.append('..')
+from config import TEMPLATE_INTERN_LIMIT
+from models.envelope import get_envelope, normalize_envelope
+
+_values: Dict[tuple, tuple] = {}
+
+# References to an interned tuple while a sweep checks it: the table's value and key, the
+# sweep's local variable and sys.getrefcount's argument. A tuple with no others is unused.
+_UNUSED_REFS = 4
+_sweeps_skipped = 0
+
+
+def _typed_key(values: tuple) -> tuple:
+    return (values, tuple(type(value) for value in values))
+
+
+def _release_unused() -> bool:
+    """
+    Drop the interned tuples that no template, palette or segment uses any more.
+    After a sweep that leaves the table mostly full, the next few calls return without sweeping,
+    so a table full of live values is not scanned on every new value.
+
+    Returns:
+        True if the table has room for a new value
+    """
+    global _sweeps_skipped
+    if _sweeps_skipped > 0:
+        _sweeps_skipped -= 1
+        return False
+
+    for key in list(_values):
+        value = _values.get(key)
+        if value is not None and sys.getrefcount(value) <= _UNUSED_REFS:
+            _values.pop(key, None)
+
+    if len(_values) > TEMPLATE_INTERN_LIMIT * 3 // 4:
+        _sweeps_skipped = TEMPLATE_INTERN_LIMIT // 8
+    return len(_values) < TEMPLATE_INTERN_LIMIT
+
+
+def intern_values(values: Optional[Iterable]) -> Optional[tuple]:
+    """
+    Get the shared tuple holding the given values.
+    Values are matched by type as well, so [1, 0] and [1.0, 0.0] are kept apart.
+    When the intern table is full, values nothing uses any more, such as intermediate tween
+    values, are dropped to make room.
+
+    Args:
+        values: Sequence of numbers (None is returned unchanged)
+
+    Returns:
+        Interned tuple; while the table is full of values in use, new values are returned
+        as an unshared tuple
+    """
+    if values is None:
+        return None
+
+    values = tuple(values)
+    key = _typed_key(values)
+    shared = _values.get(key)
+    if shared is not None:
+        return shared
+
+    if len(_values) < TEMPLATE_INTERN_LIMIT or _release_unused():
+        _values[key] = values
+    return values
+
+
+def intern_palette(colors: Iterable[Iterable[int]]) -> Tuple[tuple, ...]:
+    """
+    Get the shared, immutable form of a palette.
+
+    Args:
+        colors: Sequence of [r, g, b] colors
+
+    Returns:
+        Interned tuple of interned (r, g, b) tuples
+    """
+    return intern_values(intern_values(color) for color in colors)
+
+
+def intern_palettes(palettes: Dict[str, Iterable]) -> Dict[str, tuple]:
+    """
+    Intern every palette of a palette dictionary.
+
+    Args:
+        palettes: Dictionary of palette_id -> color list
+
+    Returns:
+        New dictionary of palette_id -> interned palette
+    """
+    return {palette_id: intern_palette(colors) for palette_id, colors in palettes.items()}
+
+
+def palettes_to_lists(palettes: Dict[str, Iterable]) -> Dict[str, List[List[int]]]:
+    """
+    Convert palettes to plain nested lists, the form they take in JSON files.
+
+    Args:
+        palettes: Dictionary of palette_id -> color sequence
+
+    Returns:
+        Dictionary of palette_id -> list of [r, g, b] lists
+    """
+    return {palette_id: [list(color) for color in colors] for palette_id, colors in palettes.items()}
+
+
+def _padded(values: Optional[tuple], size: int, default) -> tuple:
+    values = list(values[:size]) if values else []
+    while len(values) < size:
+        values.append(values[-1] if values else default)
+    return intern_values(values)
+
+
+class SegmentTemplate:
+    """
+    SegmentTemplate holds the appearance parameters of a segment as immutable, shared values.
+    Templates are interned: get() returns the existing template for equal parameters, and a
+    template is released once no segment references it any more.
+    """
+
+    __slots__ = ('color', 'transparency', 'length', 'dimmer_time', 'dimmer_time_ratio',
+                 'gradient', 'fade', 'gradient_colors', 'envelope', 'total_length',
+                 'padded_color', 'padded_transparency', 'padded_length', 'compiled_envelope', '__weakref__')
+
+    FIELDS = ('color', 'transparency', 'length', 'dimmer_time', 'dimmer_time_ratio',
+              'gradient', 'fade', 'gradient_colors', 'envelope')
+
+    _templates = weakref.WeakValueDictionary()
+
+    def __init__(self, color: tuple, transparency: tuple, length: tuple, dimmer_time: tuple,
+                 dimmer_time_ratio: float, gradient: bool, fade: bool, gradient_colors: tuple,
+                 envelope: Optional[tuple] = None):
+        """
+        Initialize a template. Use SegmentTemplate.get to obtain a shared instance.
+
+        Args:
+            color: Color indices from the palette
+            transparency: Transparency values for each color point
+            length: Lengths of each segment section
+            dimmer_time: Fade timing parameters
+            dimmer_time_ratio: Ratio to stretch or shrink dimmer_time
+            gradient: Whether the gradient is enabled
+            fade: Whether fading is enabled
+            gradient_colors: Gradient settings [enabled, left color, right color]
+            envelope: Normalized brightness envelope points replacing dimmer_time, or None
+        """
+        set_field = object.__setattr__
+        set_field(self, 'color', color)
+        set_field(self, 'transparency', transparency)
+        set_field(self, 'length', length)
+        set_field(self, 'dimmer_time', dimmer_time)
+        set_field(self, 'dimmer_time_ratio', dimmer_time_ratio)
+        set_field(self, 'gradient', gradient)
+        set_field(self, 'fade', fade)
+        set_field(self, 'gradient_colors', gradient_colors)
+        set_field(self, 'envelope', envelope)
+
+        set_field(self, 'total_length', sum(length) if length else 0)
+        set_field(self, 'padded_color', _padded(color, 4, 0))
+        set_field(self, 'padded_transparency', _padded(transparency, 4, 1.0))
+        set_field(self, 'padded_length', _padded(length, 3, 0))
+        set_field(self, 'compiled_envelope', get_envelope(fade, dimmer_time, dimmer_time_ratio, envelope))
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("SegmentTemplate is immutable; use replace() to derive a new template")
+
+    @classmethod
+    def get(cls, color: Iterable[int], transparency: Iterable[float], length: Iterable[int],
+            dimmer_time: Iterable[int], dimmer_time_ratio: float = 1.0, gradient: bool = False,
+            fade: bool = False, gradient_colors: Iterable[int] = (0, -1, -1),
+            envelope: Optional[Iterable] = None) -> 'SegmentTemplate':
+        """
+        Get the shared template for the given parameters, creating it if needed.
+
+        Args:
+            color: Color indices from the palette
+            transparency: Transparency values for each color point
+            length: Lengths of each segment section
+            dimmer_time: Fade timing parameters
+            dimmer_time_ratio: Ratio to stretch or shrink dimmer_time
+            gradient: Whether the gradient is enabled
+            fade: Whether fading is enabled
+            gradient_colors: Gradient settings [enabled, left color, right color]
+            envelope: Brightness envelope points replacing dimmer_time (see models.envelope), or None
+
+        Returns:
+            Interned SegmentTemplate
+
+        Raises:
+            ValueError: If the envelope points are malformed
+        """
+        values = (intern_values(color), intern_values(transparency), intern_values(length),
+                  intern_values(dimmer_time), dimmer_time_ratio, gradient, fade,
+                  intern_values(gradient_colors), intern_values(normalize_envelope(envelope)))
+        key = tuple(_typed_key(value) if isinstance(value, tuple) else (value, type(value)) for value in values)
+
+        template = cls._templates.get(key)
+        if template is None:
+            template = cls(*values)
+            cls._templates[key] = template
+        return template
+
+    def replace(self, **changes) -> 'SegmentTemplate':
+        """
+        Get the shared template with some parameters changed.
+
+        Args:
+            **changes: Parameter name -> new value
+
+        Returns:
+            Interned SegmentTemplate
+        """
+        fields = {name: getattr(self, name) for name in self.FIELDS}
+        fields.update(changes)
+        return SegmentTemplate.get(**fields)
+
+    @classmethod
+    def count(cls) -> int:
+        """
+        Get the number of templates currently in use.
+
+        Returns:
+            Number of live templates
+        """
+        return len(cls._templates)
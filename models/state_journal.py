@@ -0,0 +1,294 @@
+"""
+Journaled persistence of live scene state.
+
+Every mutation applied over OSC is recorded as a small operation. A background flusher
+appends the operations to journal.log and folds them into a dictionary copy of the state,
+which is periodically written to snapshot.json and the journal truncated. After a crash,
+recover() loads the snapshot and replays the journal on top of it.
+"""
+
+from typing import Any, Dict, List, Optional
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append('..')
+from models.light_scene import LightScene
+from utils.file_cache import clone_data
+from utils.file_utils import write_file_atomic
+from config import JOURNAL_FLUSH_INTERVAL, JOURNAL_SNAPSHOT_OPS
+
+import logging
+
+logger = logging.getLogger("color_signal_system")
+
+SNAPSHOT_FILE = "snapshot.json"
+JOURNAL_FILE = "journal.log"
+
+
+def apply_op(state: Dict[str, Any], op: Dict[str, Any]):
+    """
+    Apply a journal operation to a state dictionary.
+
+    Args:
+        state: Dictionary with a "scenes" mapping of str(scene_ID) -> scene dictionary
+        op: Operation dictionary with an "op" name and its fields
+    """
+    scenes = state.setdefault("scenes", {})
+    name = op["op"]
+    scene_key = str(op.get("scene"))
+
+    if name == "scene":
+        scenes[scene_key] = op["data"]
+        return
+    if name == "remove_scene":
+        scenes.pop(scene_key, None)
+        return
+
+    scene = scenes.get(scene_key)
+    if scene is None:
+        return
+    effects = scene.setdefault("effects", {})
+    effect_key = str(op.get("effect"))
+
+    if name == "palettes":
+        scene["palettes"] = op["palettes"]
+        scene["current_palette"] = op["current_palette"]
+    elif name == "current_effect":
+        scene["current_effect_ID"] = op["effect"]
+    elif name == "layers":
+        scene["layers"] = op["layers"]
+    elif name == "effect":
+        effects[effect_key] = op["data"]
+        if scene.get("current_effect_ID") is None:
+            scene["current_effect_ID"] = op["effect"]
+    elif name == "remove_effect":
+        effects.pop(effect_key, None)
+        scene["layers"] = [layer for layer in scene.get("layers", []) if layer["effect_ID"] != op["effect"]]
+        if scene.get("current_effect_ID") == op["effect"]:
+            scene["current_effect_ID"] = int(next(iter(effects))) if effects else None
+    elif name == "effect_palette":
+        if effect_key in effects:
+            effects[effect_key]["current_palette"] = op["palette"]
+    elif name == "segment":
+        if effect_key in effects:
+            effects[effect_key].setdefault("segments", {})[str(op["segment"])] = op["data"]
+    elif name == "remove_segment":
+        if effect_key in effects:
+            effects[effect_key].get("segments", {}).pop(str(op["segment"]), None)
+    else:
+        logger.warning(f"Unknown journal operation: {name}")
+
+
+class StateJournal:
+    """
+    StateJournal records applied mutations without blocking the caller.
+    record() only appends to an in-memory list; a flusher thread batches the disk writes.
+    """
+
+    def __init__(self, journal_dir: str, flush_interval: float = JOURNAL_FLUSH_INTERVAL,
+                 snapshot_ops: int = JOURNAL_SNAPSHOT_OPS):
+        """
+        Initialize the journal.
+
+        Args:
+            journal_dir: Directory holding snapshot.json and journal.log
+            flush_interval: Seconds between journal flushes
+            snapshot_ops: Number of journaled operations after which a new snapshot is written
+        """
+        self.journal_dir = os.path.abspath(journal_dir)
+        self.snapshot_path = os.path.join(self.journal_dir, SNAPSHOT_FILE)
+        self.journal_path = os.path.join(self.journal_dir, JOURNAL_FILE)
+        self.flush_interval = flush_interval
+        self.snapshot_ops = max(1, int(snapshot_ops))
+
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._seq = 0
+        self._state: Optional[Dict[str, Any]] = None
+        self._ops_since_snapshot = 0
+        self._journal_file = None
+        self._thread = None
+        self._running = False
+
+        self.stats = {
+            'recorded': 0,
+            'flushes': 0,
+            'snapshots': 0,
+            'write_errors': 0
+        }
+
+        os.makedirs(self.journal_dir, exist_ok=True)
+
+    def recover(self) -> Optional[Dict[int, LightScene]]:
+        """
+        Rebuild scenes from the last snapshot plus the journaled operations after it.
+        The recovered state becomes the base for further journaling.
+
+        Returns:
+            Dictionary of scene_ID -> LightScene, or None if there is nothing to recover
+        """
+        if not os.path.exists(self.snapshot_path):
+            return None
+
+        with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        logger.warning("Ignoring truncated journal entry")
+                        break
+                    if op["seq"] <= state.get("seq", 0):
+                        continue
+                    apply_op(state, op)
+                    state["seq"] = op["seq"]
+                    replayed += 1
+
+        self._state = state
+        self._seq = state.get("seq", 0)
+        self._ops_since_snapshot = replayed
+
+        logger.info(f"Recovered {len(state.get('scenes', {}))} scenes from journal (replayed {replayed} operations)")
+
+        scenes = {}
+        for scene_data in clone_data(state.get("scenes", {})).values():
+            scene = LightScene.from_dict(scene_data)
+            scenes[scene.scene_ID] = scene
+        return scenes
+
+    def attach(self, light_scenes: Dict[int, LightScene]):
+        """
+        Use the given scenes as the journal base if nothing was recovered, and write an initial snapshot.
+
+        Args:
+            light_scenes: Dictionary of scene_ID -> LightScene
+        """
+        if self._state is None:
+            self._state = {
+                "seq": self._seq,
+                "scenes": {str(scene_id): LightScene.resolve_snapshot(scene.snapshot())
+                           for scene_id, scene in light_scenes.items()}
+            }
+            self._write_snapshot()
+
+    def start(self):
+        """
+        Start the background flusher.
+        """
+        if self._running:
+            return
+        if self._state is None:
+            self._state = {"seq": self._seq, "scenes": {}}
+
+        self._journal_file = open(self.journal_path, 'a', encoding='utf-8')
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="state-journal")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Flush pending operations, write a final snapshot and stop the flusher.
+        """
+        if not self._running:
+            return
+
+        self._running = False
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+        self._flush()
+        if self._ops_since_snapshot:
+            self._compact()
+        self._journal_file.close()
+        self._journal_file = None
+
+    def record(self, op: str, **fields):
+        """
+        Record an applied mutation. Never touches the disk.
+
+        Args:
+            op: Operation name (see apply_op)
+            **fields: Operation fields; values are copied so later changes are not recorded
+        """
+        entry = clone_data(fields)
+        entry["op"] = op
+
+        with self._lock:
+            self._seq += 1
+            entry["seq"] = self._seq
+            self._pending.append(entry)
+            self.stats['recorded'] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get a copy of the journal counters.
+
+        Returns:
+            Dictionary of counter name -> value, including the number of unflushed operations
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending)
+        return stats
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush()
+            if self._ops_since_snapshot >= self.snapshot_ops:
+                self._compact()
+
+    def _flush(self):
+        with self._lock:
+            batch = self._pending
+            self._pending = []
+
+        if not batch:
+            return
+
+        try:
+            self._journal_file.write("".join(json.dumps(op, separators=(',', ':')) + "\n" for op in batch))
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+            self.stats['flushes'] += 1
+        except Exception as e:
+            self.stats['write_errors'] += 1
+            logger.error(f"Error writing state journal: {e}")
+
+        for op in batch:
+            apply_op(self._state, op)
+            self._state["seq"] = op["seq"]
+        self._ops_since_snapshot += len(batch)
+
+    def _compact(self):
+        if not self._write_snapshot():
+            return
+
+        try:
+            self._journal_file.truncate(0)
+            self._journal_file.seek(0)
+            self._ops_since_snapshot = 0
+        except Exception as e:
+            self.stats['write_errors'] += 1
+            logger.error(f"Error truncating state journal: {e}")
+
+    def _write_snapshot(self) -> bool:
+        try:
+            write_file_atomic(self.snapshot_path, json.dumps(self._state, separators=(',', ':')))
+            self.stats['snapshots'] += 1
+            return True
+        except Exception as e:
+            self.stats['write_errors'] += 1
+            logger.error(f"Error writing state snapshot: {e}")
+            return False
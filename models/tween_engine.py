@@ -0,0 +1,268 @@
+"""
+Glides of segment parameters towards target values.
+
+A glide is split into scalar channels (one for move_speed and dimmer_time_ratio, two for
+move_range, one per color point for transparency) kept in flat arrays, so all active glides of
+an effect are evaluated in one vectorized pass per frame. Motion parameters are written straight
+into the effect's SegmentStore; appearance parameters swap in a new segment template. When a
+glide ends, the target is applied with LightSegment.update_param, so the final state is exactly
+the one an immediate update would have produced.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import sys
+import numpy as np
+
+sys.path.append('..')
+
+TWEEN_PARAMS = ("move_speed", "move_range", "transparency", "dimmer_time_ratio")
+
+# Appearance values are stepped while gliding: steps finer than the output can show would only
+# churn through segment templates and fill the intern table
+_QUANTUM = {
+    "transparency": 1.0 / 255.0,
+    "dimmer_time_ratio": 0.01
+}
+
+
+class _Tween:
+    __slots__ = ('segment_ID', 'param_name', 'target', 'first', 'count', 'magnitude')
+
+    def __init__(self, segment_ID: int, param_name: str, target: Any, first: int, count: int, magnitude: bool):
+        self.segment_ID = segment_ID
+        self.param_name = param_name
+        self.target = target
+        self.first = first
+        self.count = count
+        self.magnitude = magnitude
+
+
+class TweenEngine:
+    """
+    TweenEngine interpolates segment parameters of one effect over time.
+    """
+
+    def __init__(self):
+        """
+        Initialize an engine without active glides.
+        """
+        self.start = np.zeros(0, dtype=np.float64)
+        self.target = np.zeros(0, dtype=np.float64)
+        self.begin = np.zeros(0, dtype=np.float64)
+        self.duration = np.ones(0, dtype=np.float64)
+        self.quantum = np.zeros(0, dtype=np.float64)
+        self.written = np.zeros(0, dtype=np.float64)
+
+        self.tweens: Dict[Tuple[int, str], _Tween] = {}
+        self.glide_times: Dict[Tuple[int, str], float] = {}
+        self._layout = None
+
+    def __len__(self) -> int:
+        return len(self.tweens)
+
+    def glide_time(self, segment_ID: int, param_name: str) -> float:
+        """
+        Get the configured glide time of a parameter.
+
+        Args:
+            segment_ID: Segment ID
+            param_name: Parameter name
+
+        Returns:
+            Glide time in seconds (0 if none is configured)
+        """
+        return self.glide_times.get((segment_ID, param_name), 0.0)
+
+    def target_values(self, segment_ID: int) -> Dict[str, Any]:
+        """
+        Get the targets of the active glides of a segment.
+
+        Args:
+            segment_ID: Segment ID
+
+        Returns:
+            Dictionary of parameter name -> target value
+        """
+        return {param_name: tween.target for (tween_segment, param_name), tween in self.tweens.items()
+                if tween_segment == segment_ID}
+
+    def glide(self, segment, segment_ID: int, param_name: str, value: Any, duration: float, time: float) -> bool:
+        """
+        Start gliding a parameter from its current value to a target value.
+        A glide that is already heading for the same target keeps running.
+
+        Args:
+            segment: LightSegment owning the parameter
+            segment_ID: Segment ID
+            param_name: Parameter name
+            value: Target value
+            duration: Glide time in seconds
+            time: Current effect time in seconds
+
+        Returns:
+            True if the parameter is gliding; False if it has to be applied immediately
+        """
+        key = (segment_ID, param_name)
+        active = self.tweens.get(key)
+        if active is not None and active.target == value:
+            return True
+
+        start = self._current_values(segment, param_name)
+        target = self._target_values(param_name, value)
+        self.cancel(segment_ID, param_name)
+
+        if duration <= 0 or param_name not in TWEEN_PARAMS or target is None or len(target) != len(start):
+            return False
+
+        magnitude = False
+        if param_name == "move_speed" and segment.is_edge_reflect:
+            # Reflecting segments flip their speed at the edges; glide the magnitude and keep the live direction
+            start, target, magnitude = [abs(start[0])], [abs(target[0])], True
+
+        first = len(self.start)
+        count = len(target)
+        self.start = np.concatenate((self.start, start))
+        self.target = np.concatenate((self.target, target))
+        self.begin = np.concatenate((self.begin, np.full(count, time)))
+        self.duration = np.concatenate((self.duration, np.full(count, duration)))
+        self.quantum = np.concatenate((self.quantum, np.full(count, _QUANTUM.get(param_name, 0.0))))
+        self.written = np.concatenate((self.written, start))
+        self.tweens[key] = _Tween(segment_ID, param_name, value, first, count, magnitude)
+        self._layout = None
+        return True
+
+    def cancel(self, segment_ID: int, param_name: Optional[str] = None):
+        """
+        Stop gliding, leaving the parameters at their current values.
+
+        Args:
+            segment_ID: Segment ID
+            param_name: Parameter name (default: all parameters of the segment)
+        """
+        keys = [key for key in self.tweens if key[0] == segment_ID and (param_name is None or key[1] == param_name)]
+        if keys:
+            self._remove(keys)
+
+    def update(self, segments: Dict[int, Any], store, time: float):
+        """
+        Evaluate all active glides at a time and write the values into the segments.
+
+        Args:
+            segments: Dictionary of segment_ID -> LightSegment of the effect
+            store: SegmentStore of the effect
+            time: Current effect time in seconds
+        """
+        if not self.tweens:
+            return
+
+        if self._layout is None:
+            self._layout = self._build_layout()
+        layout = self._layout
+
+        progress = np.clip((time - self.begin) / self.duration, 0.0, 1.0)
+        values = self.start + (self.target - self.start) * progress
+
+        speed_ids, speed_channels, speed_magnitude = layout['move_speed']
+        if speed_ids:
+            rows = np.array([segments[segment_ID]._row for segment_ID in speed_ids], dtype=np.int64)
+            speed = values[speed_channels]
+            live_sign = np.where(store.speed[rows] < 0, -1.0, 1.0)
+            store.speed[rows] = np.where(speed_magnitude, speed * live_sign, speed)
+
+        range_ids, range_channels, _ = layout['move_range']
+        if range_ids:
+            rows = np.array([segments[segment_ID]._row for segment_ID in range_ids], dtype=np.int64)
+            store.range_min[rows] = np.minimum(values[range_channels], values[range_channels + 1])
+            store.range_max[rows] = np.maximum(values[range_channels], values[range_channels + 1])
+
+        # Appearance parameters live in shared templates; only swap templates whose value changed
+        quantized = np.where(self.quantum > 0, np.round(values / np.where(self.quantum > 0, self.quantum, 1.0))
+                             * self.quantum, values)
+        changed = quantized != self.written
+        self.written = quantized
+        template_channels, template_starts, template_tweens = layout['templates']
+        if template_tweens:
+            for index in np.flatnonzero(np.logical_or.reduceat(changed[template_channels], template_starts)):
+                tween = template_tweens[index]
+                channels = quantized[tween.first:tween.first + tween.count]
+                segment = segments[tween.segment_ID]
+                if tween.param_name == "transparency":
+                    segment.transparency = channels.tolist()
+                else:
+                    segment.dimmer_time_ratio = float(channels[0])
+
+        all_tweens, all_firsts = layout['all']
+        done = np.flatnonzero(progress[all_firsts] >= 1.0)
+        if len(done):
+            finished = [all_tweens[index] for index in done]
+            self._remove([(tween.segment_ID, tween.param_name) for tween in finished])
+            for tween in finished:
+                segments[tween.segment_ID].update_param(tween.param_name, self._final_value(segments[tween.segment_ID], tween))
+
+    def _build_layout(self) -> Dict[str, tuple]:
+        layout = {}
+        for param_name in ("move_speed", "move_range"):
+            tweens = [tween for tween in self.tweens.values() if tween.param_name == param_name]
+            layout[param_name] = ([tween.segment_ID for tween in tweens],
+                                  np.array([tween.first for tween in tweens], dtype=np.int64),
+                                  np.array([tween.magnitude for tween in tweens], dtype=bool))
+
+        # Channels of all appearance glides back to back, and where each glide starts among them
+        tweens = [tween for tween in self.tweens.values() if tween.param_name in _QUANTUM]
+        channels = [channel for tween in tweens for channel in range(tween.first, tween.first + tween.count)]
+        starts = np.cumsum([0] + [tween.count for tween in tweens[:-1]])
+        layout['templates'] = (np.array(channels, dtype=np.int64), starts.astype(np.int64), tweens)
+
+        tweens = list(self.tweens.values())
+        layout['all'] = (tweens, np.array([tween.first for tween in tweens], dtype=np.int64))
+        return layout
+
+    def _final_value(self, segment, tween: _Tween) -> Any:
+        if tween.magnitude:
+            return abs(tween.target) * segment.direction
+        return tween.target
+
+    def _current_values(self, segment, param_name: str) -> List[float]:
+        if param_name == "move_speed":
+            return [segment.move_speed]
+        if param_name == "move_range":
+            store, row = segment._store, segment._row
+            return [float(store.range_min[row]), float(store.range_max[row])]
+        if param_name == "transparency":
+            return [float(value) for value in segment.transparency]
+        if param_name == "dimmer_time_ratio":
+            return [float(segment.dimmer_time_ratio)]
+        return []
+
+    def _target_values(self, param_name: str, value: Any) -> Optional[List[float]]:
+        try:
+            if param_name in ("move_speed", "dimmer_time_ratio"):
+                return [float(value)]
+            if param_name == "move_range":
+                if len(value) < 2:
+                    return None
+                return [float(min(value[0], value[1])), float(max(value[0], value[1]))]
+            if param_name == "transparency":
+                return [float(item) for item in value]
+        except (TypeError, ValueError):
+            return None
+        return None
+
+    def _remove(self, keys: List[Tuple[int, str]]):
+        keep = np.ones(len(self.start), dtype=bool)
+        for key in keys:
+            tween = self.tweens.pop(key)
+            keep[tween.first:tween.first + tween.count] = False
+
+        offsets = np.cumsum(~keep)
+        for tween in self.tweens.values():
+            tween.first -= int(offsets[tween.first])
+
+        self.start = self.start[keep]
+        self.target = self.target[keep]
+        self.begin = self.begin[keep]
+        self.duration = self.duration[keep]
+        self.quantum = self.quantum[keep]
+        self.written = self.written[keep]
+        self._layout = None
+
@@ -1,3 +1,6 @@
 from .led_simulator import LEDSimulator
+from .frame_scheduler import FrameScheduler
+from .led_renderer import LEDStripRenderer
+from .text_cache import TextCache
 
-__all__ = ['LEDSimulator']
\ No newline at end of file
+__all__ = ['LEDSimulator', 'FrameScheduler', 'LEDStripRenderer', 'TextCache']
\ No newline at end of file
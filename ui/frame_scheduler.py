@@ -0,0 +1,154 @@
+"""
+Per-frame scheduling for the simulator loop.
+
+The hardware frame is produced by the engine update, so it runs first and unconditionally.
+Everything after it (UI rebuilds, control sync, simulator drawing, notifications) is optional
+work that has to fit in what is left of the frame budget. Each optional task keeps a running
+estimate of its cost and is skipped when that no longer fits; tasks marked as throttled run at
+most once per interval while frames are running late. A task skipped too many frames in a row
+is forced to run so the UI never freezes completely. A task that raises is logged and counted;
+the error does not end the loop.
+
+A single slow run (a first draw while fonts warm up, a garbage collection pause) must not starve
+a task: a run counts towards the estimate with at most one frame budget, and the estimate of a
+skipped task decays every frame it is skipped, so the task is tried again after a few frames.
+"""
+
+from typing import Any, Callable, Dict, Optional
+import sys
+import time
+
+sys.path.append('..')
+from config import FRAME_BUDGET_RATIO, FRAME_MAX_SKIPS, FRAME_ESTIMATE_DECAY
+
+import logging
+logger = logging.getLogger("color_signal_system")
+
+
+class FrameScheduler:
+    """
+    FrameScheduler decides which optional tasks of a frame still fit in the frame budget.
+    """
+
+    def __init__(self, fps: float, budget_ratio: float = FRAME_BUDGET_RATIO, max_skips: int = FRAME_MAX_SKIPS,
+                 estimate_decay: float = FRAME_ESTIMATE_DECAY):
+        """
+        Initialize the scheduler.
+
+        Args:
+            fps: Target frame rate
+            budget_ratio: Fraction of the frame time available for work
+            max_skips: Consecutive skips after which an optional task is run anyway
+            estimate_decay: Factor applied to a task's cost estimate every frame it is skipped
+        """
+        self.budget_ratio = budget_ratio
+        self.max_skips = max_skips
+        self.estimate_decay = estimate_decay
+        self.budget = budget_ratio / fps
+
+        self.frame_start = time.perf_counter()
+        self.deadline = self.frame_start + self.budget
+        self.pressure = False
+
+        self._estimates: Dict[str, float] = {}
+        self._skips: Dict[str, int] = {}
+        self._last_run: Dict[str, float] = {}
+
+        self.stats = {
+            'frames': 0,
+            'late_frames': 0,
+            'tasks': {}
+        }
+
+    def begin_frame(self, fps: Optional[float] = None):
+        """
+        Start timing a frame.
+
+        Args:
+            fps: Current target frame rate, if it changed
+        """
+        if fps:
+            self.budget = self.budget_ratio / fps
+        self.frame_start = time.perf_counter()
+        self.deadline = self.frame_start + self.budget
+
+    def end_frame(self):
+        """
+        Finish a frame. A frame that overran its budget puts throttled tasks on hold for the next frame.
+        """
+        self.stats['frames'] += 1
+        self.pressure = time.perf_counter() > self.deadline
+        if self.pressure:
+            self.stats['late_frames'] += 1
+
+    def remaining(self) -> float:
+        """
+        Get the time left in the current frame budget.
+
+        Returns:
+            Seconds until the deadline (negative if the frame is late)
+        """
+        return self.deadline - time.perf_counter()
+
+    def _count(self, name: str, decision: str):
+        counters = self.stats['tasks'].setdefault(name, {'runs': 0, 'skipped': 0, 'throttled': 0, 'forced': 0,
+                                                          'errors': 0})
+        counters[decision] += 1
+
+    def run(self, name: str, task: Callable[[], Any], critical: bool = False, throttle: float = 0.0) -> bool:
+        """
+        Run a task if it fits in the current frame.
+
+        Args:
+            name: Task name used for cost estimates and counters
+            task: Function without arguments
+            critical: Always run the task
+            throttle: While frames are late, run the task at most once per this many seconds
+
+        Returns:
+            True if the task ran without raising
+        """
+        now = time.perf_counter()
+
+        if not critical:
+            if self._skips.get(name, 0) >= self.max_skips:
+                self._count(name, 'forced')
+            elif throttle > 0 and self.pressure and now - self._last_run.get(name, 0.0) < throttle:
+                self._skips[name] = self._skips.get(name, 0) + 1
+                self._count(name, 'throttled')
+                return False
+            elif self._estimates.get(name, 0.0) > self.deadline - now:
+                self._skips[name] = self._skips.get(name, 0) + 1
+                self._estimates[name] = self._estimates.get(name, 0.0) * self.estimate_decay
+                self._count(name, 'skipped')
+                return False
+
+        ok = True
+        try:
+            task()
+        except Exception as e:
+            ok = False
+            self._count(name, 'errors')
+            logger.error(f"Error in frame task {name}: {e}")
+
+        finished = time.perf_counter()
+        cost = min(finished - now, self.budget)
+        estimate = self._estimates.get(name)
+        self._estimates[name] = cost if estimate is None else estimate + (cost - estimate) * 0.2
+        self._skips[name] = 0
+        self._last_run[name] = finished
+        self._count(name, 'runs')
+
+        return ok
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get a copy of the scheduling counters.
+
+        Returns:
+            Dictionary with frame counts and per-task runs, skips, throttles, forced runs and errors
+        """
+        stats = dict(self.stats)
+        stats['tasks'] = {name: dict(counters) for name, counters in self.stats['tasks'].items()}
+        stats['estimates_ms'] = {name: estimate * 1000.0 for name, estimate in self._estimates.items()}
+        return stats
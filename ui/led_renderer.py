@@ -0,0 +1,140 @@
+"""
+Array-based drawing of the LED strip preview.
+
+Instead of drawing every LED as its own rectangle, the strip is rendered at display resolution:
+each pixel column of the preview is mapped to the LED it shows (or to a gap or border) once per
+zoom and pan setting, and each frame gathers the column colors from the LED array with one
+indexed read and writes them into a pixel surface with pygame.surfarray. The cost of a frame
+depends on the width of the preview, not on the number of LEDs. Overlay surfaces, such as the
+segment indicators, are cached by size and color instead of being allocated every frame.
+"""
+
+from typing import Dict, Optional, Tuple
+import sys
+import numpy as np
+import pygame
+
+sys.path.append('..')
+from config import UI_BACKGROUND_COLOR
+
+LED_BORDER_COLOR = (100, 100, 100)
+
+# Narrower LEDs would be nothing but border
+_MIN_BORDERED_WIDTH = 4
+
+_OVERLAY_CACHE_SIZE = 64
+
+
+class LEDStripRenderer:
+    """
+    LEDStripRenderer draws a row of LED colors into a rectangle of a surface.
+    """
+
+    def __init__(self, background: Tuple[int, int, int] = UI_BACKGROUND_COLOR,
+                 border: Tuple[int, int, int] = LED_BORDER_COLOR):
+        """
+        Initialize the renderer.
+
+        Args:
+            background: Color of the gaps between LEDs
+            border: Color of the LED outlines
+        """
+        self.background = background
+        self.border = border
+
+        self._layout_key = None
+        self._layout = None
+        self._overlays: Dict[tuple, pygame.Surface] = {}
+
+    def _build_layout(self, rect: pygame.Rect, led_count: int, led_width: float, led_spacing: float,
+                      pan_offset: float) -> Optional[dict]:
+        led_total_width = led_width + led_spacing
+        height = min(int(led_width), rect.height)
+        if rect.width <= 0 or height <= 0 or led_total_width <= 0:
+            return None
+
+        # Pixel column x shows the last LED whose rectangle starts at or before it (starts are truncated)
+        x = rect.x + np.arange(rect.width, dtype=np.float64)
+        index = np.ceil((x + 1 - rect.x - pan_offset) / led_total_width).astype(np.int64) - 1
+        left = np.floor(rect.x + index * led_total_width + pan_offset)
+        offset = x - left
+        inside = (index >= 0) & (index < led_count) & (offset < int(led_width))
+
+        bordered = int(led_width) >= _MIN_BORDERED_WIDTH
+        edge = inside & bordered & ((offset < 1) | (offset >= int(led_width) - 1))
+
+        # Sources index the frame's color table: LEDs, then background, then border
+        column_source = np.where(inside, index, led_count)
+        column_source = np.where(edge, led_count + 1, column_source)
+        edge_source = np.where(inside, led_count + 1, led_count) if bordered else None
+
+        surface = pygame.Surface((rect.width, height))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+
+        return {
+            'position': (rect.x, rect.y + (rect.height - height) // 2),
+            'column_source': column_source,
+            'edge_source': edge_source,
+            'pixels': np.empty((rect.width, height, 3), dtype=np.uint8),
+            'surface': surface
+        }
+
+    def draw(self, target: pygame.Surface, colors: np.ndarray, rect: pygame.Rect, led_width: float,
+             led_spacing: float, pan_offset: float):
+        """
+        Draw LED colors into a rectangle.
+
+        Args:
+            target: Surface to draw on
+            colors: (led_count, 3) array of RGB values
+            rect: Preview area; LEDs are centered vertically and clipped to it
+            led_width: Width and height of an LED in pixels
+            led_spacing: Gap between LEDs in pixels
+            pan_offset: Horizontal offset of LED 0 from the left edge of the area, in pixels
+        """
+        led_count = len(colors)
+        key = (tuple(rect), led_count, led_width, led_spacing, pan_offset)
+        if key != self._layout_key:
+            self._layout = self._build_layout(rect, led_count, led_width, led_spacing, pan_offset)
+            self._layout_key = key
+        layout = self._layout
+        if layout is None:
+            return
+
+        table = np.empty((led_count + 2, 3), dtype=np.uint8)
+        table[:led_count] = colors
+        table[led_count] = self.background
+        table[led_count + 1] = self.border
+
+        pixels = layout['pixels']
+        pixels[:] = table[layout['column_source']][:, None, :]
+        if layout['edge_source'] is not None:
+            edge = table[layout['edge_source']]
+            pixels[:, 0] = edge
+            pixels[:, -1] = edge
+
+        pygame.surfarray.blit_array(layout['surface'], pixels)
+        target.blit(layout['surface'], layout['position'])
+
+    def overlay(self, width: int, height: int, color: Tuple[int, ...]) -> pygame.Surface:
+        """
+        Get a cached surface filled with a translucent color.
+
+        Args:
+            width: Width in pixels
+            height: Height in pixels
+            color: RGBA color
+
+        Returns:
+            Shared surface; do not draw on it
+        """
+        key = (width, height, tuple(color))
+        surface = self._overlays.get(key)
+        if surface is None:
+            if len(self._overlays) >= _OVERLAY_CACHE_SIZE:
+                self._overlays.clear()
+            surface = pygame.Surface((max(1, width), max(1, height)), pygame.SRCALPHA)
+            surface.fill(color)
+            self._overlays[key] = surface
+        return surface
@@ -16,9 +16,14 @@ from models.light_effect import LightEffect
 from models.light_segment import LightSegment
 from models.light_scene import LightScene
 from models.scene_manager import SceneManager
+from models.animation_clock import AnimationClock
+from ui.frame_scheduler import FrameScheduler
+from ui.led_renderer import LEDStripRenderer
+from ui.text_cache import TextCache
 from config import (
     UI_WIDTH, UI_HEIGHT, UI_BACKGROUND_COLOR, DEFAULT_COLOR_PALETTES,
-    DEFAULT_FPS, DEFAULT_LED_COUNT
+    DEFAULT_FPS, DEFAULT_LED_COUNT, FRAME_THROTTLE_INTERVAL, SIMULATOR_DISPLAY_FPS,
+    STATIC_OVERLAY_CACHE_SIZE
 )
 
 import logging
@@ -36,7 +41,7 @@ logger = logging.getLogger("color_signal_system")
 
 
 class LEDSimulator:    
-    def __init__(self, scene_manager: SceneManager = None, scene: LightScene = None):
+    def __init__(self, scene_manager: SceneManager = None, scene: LightScene = None, engine=None):
         pygame.init()
         pygame.font.init()
 
@@ -64,12 +69,20 @@ class LEDSimulator:
         self.active_segment_id = 1
         self.is_playing = True
         self.fps = DEFAULT_FPS
+        # With an EngineThread the engine owns the output rate and the simulator only displays its frames
+        self.engine = engine
+        self.model_lock = engine.lock if engine else threading.RLock()
+        if engine:
+            self.fps = engine.fps
+        self.pending_dialog = None
         self.last_segment_state = None
         self.segment_states = {}
         self.previous_layout_mode = None
         self.ui_dirty = True
         self.ui_rebuilding = False
         self.ui_updating = False 
+        self.ui_layout = None
+        self.ui_values = {}
         self.screen = pygame.display.set_mode((UI_WIDTH, UI_HEIGHT), pygame.RESIZABLE)
         pygame.display.set_caption("LEDテープライトシミュレーター")
         
@@ -115,6 +128,11 @@ class LEDSimulator:
         self._build_ui()
         self._center_view()
         self.clock = pygame.time.Clock()
+        self.animation_clock = AnimationClock()
+        self.frame_scheduler = FrameScheduler(self.fps)
+        self.led_renderer = LEDStripRenderer()
+        self.text_cache = TextCache()
+        self.static_overlays = {}
         self._save_segment_state()
         
         display_info = pygame.display.Info()
@@ -166,11 +184,21 @@ class LEDSimulator:
         logger.info("Using Arial as fallback font")
     
     def _render_text(self, text, size=14, color=(255, 255, 255)):
-        if hasattr(self, 'japanese_fonts') and size in self.japanese_fonts:
-            return self.japanese_fonts[size].render(text, True, color)
-        else:
-            font = pygame.font.SysFont('Arial', int(size * self.ui_state['scale_factor']))
-            return font.render(text, True, color)
+        font = self.japanese_fonts.get(size)
+        if font is None:
+            font = self.text_cache.sys_font('Arial', int(size * self.ui_state['scale_factor']))
+        return self.text_cache.render(font, text, size, color)
+    
+    def _static_overlay(self, key, size, draw):
+        # Parts of the screen that only change with their key are drawn once and then blitted
+        surface = self.static_overlays.get(key)
+        if surface is None:
+            if len(self.static_overlays) >= STATIC_OVERLAY_CACHE_SIZE:
+                self.static_overlays.clear()
+            surface = pygame.Surface((max(1, size[0]), max(1, size[1])), pygame.SRCALPHA)
+            draw(surface)
+            self.static_overlays[key] = surface
+        return surface
         
     def _get_active_segment(self) -> Optional[LightSegment]:
         if self.active_effect_id not in self.scene.effects:
@@ -225,14 +253,14 @@ class LEDSimulator:
             self.segment_states[effect_id][segment_id] = {
                 'current_position': segment.current_position,
                 'move_speed': segment.move_speed,
-                'move_range': segment.move_range.copy(),
+                'move_range': segment.move_range,
                 'is_edge_reflect': segment.is_edge_reflect,
                 'gradient': segment.gradient if hasattr(segment, 'gradient') else False,
                 'fade': segment.fade if hasattr(segment, 'fade') else False,
-                'dimmer_time': segment.dimmer_time.copy() if hasattr(segment.dimmer_time, 'copy') else segment.dimmer_time,
-                'transparency': segment.transparency.copy() if hasattr(segment.transparency, 'copy') else segment.transparency,
-                'color': segment.color.copy() if hasattr(segment.color, 'copy') else segment.color,
-                'length': segment.length.copy() if hasattr(segment.length, 'copy') else segment.length,
+                'dimmer_time': segment.dimmer_time,
+                'transparency': segment.transparency,
+                'color': segment.color,
+                'length': segment.length,
             }
     
     def _restore_segment_state(self):
@@ -253,111 +281,179 @@ class LEDSimulator:
                         setattr(segment, key, value)
 
     def _build_ui(self):
+        if not self.ui_lock.acquire(False):
+            self.ui_dirty = True
+            return
+        
         try:
-            if not self.ui_lock.acquire(False):
-                self.ui_dirty = True
-                return
+            with self.model_lock:
+                self._build_widgets()
+        finally:
+            # A failed rebuild leaves ui_dirty set, so it is tried again
+            self.ui_rebuilding = False
+            self.ui_lock.release()
+    
+    def _build_widgets(self):
+        temp_state = None
+        if hasattr(self, '_temp_state'):
+            temp_state = self._temp_state.copy()
+        
+        self.ui_rebuilding = True
+        self.manager.clear_and_reset()
+        self.ui_elements = {}
+        self.ui_values = {}
+        self.ui_layout = self._ui_layout_key()
+        current_layout_mode = 'two_rows' if self.ui_state['width'] < self.ui_state['two_row_threshold'] else 'one_row'
+
+        self.rects = self._calculate_layout()
+        self.manager.set_window_resolution((self.ui_state['width'], self.ui_state['height']))
+        self._add_panel_toggles()
+        
+        if self.ui_state['top_panel_expanded']:
+            if current_layout_mode == 'two_rows':
+                self._build_top_panel_two_rows()
+            else:
+                self._build_top_panel_one_row()
+        
+        if self.ui_state['control_panel_expanded']:
+            self._build_control_panel()
+
+        segment = self._get_active_segment()
+        if segment and temp_state:
+            for key, value in temp_state.items():
+                if hasattr(segment, key):
+                    if hasattr(value, 'copy'):
+                        setattr(segment, key, value.copy())
+                    else:
+                        setattr(segment, key, value)
             
-            temp_state = None
+            self._update_ui_controls(segment)
+
             if hasattr(self, '_temp_state'):
-                temp_state = self._temp_state.copy()
-            
-            self.ui_rebuilding = True
-            self.manager.clear_and_reset()
-            self.ui_elements = {}
-            current_layout_mode = 'two_rows' if self.ui_state['width'] < self.ui_state['two_row_threshold'] else 'one_row'
+                delattr(self, '_temp_state')
 
-            self.rects = self._calculate_layout()
-            self.manager.set_window_resolution((self.ui_state['width'], self.ui_state['height']))
-            self._add_panel_toggles()
-            
-            if self.ui_state['top_panel_expanded']:
-                if current_layout_mode == 'two_rows':
-                    self._build_top_panel_two_rows()
-                else:
-                    self._build_top_panel_one_row()
-            
-            if self.ui_state['control_panel_expanded']:
-                self._build_control_panel()
+        self.ui_dirty = False
+        self.ui_rebuilding = False
+        self.previous_layout_mode = current_layout_mode
+    
+    def _ui_layout_key(self) -> tuple:
+        """
+        Get the settings the widget layout depends on. The widgets are only rebuilt when these change;
+        everything else is updated in place.
+        """
+        return (
+            self.ui_state['width'],
+            self.ui_state['height'],
+            self.ui_state['scale_factor'],
+            self.ui_state['width'] < self.ui_state['two_row_threshold'],
+            self.ui_state['top_panel_expanded'],
+            self.ui_state['control_panel_expanded'],
+            self._get_active_segment() is not None
+        )
 
-            segment = self._get_active_segment()
-            if segment and temp_state:
-                for key, value in temp_state.items():
-                    if hasattr(segment, key):
-                        if hasattr(value, 'copy'):
-                            setattr(segment, key, value.copy())
-                        else:
-                            setattr(segment, key, value)
-                
-                self._update_ui_controls(segment)
+    def _ui_model_values(self, segment) -> Dict[str, object]:
+        values = {}
+        if not self.scene:
+            return values
 
-                if hasattr(self, '_temp_state'):
-                    delattr(self, '_temp_state')
+        scenes = sorted(self.scene_manager.scenes.keys()) if self.scene_manager else [self.scene.scene_ID]
+        values['scene_dropdown'] = ([str(scene_id) for scene_id in scenes], str(self.active_scene_id))
 
-            self.ui_dirty = False
-            self.ui_rebuilding = False
-            self.previous_layout_mode = current_layout_mode
-        finally:
-            try:
-                self.ui_lock.release()
-            except RuntimeError:
-                pass
-    
-    def _update_ui_controls(self, segment):
-        try:
-            controls_to_update = {
-                'position_slider': segment.current_position,
-                'range_min': segment.move_range[0] if len(segment.move_range) > 0 else 0,
-                'range_max': segment.move_range[1] if len(segment.move_range) > 1 else 0,
-                'reflect_toggle': 'ON' if segment.is_edge_reflect else 'OFF',
-                'gradient_toggle': 'ON' if hasattr(segment, 'gradient') and segment.gradient else 'OFF',
-                'fade_toggle': 'ON' if hasattr(segment, 'fade') and segment.fade else 'OFF',
-            }
+        effects = sorted(self.scene.effects.keys()) if self.active_effect_id in self.scene.effects else []
+        values['effect_dropdown'] = ([str(effect_id) for effect_id in effects], str(self.active_effect_id))
+        values['palette_dropdown'] = (sorted(self.scene.palettes.keys()), self.scene.current_palette)
 
-            if hasattr(segment, 'dimmer_time_ratio'):
-                if 'dimmer_time_ratio_slider' in self.ui_elements:
-                    self.ui_elements['dimmer_time_ratio_slider'].set_current_value(segment.dimmer_time_ratio)
-                if 'dimmer_time_ratio_value' in self.ui_elements:
-                    self.ui_elements['dimmer_time_ratio_value'].set_text(f"{segment.dimmer_time_ratio:.2f}")
+        segments = sorted(self.scene.effects[self.active_effect_id].segments.keys()) if effects else []
+        values['segment_dropdown'] = ([str(seg_id) for seg_id in segments], str(self.active_segment_id))
 
-            if hasattr(segment, 'dimmer_time') and len(segment.dimmer_time) >= 5:
-                for i, name in enumerate(['fade_in_start', 'fade_in_end', 'fade_out_start', 'fade_out_end', 'cycle_time']):
-                    if f'{name}_slider' in self.ui_elements:
-                        try:
-                            self.ui_elements[f'{name}_slider'].set_current_value(segment.dimmer_time[i])
-                        except Exception:
-                            pass
-            
-            if hasattr(segment, 'transparency') and len(segment.transparency) >= 4:
-                for i in range(4):
-                    if f'transparency_{i}_slider' in self.ui_elements:
-                        try:
-                            self.ui_elements[f'transparency_{i}_slider'].set_current_value(segment.transparency[i])
-                        except Exception:
-                            pass
-            
-            for name, value in controls_to_update.items():
-                if name in self.ui_elements:
-                    try:
-                        if isinstance(self.ui_elements[name], pygame_gui.elements.UIButton):
-                            self.ui_elements[name].set_text(value)
-                        else:
-                            self.ui_elements[name].set_current_value(value)
-                    except Exception:
-                        pass
-                        
-            if hasattr(segment, 'color') and len(segment.color) >= 4:
-                for i in range(4):
-                    if f'color_{i}_dropdown' in self.ui_elements:
-                        try:
-                            color_idx = segment.color[i]
-                            if isinstance(color_idx, int) and color_idx >= 0:
-                                self.ui_elements[f'color_{i}_dropdown'].selected_option = str(color_idx)
-                        except Exception:
-                            pass
+        if not segment:
+            return values
+
+        values.update({
+            'position_slider': segment.current_position,
+            'speed_slider': segment.move_speed,
+            'range_min': segment.move_range[0] if len(segment.move_range) > 0 else 0,
+            'range_max': segment.move_range[1] if len(segment.move_range) > 1 else 0,
+            'reflect_toggle': 'ON' if segment.is_edge_reflect else 'OFF',
+            'gradient_toggle': 'ON' if segment.gradient else 'OFF',
+            'fade_toggle': 'ON' if segment.fade else 'OFF',
+            'dimmer_time_ratio_slider': segment.dimmer_time_ratio,
+            'dimmer_time_ratio_value': f"{segment.dimmer_time_ratio:.2f}"
+        })
+
+        if len(segment.dimmer_time) >= 5:
+            for i, name in enumerate(['fade_in_start', 'fade_in_end', 'fade_out_start', 'fade_out_end', 'cycle_time']):
+                values[f'{name}_slider'] = segment.dimmer_time[i]
+
+        for i, transparency in enumerate(segment.transparency[:4]):
+            values[f'transparency_{i}_slider'] = transparency
+
+        return values
+
+    def _update_ui_controls(self, segment):
+        """
+        Bring the widgets in line with the model, touching only widgets whose value changed
+        since it was last written.
+        """
+        try:
+            for name, value in self._ui_model_values(segment).items():
+                element = self.ui_elements.get(name)
+                if element is None:
+                    continue
+
+                if isinstance(element, pygame_gui.elements.UIDropDownMenu):
+                    # Compared with the widget itself, so a selection the user just made is kept
+                    if self._dropdown_state(element) != value:
+                        self._replace_dropdown(name, *value)
+                    continue
+
+                if self.ui_values.get(name) == value:
+                    continue
+
+                try:
+                    if isinstance(element, (pygame_gui.elements.UIButton, pygame_gui.elements.UILabel)):
+                        element.set_text(value)
+                    else:
+                        low, high = element.value_range
+                        element.set_current_value(min(max(value, low), high))
+                    self.ui_values[name] = value
+                except Exception as e:
+                    logger.debug(f"Error updating {name}: {e}")
         except Exception as e:
             logger.error(f"Error while updating UI: {e}")
 
+    @staticmethod
+    def _dropdown_state(element) -> Tuple[List[str], str]:
+        def text(option):
+            return option[0] if isinstance(option, tuple) else option
+
+        return [text(option) for option in element.options_list], text(element.selected_option)
+
+    def _replace_dropdown(self, name: str, options: List[str], selected: str):
+        old = self.ui_elements[name]
+        relative_rect = old.relative_rect.copy()
+        container = old.ui_container
+        old.kill()
+
+        self.ui_elements[name] = pygame_gui.elements.UIDropDownMenu(
+            options_list=options,
+            starting_option=selected,
+            relative_rect=relative_rect,
+            manager=self.manager,
+            container=container
+        )
+
+    def _refresh_ui(self):
+        if not self.ui_lock.acquire(False):
+            return
+
+        try:
+            self.ui_dirty = False
+            with self.model_lock:
+                self._update_ui_controls(self._get_active_segment())
+        finally:
+            self.ui_lock.release()
+
     def _add_panel_toggles(self):
         scale = self.ui_state['scale_factor']
         toggle_size = int(40 * scale)
@@ -1150,10 +1246,10 @@ class LEDSimulator:
                     self._add_notification(f"Removed Segment {self.active_segment_id}")
         
         elif event.ui_element == self.ui_elements.get('save_button'):
-            self._save_json_config()
+            self.pending_dialog = self._save_json_config
         
         elif event.ui_element == self.ui_elements.get('load_button'):
-            self._load_json_config()
+            self.pending_dialog = self._load_json_config
 
         elif event.ui_element == self.ui_elements.get('add_scene'):
             if not self.scene_manager:
@@ -1219,14 +1315,14 @@ class LEDSimulator:
         elif event.ui_element == self.ui_elements.get('range_min'):
 
             new_min = min(int(event.value), segment.move_range[1])
-            segment.move_range[0] = new_min
+            segment.move_range = [new_min, segment.move_range[1]]
             if self.ui_elements.get('range_min'):
                 self.ui_elements['range_min'].set_current_value(new_min)
         
         elif event.ui_element == self.ui_elements.get('range_max'):
 
             new_max = max(int(event.value), segment.move_range[0])
-            segment.move_range[1] = new_max
+            segment.move_range = [segment.move_range[0], new_max]
             if self.ui_elements.get('range_max'):
                 self.ui_elements['range_max'].set_current_value(new_max)
         
@@ -1239,17 +1335,23 @@ class LEDSimulator:
         for i in range(4): 
             if event.ui_element == self.ui_elements.get(f'transparency_{i}_slider'):
                 if i < len(segment.transparency):
-                    segment.transparency[i] = event.value
+                    new_transparency = list(segment.transparency)
+                    new_transparency[i] = event.value
+                    segment.transparency = new_transparency
                 
         for i in range(5):
             if event.ui_element == self.ui_elements.get(f'dimmer_time_{i}_slider'):
                 if hasattr(segment, 'dimmer_time') and i < len(segment.dimmer_time):
-                    segment.dimmer_time[i] = int(event.value)
+                    new_dimmer_time = list(segment.dimmer_time)
+                    new_dimmer_time[i] = int(event.value)
+                    segment.dimmer_time = new_dimmer_time
         
         for i in range(3):
             if event.ui_element == self.ui_elements.get(f'length_{i}_slider'):
                 if i < len(segment.length):
-                    segment.length[i] = int(event.value)
+                    new_length = list(segment.length)
+                    new_length[i] = int(event.value)
+                    segment.length = new_length
                     
                     if self.ui_elements.get('total_length_label'):
                         total_length = sum(segment.length)
@@ -1305,7 +1407,9 @@ class LEDSimulator:
                 if event.ui_element == self.ui_elements.get(f'color_{i}_dropdown'):
                     color_idx = int(event.text)
                     if i < len(segment.color):
-                        segment.color[i] = color_idx
+                        new_color = list(segment.color)
+                        new_color[i] = color_idx
+                        segment.color = new_color
                         if hasattr(segment, 'calculate_rgb'):
                             segment.rgb_color = segment.calculate_rgb(self.scene.current_palette)
     
@@ -1314,30 +1418,19 @@ class LEDSimulator:
             filename = filedialog.asksaveasfilename(
                 title="Save config",
                 defaultextension=".json",
-                filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")]
+                filetypes=[("JSON Files", "*.json"), ("Scene Files", "*.tlscene"), ("All Files", "*.*")]
             )
             
             if filename:
-                if self.scene_manager:
-                    if self.active_scene_id in self.scene_manager.scenes:
-                        scene = self.scene_manager.scenes[self.active_scene_id]
-                        for effect in scene.effects.values():
-                            effect.time = 0.0
-                            for segment in effect.segments.values():
-                                if hasattr(segment, 'time'):
-                                    segment.time = 0.0
-                        
-                        scene.save_to_json(filename)
+                with self.model_lock:
+                    if self.scene_manager:
+                        if self.active_scene_id in self.scene_manager.scenes:
+                            scene = self.scene_manager.scenes[self.active_scene_id]
+                            scene.save_to_file(filename)
+                        else:
+                            self.scene_manager.save_scenes_to_json(filename)
                     else:
-                        self.scene_manager.save_scenes_to_json(filename)
-                else:
-                    for effect in self.scene.effects.values():
-                        effect.time = 0.0
-                        for segment in effect.segments.values():
-                            if hasattr(segment, 'time'):
-                                segment.time = 0.0
-                                
-                    self.scene.save_to_json(filename)
+                        self.scene.save_to_file(filename)
                 
                 self._add_notification(f"Config Saved: {filename}")
         except Exception as e:
@@ -1348,39 +1441,40 @@ class LEDSimulator:
             filename = filedialog.askopenfilename(
                 title="Load config",
                 defaultextension=".json",
-                filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")]
+                filetypes=[("JSON Files", "*.json"), ("Scene Files", "*.tlscene"), ("All Files", "*.*")]
             )
             
             if filename:
-                if self.scene_manager:
-                    try:
-                        self.scene_manager.load_scenes_from_json(filename)
-                        scene_id = self.scene_manager.current_scene or min(self.scene_manager.scenes.keys())
-                        self.scene = self.scene_manager.scenes[scene_id]
-                        self.active_scene_id = scene_id
-                    except:
+                with self.model_lock:
+                    if self.scene_manager:
+                        try:
+                            self.scene_manager.load_scenes_from_json(filename)
+                            scene_id = self.scene_manager.current_scene or min(self.scene_manager.scenes.keys())
+                            self.scene = self.scene_manager.scenes[scene_id]
+                            self.active_scene_id = scene_id
+                        except:
+                            from models.light_scene import LightScene
+                            new_scene = LightScene.load_from_file(filename)
+                            self.scene_manager.scenes[new_scene.scene_ID] = new_scene
+                            self.scene_manager.current_scene = new_scene.scene_ID
+                            self.scene = new_scene
+                            self.active_scene_id = new_scene.scene_ID
+                    else:
                         from models.light_scene import LightScene
-                        new_scene = LightScene.load_from_json(filename)
-                        self.scene_manager.scenes[new_scene.scene_ID] = new_scene
-                        self.scene_manager.current_scene = new_scene.scene_ID
-                        self.scene = new_scene
-                        self.active_scene_id = new_scene.scene_ID
-                else:
-                    from models.light_scene import LightScene
-                    self.scene = LightScene.load_from_json(filename)
-                    self.active_scene_id = self.scene.scene_ID
-                
-                if self.scene.effects:
-                    for effect in self.scene.effects.values():
-                        effect.time = 0.0
-                        for segment in effect.segments.values():
-                            if hasattr(segment, 'time'):
-                                segment.time = 0.0
+                        self.scene = LightScene.load_from_file(filename)
+                        self.active_scene_id = self.scene.scene_ID
                     
-                    self.active_effect_id = self.scene.current_effect_ID or min(self.scene.effects.keys())
-                    effect = self.scene.effects.get(self.active_effect_id)
-                    if effect and effect.segments:
-                        self.active_segment_id = min(effect.segments.keys())
+                    if self.scene.effects:
+                        for effect_id, effect in self.scene.effects.materialized_items():
+                            effect.time = 0.0
+                            for segment in effect.segments.values():
+                                if hasattr(segment, 'time'):
+                                    segment.time = 0.0
+                        
+                        self.active_effect_id = self.scene.current_effect_ID or min(self.scene.effects.keys())
+                        effect = self.scene.effects.get(self.active_effect_id)
+                        if effect and effect.segments:
+                            self.active_segment_id = min(effect.segments.keys())
                 
                 self.ui_dirty = True
                 self._add_notification(f"Loaded Config {filename}")
@@ -1444,27 +1538,30 @@ class LEDSimulator:
         x = display_rect.x + (display_rect.width - width) // 2
         y = display_rect.y + int(20 * self.ui_state['scale_factor'])
         
-        fade_surface = pygame.Surface((width, height), pygame.SRCALPHA)
-        fade_surface.fill((0, 0, 0, 180))
-        
         def time_to_pos(t):
             return int(t / cycle_time * width)
         
-        in_start_pos = time_to_pos(fade_in_start)
-        in_end_pos = time_to_pos(fade_in_end)
-        out_start_pos = time_to_pos(fade_out_start)
-        out_end_pos = time_to_pos(fade_out_end)
-        
-        pygame.draw.rect(fade_surface, (50, 50, 50, 200), (0, 0, width, height), 1)
-        
-        pygame.draw.rect(fade_surface, (100, 255, 100, 100), 
-                        (in_start_pos, 0, in_end_pos - in_start_pos, height))
-        
-        pygame.draw.rect(fade_surface, (255, 255, 100, 100), 
-                        (in_end_pos, 0, out_start_pos - in_end_pos, height))
+        def draw_background(surface):
+            surface.fill((0, 0, 0, 180))
+            
+            in_start_pos = time_to_pos(fade_in_start)
+            in_end_pos = time_to_pos(fade_in_end)
+            out_start_pos = time_to_pos(fade_out_start)
+            out_end_pos = time_to_pos(fade_out_end)
+            
+            pygame.draw.rect(surface, (50, 50, 50, 200), (0, 0, width, height), 1)
+            
+            pygame.draw.rect(surface, (100, 255, 100, 100), 
+                            (in_start_pos, 0, in_end_pos - in_start_pos, height))
+            
+            pygame.draw.rect(surface, (255, 255, 100, 100), 
+                            (in_end_pos, 0, out_start_pos - in_end_pos, height))
+            
+            pygame.draw.rect(surface, (255, 100, 100, 100), 
+                            (out_start_pos, 0, out_end_pos - out_start_pos, height))
         
-        pygame.draw.rect(fade_surface, (255, 100, 100, 100), 
-                        (out_start_pos, 0, out_end_pos - out_start_pos, height))
+        key = ('fade_visualizer', width, height, tuple(segment.dimmer_time[:5]))
+        fade_surface = self._static_overlay(key, (width, height), draw_background).copy()
         
         current_time = int((segment.time * 1000) % cycle_time)
         current_pos = time_to_pos(current_time)
@@ -1491,13 +1588,26 @@ class LEDSimulator:
         if 'color_slots' not in self.ui_elements:
             return
             
-        for rect, color in self.ui_elements['color_slots']:
-            pygame.draw.rect(self.screen, color, rect)
-            pygame.draw.rect(self.screen, (200, 200, 200), rect, 1)
+        slots = [(pygame.Rect(rect), tuple(color)) for rect, color in self.ui_elements['color_slots']]
+        if not slots:
+            return
+        
+        area = slots[0][0].unionall([rect for rect, _ in slots[1:]])
+        
+        def draw_swatches(surface):
+            for rect, color in slots:
+                swatch = rect.move(-area.x, -area.y)
+                pygame.draw.rect(surface, color, swatch)
+                pygame.draw.rect(surface, (200, 200, 200), swatch, 1)
+        
+        key = ('palette', tuple((tuple(rect), color) for rect, color in slots))
+        self.screen.blit(self._static_overlay(key, area.size, draw_swatches), area.topleft)
     
     def _draw_status_bar(self):
         status_rect = self.rects['status_bar']
-        pygame.draw.rect(self.screen, (30, 30, 30), status_rect)
+        background = self._static_overlay(('status_bar', status_rect.size), status_rect.size,
+                                          lambda surface: surface.fill((30, 30, 30)))
+        self.screen.blit(background, status_rect.topleft)
         
         segment = self._get_active_segment()
         
@@ -1589,10 +1699,10 @@ class LEDSimulator:
             self._center_view()
         
         elif event.key == pygame.K_s and pygame.key.get_mods() & pygame.KMOD_CTRL:
-            self._save_json_config()
+            self.pending_dialog = self._save_json_config
         
         elif event.key in (pygame.K_l, pygame.K_o) and pygame.key.get_mods() & pygame.KMOD_CTRL:
-            self._load_json_config()
+            self.pending_dialog = self._load_json_config
         
         elif event.key == pygame.K_f:
             self.fade_visualizer['show'] = not self.fade_visualizer['show']
@@ -1634,14 +1744,16 @@ class LEDSimulator:
             return
             
         self.last_update_time = current_time
-        segment = self._get_active_segment()
 
-        if segment and not self.ui_rebuilding and not self.ui_updating:
-            self.ui_updating = True
-            try:
-                self._update_ui_controls(segment)
-            finally:
-                self.ui_updating = False
+        with self.model_lock:
+            segment = self._get_active_segment()
+
+            if segment and not self.ui_rebuilding and not self.ui_updating:
+                self.ui_updating = True
+                try:
+                    self._update_ui_controls(segment)
+                finally:
+                    self.ui_updating = False
         
     def _check_resizing_complete(self):
         if self.ui_state['resizing'] and time.time() - self.ui_state['resize_time'] > 0.2:
@@ -1666,16 +1778,14 @@ class LEDSimulator:
 
             if indicator_start_x + indicator_width > display_rect.x and indicator_start_x < display_rect.right:
 
-                alpha_surface = pygame.Surface((
-                    max(1, int(indicator_width)),
-                    display_rect.height
-                ), pygame.SRCALPHA)
-
                 color = (
                     (255, 50, 50) if segment_id == self.active_segment_id else (50, 50, 255)
                 )
-                color_with_alpha = (*color, self.led_state['segment_indicator_opacity'])
-                alpha_surface.fill(color_with_alpha)
+                alpha_surface = self.led_renderer.overlay(
+                    max(1, int(indicator_width)),
+                    display_rect.height,
+                    (*color, self.led_state['segment_indicator_opacity'])
+                )
 
                 self.screen.blit(alpha_surface, (int(indicator_start_x), display_rect.y))
 
@@ -1694,11 +1804,10 @@ class LEDSimulator:
     def _draw_leds(self):
         display_rect = self.rects['display']
         
-        led_colors = []
-        if self.scene_manager:
-            led_colors = self.scene_manager.get_led_output()
-        else:
-            led_colors = self.scene.get_led_output()
+        led_colors = self.engine.frames.read() if self.engine else None
+        if led_colors is None:
+            with self.model_lock:
+                led_colors = self.scene_manager.get_led_array() if self.scene_manager else self.scene.get_led_array()
         
         led_width = self.led_state['size'] * self.led_state['zoom']
         led_spacing = self.led_state['spacing'] * self.led_state['zoom']
@@ -1706,69 +1815,100 @@ class LEDSimulator:
         
         pan_offset = -self.led_state['pan'] * led_total_width
         
-        for i, color in enumerate(led_colors):
-            x = display_rect.x + i * led_total_width + pan_offset
-
-            if (x + led_width >= display_rect.x and 
-                x <= display_rect.x + display_rect.width):
-                
-                led_rect = pygame.Rect(
-                    x, 
-                    display_rect.y + (display_rect.height - led_width) // 2,
-                    led_width, 
-                    led_width
-                )
-                
-                pygame.draw.rect(self.screen, color, led_rect)
-                pygame.draw.rect(self.screen, (100, 100, 100), led_rect, 1)
+        self.led_renderer.draw(self.screen, led_colors, display_rect, led_width, led_spacing, pan_offset)
         
         if self.led_state['show_segment_indicators']:
-            self._draw_segment_indicators(display_rect, led_total_width, pan_offset)
+            with self.model_lock:
+                self._draw_segment_indicators(display_rect, led_total_width, pan_offset)
 
+    def _update_ui_state(self):
+        self._check_resizing_complete()
+        self._update_auto_hide()
+    
+    def _draw_frame(self):
+        self.screen.fill(UI_BACKGROUND_COLOR)
+        
+        self._draw_leds()
+        
+        # The engine thread changes the scenes between frames; the overlays read them under its lock
+        with self.model_lock:
+            self._draw_led_visualizer()
+            
+            self._draw_color_palette()
+            
+            self._draw_status_bar()
+        
+        self.manager.draw_ui(self.screen)
+        
+        self._render_notifications()
+        
+        pygame.display.update()
+    
+    def _update_engine(self):
+        if self.scene_manager:
+            self.scene_manager.run_frame_hooks()
+        
+        if self.is_playing:
+            # Animation follows elapsed wall-clock time, so the FPS setting only changes the output rate
+            dt, catch_up = self.animation_clock.tick()
+            target = self.scene_manager or self.scene
+            if catch_up > 0:
+                target.fast_forward(catch_up)
+            target.update(dt)
+        else:
+            self.animation_clock.reset()
+    
     def run(self):
         running = True
         
         while running:
-            time_delta = self.clock.tick(self.fps) / 1000.0
-
-            self.screen.fill(UI_BACKGROUND_COLOR)
-
-            self._check_resizing_complete()
-
-            self._update_auto_hide()
-
-            self._update_real_time()
+            display_fps = SIMULATOR_DISPLAY_FPS if self.engine else self.fps
+            time_delta = self.clock.tick(display_fps) / 1000.0
+            scheduler = self.frame_scheduler
+            scheduler.begin_frame(display_fps)
+            
+            if self.engine:
+                # The engine thread renders and sends the hardware frames; only its settings are passed on
+                self.engine.playing = self.is_playing
+                self.engine.fps = self.fps
+            else:
+                # The engine update sends the hardware frame, so it always goes first
+                self._update_engine()
+            
+            with self.model_lock:
+                for event in pygame.event.get():
+                    if not self._handle_event(event):
+                        running = False
+                        break
+            
+            if not running:
+                break
             
-            for event in pygame.event.get():
-                if not self._handle_event(event):
-                    running = False
-                    break
+            # File dialogs block until closed, so they run outside the model lock
+            if self.pending_dialog:
+                dialog, self.pending_dialog = self.pending_dialog, None
+                dialog()
 
             self.manager.update(time_delta)
             
-            if self.ui_dirty and not self.ui_rebuilding:
-                self._build_ui()
+            scheduler.run('ui_state', self._update_ui_state, throttle=FRAME_THROTTLE_INTERVAL)
             
-            if self.is_playing:
-                if self.scene_manager:
-                    self.scene_manager.update()
+            if self.ui_dirty and not self.ui_rebuilding:
+                with self.model_lock:
+                    layout_changed = self._ui_layout_key() != self.ui_layout
+                if layout_changed:
+                    # The widgets no longer match the layout, so the rebuild cannot wait for a quiet frame
+                    scheduler.run('ui_rebuild', self._build_ui, critical=True)
                 else:
-                    self.scene.update()
-
-            self._draw_leds()
-
-            self._draw_led_visualizer()
+                    scheduler.run('ui_refresh', self._refresh_ui)
             
-            self._draw_color_palette()
-            
-            self._draw_status_bar()
+            scheduler.run('ui_sync', self._update_real_time, throttle=FRAME_THROTTLE_INTERVAL)
             
-            self.manager.draw_ui(self.screen)
-
-            self._update_notifications()
+            scheduler.run('draw', self._draw_frame)
             
-            self._render_notifications()
+            scheduler.run('notifications', self._update_notifications, throttle=FRAME_THROTTLE_INTERVAL)
             
-            pygame.display.update()
+            scheduler.end_frame()
         
+        logger.info(f"Frame scheduler stats: {self.frame_scheduler.get_stats()}")
         pygame.quit()
@@ -0,0 +1,103 @@
+"""
+Caches for text rendered by the simulator.
+
+Rasterizing a string is far more expensive than blitting it, and most of the text on screen
+(segment labels, the status bar, notifications) is the same from one frame to the next. A
+TextCache keeps the most recently used rendered strings, keyed by text, size, color and font,
+and evicts the least recently used one when it is full. Fallback fonts are created once per
+size instead of on every call.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+import sys
+import pygame
+
+sys.path.append('..')
+from config import TEXT_CACHE_SIZE
+
+
+class TextCache:
+    """
+    TextCache is a bounded LRU cache of rendered text surfaces.
+    """
+
+    def __init__(self, max_entries: int = TEXT_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of rendered strings kept
+        """
+        self.max_entries = max_entries
+        self._surfaces: 'OrderedDict[tuple, pygame.Surface]' = OrderedDict()
+        self._fonts: Dict[Tuple[str, int], pygame.font.Font] = {}
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+    def sys_font(self, name: str, size: int) -> pygame.font.Font:
+        """
+        Get a shared system font.
+
+        Args:
+            name: System font name
+            size: Font size in pixels
+
+        Returns:
+            Font, created on first use
+        """
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(name, size)
+            self._fonts[key] = font
+        return font
+
+    def render(self, font: pygame.font.Font, text: str, size: int, color: Tuple[int, ...]) -> pygame.Surface:
+        """
+        Get a rendered string, rendering it on first use.
+
+        Args:
+            font: Font to render with
+            text: Text to render
+            size: Nominal size of the font, part of the cache key
+            color: RGB color
+
+        Returns:
+            Shared surface; do not draw on it
+        """
+        key = (text, size, tuple(color), font)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.stats['hits'] += 1
+            return surface
+
+        self.stats['misses'] += 1
+        surface = font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+            self.stats['evictions'] += 1
+        return surface
+
+    def clear(self):
+        """
+        Drop all rendered strings, e.g. after the fonts were reloaded.
+        """
+        self._surfaces.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get a copy of the cache counters.
+
+        Returns:
+            Dictionary of counter name -> value
+        """
+        stats = dict(self.stats)
+        stats['entries'] = len(self._surfaces)
+        return stats
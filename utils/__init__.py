@@ -1,9 +1,14 @@
 from .color_utils import (
     interpolate_colors, apply_transparency, blend_colors,
-    apply_brightness, get_color_from_palette
+    apply_brightness, get_color_from_palette, blend_frames, BLEND_MODES
 )
+from .file_utils import write_file_atomic, write_json_atomic
+from .save_worker import SaveWorker
+from .file_cache import ParsedFileCache, file_cache
 
 __all__ = [
     'interpolate_colors', 'apply_transparency', 'blend_colors',
-    'apply_brightness', 'get_color_from_palette'
+    'apply_brightness', 'get_color_from_palette', 'blend_frames', 'BLEND_MODES',
+    'write_file_atomic', 'write_json_atomic', 'SaveWorker',
+    'ParsedFileCache', 'file_cache'
 ]
\ No newline at end of file
@@ -4,6 +4,9 @@ These functions handle color interpolation, blending, transparency, and brightne
 """
 
 from typing import List, Tuple, Dict, Any
+import numpy as np
+
+BLEND_MODES = ("normal", "over", "add", "multiply", "max", "screen")
 
 def interpolate_colors(color1: List[int], color2: List[int], factor: float) -> List[int]:
     """
@@ -101,3 +104,37 @@ def get_color_from_palette(palette: Dict[str, List[List[int]]],
         return [0, 0, 0]
     
     return palette_colors[color_index]
+
+def blend_frames(base: np.ndarray, layer: np.ndarray, alpha: np.ndarray, mode: str = "normal",
+                 opacity: float = 1.0) -> np.ndarray:
+    """
+    Composite a layer frame onto a base frame in place.
+    
+    Args:
+        base: (N, 3) float32 array of RGB values in 0-255, modified in place
+        layer: (N, 3) array of RGB values in 0-255
+        alpha: (N,) array of layer coverage in 0.0-1.0
+        mode: Blend mode (normal/over, add, multiply, max, screen)
+        opacity: Layer opacity (0.0-1.0)
+    
+    Returns:
+        The base array
+    """
+    layer = layer.astype(np.float32, copy=False)
+    
+    if mode in ("normal", "over"):
+        blended = layer
+    elif mode == "add":
+        blended = np.minimum(base + layer, 255.0)
+    elif mode == "multiply":
+        blended = base * layer * (1.0 / 255.0)
+    elif mode == "max":
+        blended = np.maximum(base, layer)
+    elif mode == "screen":
+        blended = 255.0 - (255.0 - base) * (255.0 - layer) * (1.0 / 255.0)
+    else:
+        raise ValueError(f"Unknown blend mode: {mode}")
+    
+    weight = (alpha * opacity).astype(np.float32, copy=False)[:, None]
+    base += (blended - base) * weight
+    return base
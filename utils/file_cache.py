@@ -0,0 +1,128 @@
+"""
+Cache of parsed configuration files.
+Entries are keyed by absolute path and validated against the file's (mtime, size),
+so reloading an unchanged file returns a copy of the parsed data without touching the parser.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+import os
+import sys
+import threading
+
+sys.path.append('..')
+from config import FILE_CACHE_SIZE
+
+
+def clone_data(data: Any) -> Any:
+    """
+    Copy parsed file data so callers can modify it freely.
+    Dictionaries, lists and tuples are copied recursively; other values
+    (numbers, strings, bytes, loader functions) are immutable or shared.
+
+    Args:
+        data: Parsed data
+
+    Returns:
+        Independent copy of the data
+    """
+    if isinstance(data, dict):
+        return {key: clone_data(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [clone_data(value) for value in data]
+    if isinstance(data, tuple):
+        return tuple(clone_data(value) for value in data)
+    return data
+
+
+class ParsedFileCache:
+    """
+    ParsedFileCache is a bounded LRU cache of parsed and validated file contents.
+    """
+
+    def __init__(self, max_entries: int = FILE_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached files
+        """
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[int, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+    def get(self, file_path: str, kind: str, parse: Callable[[str], Any],
+            validate: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Get the parsed contents of a file, parsing it only if it changed since the last call.
+
+        Args:
+            file_path: Path to the file
+            kind: Name of the parser, so one file can be cached in several forms
+            parse: Function reading and parsing the file at the given path
+            validate: Optional function raising ValueError for invalid data; invalid data is not cached
+
+        Returns:
+            A copy of the parsed data
+        """
+        abs_path = os.path.abspath(file_path)
+        stat = os.stat(abs_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        key = (abs_path, kind)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == signature:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return clone_data(entry[2])
+            self.stats['misses'] += 1
+
+        data = parse(abs_path)
+        if validate:
+            validate(data)
+
+        with self._lock:
+            self._entries[key] = (signature[0], signature[1], data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+        return clone_data(data)
+
+    def invalidate(self, file_path: str = None):
+        """
+        Drop cached entries.
+
+        Args:
+            file_path: Path whose entries are dropped (all entries if None)
+        """
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                return
+
+            abs_path = os.path.abspath(file_path)
+            for key in [key for key in self._entries if key[0] == abs_path]:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get a copy of the cache counters.
+
+        Returns:
+            Dictionary of counter name -> value, including the current number of entries
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+file_cache = ParsedFileCache()
@@ -0,0 +1,57 @@
+"""
+Utility functions for writing files safely.
+Files are written to a temporary file in the target directory and renamed into place,
+so readers never see a partially written file.
+"""
+
+from typing import Any, Union
+import json
+import os
+import tempfile
+
+
+def write_file_atomic(file_path: str, contents: Union[str, bytes]):
+    """
+    Atomically replace a file with new contents.
+
+    Args:
+        file_path: Path of the file to write
+        contents: Text (written as UTF-8) or bytes
+    """
+    if isinstance(contents, str):
+        contents = contents.encode('utf-8')
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path) + '.', suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+
+        try:
+            mode = os.stat(file_path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        os.chmod(temp_path, mode)
+
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(file_path: str, data: Any, indent: int = 4):
+    """
+    Atomically write data as JSON.
+
+    Args:
+        file_path: Path of the JSON file
+        data: JSON-serializable data
+        indent: Indentation passed to json.dumps
+    """
+    write_file_atomic(file_path, json.dumps(data, indent=indent, ensure_ascii=False))
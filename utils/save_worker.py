@@ -0,0 +1,90 @@
+"""
+Background worker for file saves.
+Save jobs run on a single worker thread in submission order, so serialization and disk I/O
+never run on the OSC server thread or the render loop.
+"""
+
+from typing import Callable, Optional
+import queue
+import threading
+
+import logging
+
+logger = logging.getLogger("color_signal_system")
+
+
+class SaveWorker:
+    """
+    SaveWorker runs save jobs on a dedicated background thread.
+    The thread is started on the first submitted job.
+    """
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, job: Callable[[], None], on_done: Optional[Callable[[Optional[Exception]], None]] = None):
+        """
+        Queue a save job.
+
+        Args:
+            job: Function performing the serialization and write
+            on_done: Called on the worker thread with None on success or the raised exception
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="save-worker")
+                self._thread.daemon = True
+                self._thread.start()
+
+        self._jobs.put((job, on_done))
+
+    def pending(self) -> int:
+        """
+        Get the number of jobs that have not finished yet.
+
+        Returns:
+            Number of queued or running jobs
+        """
+        return self._jobs.unfinished_tasks
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Wait until all submitted jobs have finished.
+
+        Args:
+            timeout: Maximum time to wait in seconds (None waits forever)
+
+        Returns:
+            True if all jobs finished
+        """
+        done = threading.Event()
+
+        def mark_done():
+            self._jobs.join()
+            done.set()
+
+        waiter = threading.Thread(target=mark_done)
+        waiter.daemon = True
+        waiter.start()
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            job, on_done = self._jobs.get()
+            error = None
+
+            try:
+                job()
+            except Exception as e:
+                error = e
+                logger.error(f"Background save failed: {e}")
+
+            if on_done:
+                try:
+                    on_done(error)
+                except Exception as e:
+                    logger.error(f"Error in save completion handler: {e}")
+
+            self._jobs.task_done()